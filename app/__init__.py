@@ -2,4 +2,4 @@
 Raggadon RAG-Middleware App Package
 """
 
-__version__ = "1.0.0"
\ No newline at end of file
+__version__ = "1.0.0"
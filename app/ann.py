@@ -0,0 +1,244 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Maximale Stichprobe für das k-means Training
+TRAIN_SAMPLE_SIZE = 20000
+TRAIN_ITERATIONS = 10
+# Zeilen pro Block bei der Zuordnung zu Zentroiden (begrenzt den Speicher)
+ASSIGN_CHUNK_SIZE = 8192
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positionen der k höchsten Scores, absteigend; Gleichstände nach Position.
+
+    Die Reihenfolge hängt nicht von k ab, Seiten per ``offset + limit``
+    überlappen also auch bei gleichen Scores nicht.
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    # argpartition wählt unter gleichen Scores an der Grenze beliebig aus
+    boundary = scores[top].min()
+    top = np.union1d(top[scores[top] > boundary], np.flatnonzero(scores == boundary))
+    return top[np.lexsort((top, -scores[top]))[:k]]
+
+
+def fit_mask(mask: Optional[np.ndarray], n: int) -> Optional[np.ndarray]:
+    """Passt eine Filter-Maske an ``n`` Zeilen an.
+
+    Maske und Vektoren werden ohne Projekt-Lock gelesen; kam dazwischen
+    ein /save, ist die Maske kürzer. Neue Zeilen gelten dann als nicht
+    ausgewählt, überzählige Einträge werden abgeschnitten.
+    """
+    if mask is None or mask.shape[0] == n:
+        return mask
+    if mask.shape[0] > n:
+        return mask[:n]
+    return np.concatenate((mask, np.zeros(n - mask.shape[0], dtype=bool)))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index des ähnlichsten Zentroiden je Zeile, blockweise berechnet"""
+    assignments = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], ASSIGN_CHUNK_SIZE):
+        block = np.asarray(vectors[start : start + ASSIGN_CHUNK_SIZE], dtype=np.float32)
+        assignments[start : start + block.shape[0]] = np.argmax(
+            block @ centroids.T, axis=1
+        )
+    return assignments
+
+
+def train_centroids(matrix: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Sphärisches k-means auf einer Stichprobe der (normierten) Vektoren"""
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    sample_idx = np.sort(rng.choice(n, min(n, TRAIN_SAMPLE_SIZE), replace=False))
+    sample = np.asarray(matrix[sample_idx], dtype=np.float32)
+    nlist = min(nlist, sample.shape[0])
+
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(TRAIN_ITERATIONS):
+        assignments = assign_to_centroids(sample, centroids)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        sums[nonempty] = np.add.reduceat(sample[order], starts, axis=0)
+        # Leere Cluster neu mit zufälligen Stichprobenpunkten besetzen
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            sums[empty] = sample[rng.choice(sample.shape[0], empty.size, replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """IVF-Flat Index für Cosine-Suche auf normierten Vektoren.
+
+    Die Vektoren werden per k-means auf ``nlist`` Zentroiden verteilt. Eine
+    Suche vergleicht die Query mit den Zentroiden, sammelt die Einträge der
+    ``nprobe`` nächsten Listen und bewertet nur diese exakt. Mehr ``nprobe``
+    heißt höhere Recall, aber mehr gescannte Zeilen. Neue Zeilen werden
+    inkrementell ihrem nächsten Zentroiden zugeordnet.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        assignments: np.ndarray,
+        nprobe: int,
+        trained_rows: int,
+    ):
+        self.centroids = centroids
+        self.assignments = assignments
+        self.nprobe = nprobe
+        self.trained_rows = trained_rows
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def size(self) -> int:
+        return self.assignments.shape[0]
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, nlist: int, nprobe: int) -> "IVFIndex":
+        """Trainiert Zentroiden und ordnet alle Zeilen zu"""
+        started = time.perf_counter()
+        centroids = train_centroids(matrix, nlist)
+        assignments = assign_to_centroids(matrix, centroids)
+        logger.info(
+            f"🧭 IVF-Index gebaut: {matrix.shape[0]} Vektoren, "
+            f"{centroids.shape[0]} Listen in {time.perf_counter() - started:.2f}s"
+        )
+        return cls(centroids, assignments, nprobe, matrix.shape[0])
+
+    def sync(self, matrix: np.ndarray):
+        """Ordnet Zeilen zu, die seit dem letzten Aufruf hinzugekommen sind"""
+        with self._lock:
+            if matrix.shape[0] > self.size:
+                new = assign_to_centroids(matrix[self.size :], self.centroids)
+                self.assignments = np.concatenate((self.assignments, new))
+                self._order = None
+
+    def _lists(self) -> tuple[np.ndarray, np.ndarray]:
+        """Invertierte Listen als CSR (Zeilen sortiert nach Liste, Offsets)"""
+        with self._lock:
+            if self._order is None:
+                self._order = np.argsort(self.assignments, kind="stable").astype(
+                    np.int64
+                )
+                counts = np.bincount(self.assignments, minlength=self.nlist)
+                self._offsets = np.concatenate(([0], np.cumsum(counts)))
+            return self._order, self._offsets
+
+    def search(
+        self,
+        matrix: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        threshold: float,
+        nprobe: Optional[int] = None,
+        mask: Optional[np.ndarray] = None,
+        exclude: Optional[np.ndarray] = None,
+    ) -> list[tuple[int, float]]:
+        """Approximative Top-k Suche; Ergebnis wie ProjectStore.search.
+
+        ``mask`` filtert die Kandidaten vor der exakten Bewertung,
+        ``exclude`` (Zeilenpositionen) nimmt einzelne Zeilen aus.
+        """
+        self.sync(matrix)
+        order, offsets = self._lists()
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        candidates = np.concatenate([order[offsets[c] : offsets[c + 1]] for c in probe])
+        # Ein paralleler Aufruf kann den Index schon über diese Matrix hinaus
+        # synchronisiert haben
+        n = matrix.shape[0]
+        candidates = candidates[candidates < n]
+        mask = fit_mask(mask, n)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if exclude is not None and exclude.size:
+            candidates = candidates[~np.isin(candidates, exclude)]
+        if candidates.size == 0:
+            return []
+        # Sortiert lesen: bessere Lokalität im memmap
+        candidates.sort()
+
+        scores = np.asarray(matrix[candidates]) @ query
+        top = top_k(scores, k)
+        return [
+            (int(candidates[i]), float(scores[i])) for i in top if scores[i] > threshold
+        ]
+
+    def save(self, path: Path):
+        """Speichert Zentroiden und Zuordnungen (atomar ersetzt)"""
+        with self._lock:
+            tmp_path = path.with_suffix(".tmp.npz")
+            np.savez(
+                tmp_path,
+                centroids=self.centroids,
+                assignments=self.assignments,
+                trained_rows=np.array(self.trained_rows),
+            )
+            tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, nprobe: int) -> "IVFIndex":
+        data = np.load(path)
+        return cls(
+            data["centroids"], data["assignments"], nprobe, int(data["trained_rows"])
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    from app.local_store import LocalVectorStore
+
+    parser = argparse.ArgumentParser(
+        description="Baut den IVF-Index des lokalen Backends neu "
+        "(Server vorher stoppen)"
+    )
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument(
+        "--data-dir", default=os.getenv("RAGGADON_DATA_DIR", "~/.raggadon/data")
+    )
+    parser.add_argument("--project", help="Nur dieses Projekt (Standard: alle)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = LocalVectorStore(args.data_dir)
+    projects = [args.project] if args.project else store.list_projects()
+    for name in projects:
+        project_store = store.project_store(name)
+        if project_store.train_index(store.ann_nlist, store.ann_nprobe, force=True):
+            logger.info(
+                f"✅ {name}: {project_store.index.nlist} Listen, "
+                f"{project_store.index.size} Vektoren"
+            )
+        else:
+            logger.info(f"ℹ️ {name}: keine Vektoren")
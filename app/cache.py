@@ -0,0 +1,334 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Sequence
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional: ETags dann über Standard-JSON
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """LRU-Cache für Embeddings mit TTL, optional auf Disk persistiert.
+
+    Schlüssel ist ein SHA-256 Hash aus Modell und bereinigtem Text. Im
+    Speicher liegen die Vektoren als float32 Arrays; mit ``path`` werden sie
+    zusätzlich in einer SQLite-Datei abgelegt und überstehen Neustarts.
+    Lesen und Schreiben der Datei laufen in Threads, Schreibvorgänge
+    gebündelt im Hintergrund. Fehler der Datei (z.B. "database is locked"
+    bei mehreren Workern) werden geloggt und wie ein Cache-Miss behandelt.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.disk_errors = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        # Verbindung wird nur in Threads und jeweils unter diesem Lock benutzt
+        self._db_lock = threading.Lock()
+        self._pending: list[tuple[str, bytes, float]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        if path:
+            try:
+                Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(
+                    str(Path(path).expanduser()), check_same_thread=False, timeout=5.0
+                )
+                self._db.execute("PRAGMA busy_timeout=5000")
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                    "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, "
+                    "created_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(
+                    "⚠️ Persistenter Embedding Cache nicht verfügbar, nur im "
+                    f"Speicher: {str(e)}"
+                )
+                self._db = None
+        logger.info(
+            f"✅ Embedding Cache initialisiert ({max_size} Einträge, TTL "
+            f"{ttl_seconds}s)"
+        )
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Content-Hash aus Modell und Text"""
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    def _memory_get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, vector = entry
+            if self._expired(created_at):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _read_disk(self, keys: list[str]) -> dict[str, tuple[bytes, float]]:
+        """Liest Einträge aus SQLite (im Thread); Fehler liefern nichts"""
+        found = {}
+        try:
+            with self._db_lock:
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start : start + 500]
+                    rows = self._db.execute(
+                        "SELECT key, embedding, created_at FROM embedding_cache "
+                        f"WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    found.update(
+                        (key, (blob, created_at)) for key, blob, created_at in rows
+                    )
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning(f"⚠️ Embedding Cache (SQLite) nicht lesbar: {str(e)}")
+        return found
+
+    async def get_many(self, keys: Sequence[str]) -> list[Optional[np.ndarray]]:
+        """Embeddings (float32, schreibgeschützt) bzw. None je Schlüssel.
+
+        Zählt Hits und Misses.
+        """
+        vectors = [self._memory_get(key) for key in keys]
+        missing = [key for key, vector in zip(keys, vectors) if vector is None]
+        if missing and self._db is not None:
+            found = await asyncio.to_thread(self._read_disk, missing)
+            with self._lock:
+                for i, key in enumerate(keys):
+                    if vectors[i] is not None or key not in found:
+                        continue
+                    blob, created_at = found[key]
+                    if self._expired(created_at):
+                        continue
+                    vectors[i] = np.frombuffer(blob, dtype=np.float32)
+                    self._store(key, created_at, vectors[i])
+                    self.disk_hits += 1
+        with self._lock:
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    async def get(self, key: str) -> Optional[np.ndarray]:
+        """Embedding (float32, schreibgeschützt) oder None; zählt Hit/Miss"""
+        return (await self.get_many([key]))[0]
+
+    def set(self, key: str, embedding: Sequence[float]):
+        """Legt ein Embedding im Cache ab; die Datei wird im Hintergrund geschrieben"""
+        vector = np.array(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        created_at = time.time()
+        with self._lock:
+            self._store(key, created_at, vector)
+            if self._db is None:
+                return
+            self._pending.append((key, vector.tobytes(), created_at))
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                # Ohne Event-Loop (Skripte): beim nächsten flush() geschrieben
+                pass
+
+    def _write_disk(self, rows: list[tuple[str, bytes, float]]):
+        """Schreibt gesammelte Einträge in einer Transaktion (im Thread)"""
+        try:
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache VALUES (?, ?, ?)", rows
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning(
+                f"⚠️ {len(rows)} Einträge nicht in den Embedding Cache (SQLite) "
+                f"geschrieben: {str(e)}"
+            )
+            try:
+                with self._db_lock:
+                    self._db.rollback()
+            except sqlite3.Error:
+                pass
+
+    async def flush(self):
+        """Schreibt alle ausstehenden Einträge in die Datei"""
+        while self._db is not None:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            await asyncio.to_thread(self._write_disk, rows)
+
+    async def aclose(self):
+        """Schreibt ausstehende Einträge und schließt die Datei"""
+        await self.flush()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+    def _store(self, key: str, created_at: float, vector: np.ndarray):
+        vector.setflags(write=False)
+        self._entries[key] = (created_at, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/Miss-Zähler und Füllstand"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "disk_errors": self.disk_errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self._db is not None,
+        }
+
+
+# Projektschlüssel für Antworten über alle Projekte (ungültig nach jedem Schreiben)
+ALL_PROJECTS = "*"
+
+
+def make_etag(value: Any) -> str:
+    """Schwaches ETag aus dem Inhalt einer Antwort"""
+    if orjson is not None:
+        raw = orjson.dumps(
+            value, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    else:
+        raw = json.dumps(
+            value, sort_keys=True, separators=(",", ":"), default=str
+        ).encode("utf-8")
+    return f'W/"{hashlib.blake2b(raw, digest_size=16).hexdigest()}"'
+
+
+class ResponseCache:
+    """Kurzlebiger In-Process-Cache für fertige Antworten (Suche, Statistiken).
+
+    Schlüssel sind Namespace, Projekt, Generation und die Parameter der
+    Anfrage. ``invalidate(project)`` erhöht die Generation des Projekts (und
+    die von ``ALL_PROJECTS``), ältere Einträge werden nie mehr getroffen und
+    fallen per LRU heraus. Ergebnisse, deren Berechnung vor einem Schreiben
+    begonnen hat, werden mit der alten Generation verworfen. Läuft nur im
+    Event-Loop, daher ohne Lock.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # key -> (expires_at, etag, value)
+        self._entries: "OrderedDict[tuple, tuple[float, str, Any]]" = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._all_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        logger.info(f"✅ Response Cache initialisiert ({max_size} Einträge)")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def generation(self, project: str) -> int:
+        """Aktuelle Generation eines Projekts; vor der Berechnung merken"""
+        if project == ALL_PROJECTS:
+            return self._all_generation
+        return self._generations.get(project, 0)
+
+    def get(
+        self, namespace: str, project: str, params: Hashable
+    ) -> Optional[tuple[Any, str]]:
+        """Liefert (Antwort, ETag) oder None (zählt Hit/Miss)"""
+        if not self.enabled:
+            return None
+        key = (namespace, project, self.generation(project), params)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, etag, value = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value, etag
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(
+        self,
+        namespace: str,
+        project: str,
+        params: Hashable,
+        value: Any,
+        ttl_seconds: float,
+        generation: Optional[int] = None,
+    ) -> str:
+        """Legt eine Antwort ab und gibt ihr ETag zurück.
+
+        ``generation`` ist die vor der Berechnung gelesene Generation; wurde
+        das Projekt seitdem beschrieben, wird nichts gespeichert.
+        """
+        etag = make_etag(value)
+        current = self.generation(project)
+        if (
+            not self.enabled
+            or ttl_seconds <= 0
+            or (generation is not None and generation != current)
+        ):
+            return etag
+        key = (namespace, project, current, params)
+        self._entries[key] = (time.monotonic() + ttl_seconds, etag, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return etag
+
+    def invalidate(self, project: str):
+        """Verwirft die Antworten des Projekts und die Übersichten aller Projekte"""
+        self._generations[project] = self._generations.get(project, 0) + 1
+        self._all_generation += 1
+        self.invalidations += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/Miss-Zähler und Füllstand"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+        }
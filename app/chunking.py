@@ -0,0 +1,128 @@
+import logging
+import math
+import os
+import re
+from collections.abc import Iterator
+from typing import Callable, Optional
+
+from app.tokenizer import CHARS_PER_TOKEN, TokenCounter
+
+logger = logging.getLogger(__name__)
+
+# Wort inkl. folgendem Whitespace; die Segmente ergeben zusammen wieder den Text
+_SEGMENT_RE = re.compile(r"\S+\s*")
+_PARAGRAPH_END = re.compile(r"\n[ \t]*\n\s*$")
+_SENTENCE_END = re.compile(r"(?:[.!?:;]\s+|\n\s*)$")
+
+SegmentCounter = Callable[[str], float]
+
+
+def estimate_segment_tokens(segment: str) -> float:
+    """Anteilige Token-Schätzung für ein Segment (ohne +1 pro Wort)"""
+    return len(segment) / CHARS_PER_TOKEN
+
+
+def _iter_segments(
+    text: str, max_tokens: int, count_tokens: SegmentCounter
+) -> Iterator[tuple[str, float]]:
+    """Wörter mit ihren Tokens; überlange Wörter (Hashes, Base64) werden geteilt"""
+    for match in _SEGMENT_RE.finditer(text):
+        segment = match.group()
+        cost = count_tokens(segment)
+        if cost <= max_tokens:
+            yield segment, cost
+            continue
+        size = math.ceil(len(segment) / math.ceil(cost / max_tokens))
+        for start in range(0, len(segment), size):
+            piece = segment[start : start + size]
+            yield piece, count_tokens(piece)
+
+
+def _break_point(window: list[str], carried: int) -> int:
+    """Schnitt nach Absatz- oder Satzende in der hinteren Hälfte, sonst am Ende"""
+    lowest = max(carried + 1, len(window) // 2)
+    for pattern in (_PARAGRAPH_END, _SENTENCE_END):
+        for i in range(len(window) - 1, lowest - 2, -1):
+            if pattern.search(window[i]):
+                return i + 1
+    return len(window)
+
+
+def _overlap_start(costs: list[float], cut: int, overlap_tokens: float) -> int:
+    """Erstes Segment vor ``cut``, ab dem höchstens ``overlap_tokens`` übrig bleiben"""
+    start, carried = cut, 0.0
+    while start > 0 and carried + costs[start - 1] <= overlap_tokens:
+        start -= 1
+        carried += costs[start]
+    return start
+
+
+def iter_chunks(
+    text: str,
+    max_tokens: int,
+    overlap_tokens: int = 0,
+    count_tokens: SegmentCounter = estimate_segment_tokens,
+) -> Iterator[str]:
+    """Teilt Text in Chunks von höchstens ``max_tokens`` Tokens.
+
+    Geschnitten wird bevorzugt an Absatz- und Satzgrenzen. Jeder Chunk
+    beginnt mit bis zu ``overlap_tokens`` Tokens vom Ende des vorherigen.
+    Arbeitet als Generator über den Text, ohne alle Chunks vorzuhalten.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens muss größer als 0 sein")
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    window: list[str] = []
+    costs: list[float] = []
+    total = 0.0
+    # Anzahl der Segmente am Fensteranfang, die schon ausgegeben wurden
+    carried = 0
+    for segment, cost in _iter_segments(text, max_tokens, count_tokens):
+        while window and total + cost > max_tokens:
+            if len(window) <= carried:
+                # Nur Überlappung übrig: verwerfen statt doppelt ausgeben
+                window, costs, total, carried = [], [], 0.0, 0
+                break
+            cut = _break_point(window, carried)
+            yield "".join(window[:cut]).strip()
+            start = _overlap_start(costs, cut, overlap_tokens)
+            carried = cut - start
+            window, costs = window[start:], costs[start:]
+            total = sum(costs)
+        window.append(segment)
+        costs.append(cost)
+        total += cost
+
+    if len(window) > carried:
+        yield "".join(window).strip()
+
+
+class TextChunker:
+    """Chunking langer Inhalte vor dem Embedding (/save und Batch-Import).
+
+    Inhalte über ``max_tokens`` werden in überlappende Chunks geteilt, die
+    einzeln eingebettet und als Kind-Einträge des Dokuments gespeichert werden.
+    """
+
+    def __init__(self, tokenizer: Optional[TokenCounter] = None):
+        self.max_tokens = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+        self.overlap_tokens = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+        self.count_tokens: SegmentCounter = (
+            tokenizer.segment_counter()
+            if tokenizer is not None
+            else estimate_segment_tokens
+        )
+
+    def needs_chunking(self, text: str) -> bool:
+        return self.max_tokens > 0 and self.count_tokens(text) > self.max_tokens
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        return iter_chunks(
+            text, self.max_tokens, self.overlap_tokens, self.count_tokens
+        )
+
+    def split(self, text: str) -> list[str]:
+        chunks = [chunk for chunk in self.iter_chunks(text) if chunk]
+        logger.info(f"✂️ {len(text)} Zeichen in {len(chunks)} Chunks geteilt")
+        return chunks
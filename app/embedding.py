@@ -1,94 +1,283 @@
-import os
+import asyncio
 import logging
-from typing import Dict, Any, List
-from openai import AsyncOpenAI
+import os
+from typing import Any, Optional
+
+from app.cache import EmbeddingCache
+from app.embedding_providers import EmbeddingProvider, create_embedding_provider
+from app.embedding_scheduler import EmbeddingScheduler
+from app.metrics import timed
+from app.pricing import cost_for_tokens
+from app.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 
 class EmbeddingService:
-    def __init__(self):
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
-            raise ValueError("OPENAI_API_KEY muss gesetzt sein")
-        
-        self.client = AsyncOpenAI(api_key=self.api_key)
-        self.model = "text-embedding-3-small"
-        logger.info("✅ OpenAI Embedding Service initialisiert")
-
-    async def create_embedding(self, text: str) -> Dict[str, Any]:
-        """Erstellt ein Embedding für den gegebenen Text"""
+    def __init__(self, provider: Optional[EmbeddingProvider] = None):
+        # Provider per EMBEDDING_PROVIDER (openai | local | hash)
+        self.provider = provider or create_embedding_provider()
+        self.model = self.provider.model
+        self.max_input_tokens = self.provider.max_input_tokens
+        # Lokale Token-Zählung für Batch-Packing, Limits und Dry-Runs
+        self.tokenizer = self.provider.tokenizer
+        # Limits pro Embedding-Request und parallele Requests bei Batches
+        self.batch_max_tokens = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "50000"))
+        self.batch_max_inputs = int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", "512"))
+        self.batch_concurrency = int(os.getenv("EMBEDDING_BATCH_CONCURRENCY", "4"))
+
+        # Content-Hash Cache; EMBEDDING_CACHE_SIZE=0 deaktiviert ihn
+        cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "2000"))
+        self.cache: Optional[EmbeddingCache] = None
+        if cache_size > 0:
+            self.cache = EmbeddingCache(
+                max_size=cache_size,
+                ttl_seconds=float(os.getenv("EMBEDDING_CACHE_TTL", "86400")),
+                path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+            )
+        # Gleichzeitige Anfragen für denselben Text teilen sich einen API-Aufruf
+        self.flights = SingleFlight("embeddings")
+        # Einzelne Embeddings gleichzeitiger Requests gebündelt; Limit und
+        # Retries für alle Provider-Aufrufe. EMBEDDING_BATCH_WINDOW_MS=0 schickt sofort.
+        self.scheduler = EmbeddingScheduler(
+            self.provider,
+            window_ms=float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5")),
+            max_inputs=self.batch_max_inputs,
+            max_tokens=self.batch_max_tokens,
+            max_concurrency=int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8")),
+            max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", "3")),
+            retry_base_delay=float(os.getenv("EMBEDDING_RETRY_BASE_DELAY", "0.5")),
+        )
+        logger.info(
+            f"✅ Embedding Service initialisiert ({self.provider.name}: "
+            f"{self.model}, {self.provider.dimensions} Dimensionen)"
+        )
+
+    @staticmethod
+    def _clean_text(text: str) -> str:
+        """Entfernt Zeilenumbrüche und äußere Leerzeichen"""
+        return text.strip().replace("\n", " ").replace("\r", " ")
+
+    def estimate_tokens(self, text: str) -> int:
+        """Zählt die Tokens eines Textes lokal ohne API-Aufruf"""
+        return self.tokenizer.count(text)
+
+    def _checked_tokens(self, clean_text: str) -> int:
+        """Tokens eines bereinigten Textes.
+
+        Zu lange Texte werden schon vor dem Request abgelehnt.
+        """
+        tokens = self.estimate_tokens(clean_text)
+        if self.max_input_tokens is not None and tokens > self.max_input_tokens:
+            raise ValueError(
+                f"Text zu lang: {tokens} Tokens (Limit {self.max_input_tokens} für "
+                f"{self.model})"
+            )
+        return tokens
+
+    def estimate_embedding_tokens(self, texts: list[str]) -> int:
+        """Tokens, die das Einbetten der Texte kosten würde.
+
+        Cache-Treffer werden nicht abgezogen.
+        """
+        return sum(self._checked_tokens(self._clean_text(text)) for text in texts)
+
+    def _split_batches(self, token_counts: list[int]) -> list[list[int]]:
+        """Teilt Texte anhand ihrer Tokens in Batches, die die Limits einhalten"""
+        batches: list[list[int]] = []
+        current: list[int] = []
+        current_tokens = 0
+
+        for i, tokens in enumerate(token_counts):
+            if current and (
+                current_tokens + tokens > self.batch_max_tokens
+                or len(current) >= self.batch_max_inputs
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    @timed("embed")
+    async def create_embedding(self, text: str) -> dict[str, Any]:
+        """Erstellt ein Embedding für den gegebenen Text.
+
+        Läuft für denselben Text bereits ein Request, wird dessen Ergebnis
+        geteilt; die Tokens zählen nur beim ersten Aufruf.
+        """
         try:
             if not text or not text.strip():
                 raise ValueError("Text darf nicht leer sein")
-            
+
             # Bereinige den Text
-            clean_text = text.strip().replace("\n", " ").replace("\r", " ")
-            
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=clean_text,
-                encoding_format="float"
+            clean_text = self._clean_text(text)
+            estimated_tokens = self._checked_tokens(clean_text)
+
+            # Cache-Treffer kosten keine Tokens
+            cache_key = None
+            if self.cache is not None:
+                cache_key = EmbeddingCache.make_key(
+                    self.provider.cache_namespace, clean_text
+                )
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    logger.debug(
+                        "🧠 Embedding aus Cache für %d Zeichen", len(clean_text)
+                    )
+                    return {
+                        "embedding": cached,
+                        "tokens": 0,
+                        "model": self.model,
+                        "text_length": len(clean_text),
+                        "cached": True,
+                    }
+
+            async def embed():
+                embedding, tokens = await self.scheduler.embed(
+                    clean_text, estimated_tokens
+                )
+                if cache_key is not None:
+                    self.cache.set(cache_key, embedding)
+                return embedding, tokens
+
+            (embedding, tokens_used), shared = await self.flights.do(
+                (self.provider.cache_namespace, clean_text), embed
             )
-            
-            embedding = response.data[0].embedding
-            tokens_used = response.usage.total_tokens
-            
-            logger.info(f"🧠 Embedding erstellt: {tokens_used} Tokens für {len(clean_text)} Zeichen")
-            
+            if shared:
+                logger.debug(
+                    "🧠 Embedding von laufendem Request übernommen (%d Zeichen)",
+                    len(clean_text),
+                )
+                tokens_used = 0
+            else:
+                logger.debug(
+                    "🧠 Embedding erstellt: %d Tokens für %d Zeichen",
+                    tokens_used,
+                    len(clean_text),
+                )
+
             return {
                 "embedding": embedding,
                 "tokens": tokens_used,
                 "model": self.model,
-                "text_length": len(clean_text)
+                "text_length": len(clean_text),
+                "cached": False,
+                "coalesced": shared,
             }
-            
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Erstellen des Embeddings: {str(e)}")
             raise
 
-    async def create_batch_embeddings(self, texts: List[str]) -> List[Dict[str, Any]]:
-        """Erstellt Embeddings für mehrere Texte gleichzeitig"""
+    @timed("embed_batch")
+    async def create_batch_embeddings(self, texts: list[str]) -> dict[str, Any]:
+        """Erstellt Embeddings für mehrere Texte gleichzeitig.
+
+        Die Texte werden in token-begrenzte Batches aufgeteilt, die parallel
+        eingebettet werden. Die Reihenfolge der Ergebnisse entspricht der
+        Reihenfolge der Eingabe. Bereits gecachte Texte werden nicht erneut
+        angefragt und zählen nicht zu den Tokens.
+        """
         try:
             if not texts:
-                return []
-            
+                return {"embeddings": [], "tokens": 0, "model": self.model}
+
             # Bereinige alle Texte
-            clean_texts = [text.strip().replace("\n", " ").replace("\r", " ") for text in texts if text.strip()]
-            
-            if not clean_texts:
-                return []
-            
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=clean_texts,
-                encoding_format="float"
+            clean_texts = [self._clean_text(text) for text in texts]
+            if not all(clean_texts):
+                raise ValueError("Text darf nicht leer sein")
+
+            results: list[dict[str, Any]] = [{} for _ in clean_texts]
+            cache_keys: list[Optional[str]] = [None] * len(clean_texts)
+            misses = list(range(len(clean_texts)))
+            if self.cache is not None:
+                misses = []
+                cache_keys = [
+                    EmbeddingCache.make_key(self.provider.cache_namespace, clean_text)
+                    for clean_text in clean_texts
+                ]
+                for i, cached in enumerate(await self.cache.get_many(cache_keys)):
+                    clean_text = clean_texts[i]
+                    if cached is None:
+                        misses.append(i)
+                    else:
+                        results[i] = {
+                            "embedding": cached,
+                            "text": clean_text,
+                            "text_length": len(clean_text),
+                            "index": i,
+                            "cached": True,
+                        }
+
+            semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+            async def embed_batch(batch: list[int]):
+                async with semaphore:
+                    embedded = await self.scheduler.embed_now(
+                        [clean_texts[i] for i in batch]
+                    )
+                return batch, embedded
+
+            batches = [
+                [misses[j] for j in batch]
+                for batch in self._split_batches(
+                    [self._checked_tokens(clean_texts[i]) for i in misses]
+                )
+            ]
+            responses = await asyncio.gather(*(embed_batch(b) for b in batches))
+
+            total_tokens = 0
+            for batch, (embeddings, tokens) in responses:
+                total_tokens += tokens
+                for i, embedding in zip(batch, embeddings):
+                    results[i] = {
+                        "embedding": embedding,
+                        "text": clean_texts[i],
+                        "text_length": len(clean_texts[i]),
+                        "index": i,
+                        "cached": False,
+                    }
+                    if cache_keys[i] is not None:
+                        self.cache.set(cache_keys[i], embedding)
+
+            logger.info(
+                f"🧠 Batch Embeddings erstellt: {total_tokens} Tokens für "
+                f"{len(clean_texts)} Texte in {len(batches)} Requests "
+                f"({len(clean_texts) - len(misses)} aus Cache)"
             )
-            
-            results = []
-            for i, embedding_data in enumerate(response.data):
-                results.append({
-                    "embedding": embedding_data.embedding,
-                    "text": clean_texts[i],
-                    "text_length": len(clean_texts[i]),
-                    "index": i
-                })
-            
-            total_tokens = response.usage.total_tokens
-            logger.info(f"🧠 Batch Embeddings erstellt: {total_tokens} Tokens für {len(clean_texts)} Texte")
-            
-            return results
-            
+
+            return {
+                "embeddings": results,
+                "tokens": total_tokens,
+                "model": self.model,
+            }
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Erstellen der Batch Embeddings: {str(e)}")
             raise
 
     def get_embedding_dimensions(self) -> int:
         """Gibt die Dimensionen des verwendeten Embedding-Modells zurück"""
-        # text-embedding-3-small hat 1536 Dimensionen
-        return 1536
+        return self.provider.dimensions
 
     def calculate_cost(self, tokens: int) -> float:
-        """Berechnet die Kosten für die verwendeten Tokens"""
-        # text-embedding-3-small kostet $0.00002 per 1K tokens
-        return (tokens / 1000) * 0.00002
\ No newline at end of file
+        """Kosten für die verwendeten Tokens (Preistabelle in app.pricing)"""
+        return cost_for_tokens(tokens, self.model)
+
+    async def warmup(self):
+        """Initialisiert den Provider vor dem ersten Request.
+
+        Bei OpenAI nur das SDK, ohne API-Aufruf.
+        """
+        await self.provider.warmup()
+
+    async def aclose(self):
+        """Schließt den Provider (HTTP-Client bzw. ONNX-Session) und den Cache"""
+        await self.scheduler.drain()
+        await self.provider.aclose()
+        if self.cache is not None:
+            await self.cache.aclose()
@@ -0,0 +1,289 @@
+import asyncio
+import base64
+import hashlib
+import importlib
+import logging
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.lexical import tokenize
+from app.pricing import DEFAULT_EMBEDDING_MODEL, model_info
+from app.tokenizer import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+# Standardmodelle der lokalen Provider (Einträge in app.pricing)
+DEFAULT_LOCAL_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_HASH_MODEL = "hash-embedding"
+
+
+class EmbeddingProvider(ABC):
+    """Schnittstelle zu einem Embedding-Modell.
+
+    Implementierungen: ``OpenAIProvider`` (API), ``LocalOnnxProvider``
+    (Sentence-Transformer per ONNX Runtime auf der CPU) und ``HashProvider``
+    (deterministisch, ohne Netz, für Benchmarks und CI). Caching, Batching
+    und Limits übernimmt ``EmbeddingService``.
+    """
+
+    name = "abstract"
+
+    def __init__(self, model: str, dimensions: Optional[int] = None):
+        info = model_info(model)
+        self.model = model
+        self.native_dimensions = info["dimensions"]
+        self.dimensions = dimensions or self.native_dimensions
+        # None: das Modell kürzt zu lange Eingaben selbst
+        self.max_input_tokens: Optional[int] = info["max_input_tokens"]
+        self.tokenizer = TokenCounter(model, use_tiktoken=self.name == "openai")
+
+    @property
+    def cache_namespace(self) -> str:
+        """Modellkennung für Cache-Schlüssel (Dimension nur, wenn sie abweicht)"""
+        if self.dimensions == self.native_dimensions:
+            return self.model
+        return f"{self.model}@{self.dimensions}"
+
+    @abstractmethod
+    async def embed(self, texts: list[str]) -> tuple[list[np.ndarray], int]:
+        """Embeddings (float32) und verbrauchte Tokens.
+
+        Die Embeddings stehen in der Reihenfolge der bereinigten Texte.
+        """
+
+    def is_rate_limit(self, error: Exception) -> bool:
+        """Fehler durch ein Rate-Limit des Anbieters (HTTP 429)"""
+        return False
+
+    def is_transient(self, error: Exception) -> bool:
+        """Vorübergehender Fehler (Timeout, Verbindung, 5xx).
+
+        Ein neuer Versuch lohnt sich.
+        """
+        return False
+
+    async def warmup(self):
+        """Initialisiert das Modell vor dem ersten Request (Standard: nichts zu tun)"""
+        return None
+
+    async def aclose(self):
+        """Gibt Clients und Sessions frei (Standard: nichts zu tun)"""
+        return None
+
+
+class OpenAIProvider(EmbeddingProvider):
+    """Embeddings über die OpenAI API.
+
+    ``dimensions`` fordert bei text-embedding-3 Modellen gekürzte (und von
+    der API neu normierte) Embeddings an. Die Vektoren werden base64-kodiert
+    übertragen und direkt als float32-Arrays gelesen, statt 1536 Zahlen aus
+    JSON zu parsen. Retries übernimmt der ``EmbeddingScheduler``, der Client
+    selbst wiederholt nicht. Das SDK wird erst beim Warm-up bzw. beim ersten
+    Aufruf geladen.
+    """
+
+    name = "openai"
+
+    def __init__(
+        self, model: str = DEFAULT_EMBEDDING_MODEL, dimensions: Optional[int] = None
+    ):
+        super().__init__(model, dimensions)
+        if self.dimensions != self.native_dimensions:
+            if not model_info(model).get("shortenable"):
+                raise ValueError(
+                    f"{model} unterstützt keine gekürzten Embeddings "
+                    "(EMBEDDING_DIMENSIONS)"
+                )
+            if not 0 < self.dimensions < self.native_dimensions:
+                raise ValueError(
+                    "EMBEDDING_DIMENSIONS muss zwischen 1 und "
+                    f"{self.native_dimensions} liegen"
+                )
+        self.api_key = os.getenv("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError("OPENAI_API_KEY muss gesetzt sein")
+        self._client = None
+
+    def _ensure_client(self):
+        """AsyncOpenAI-Client, beim ersten Aufruf erstellt"""
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=self.api_key, max_retries=0)
+        return self._client
+
+    async def embed(self, texts: list[str]) -> tuple[list[np.ndarray], int]:
+        # openai 1.3.x kennt den Parameter noch nicht: direkt in den Body
+        extra_body = None
+        if self.dimensions != self.native_dimensions:
+            extra_body = {"dimensions": self.dimensions}
+        response = await self._ensure_client().embeddings.create(
+            model=self.model,
+            input=texts,
+            encoding_format="base64",
+            extra_body=extra_body,
+        )
+        embeddings: list[np.ndarray] = [None] * len(texts)
+        for embedding_data in response.data:
+            # Little-endian float32; das Array nutzt den dekodierten Puffer ohne Kopie
+            embeddings[embedding_data.index] = np.frombuffer(
+                base64.b64decode(embedding_data.embedding), dtype="<f4"
+            )
+        return embeddings, response.usage.total_tokens
+
+    def is_rate_limit(self, error: Exception) -> bool:
+        import openai
+
+        return isinstance(error, openai.RateLimitError)
+
+    def is_transient(self, error: Exception) -> bool:
+        import openai
+
+        return isinstance(
+            error,
+            (
+                openai.APITimeoutError,
+                openai.APIConnectionError,
+                openai.InternalServerError,
+            ),
+        )
+
+    async def warmup(self):
+        # Das SDK lädt langsam: im Thread importieren, der Event-Loop bleibt frei
+        await asyncio.to_thread(importlib.import_module, "openai")
+        self._ensure_client()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+
+
+class LocalOnnxProvider(EmbeddingProvider):
+    """Sentence-Transformer (z.B. all-MiniLM-L6-v2) per ONNX Runtime auf der CPU.
+
+    ``model_dir`` enthält den ONNX-Export (``model.onnx``) und die
+    ``tokenizer.json`` des Modells. Embeddings sind mean-gepoolt und
+    L2-normalisiert wie bei sentence-transformers; zu lange Texte werden auf
+    ``max_seq_length`` Tokens gekürzt. Benötigt ``onnxruntime`` und
+    ``tokenizers``.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_dir: str,
+        model: str = DEFAULT_LOCAL_MODEL,
+        max_seq_length: int = 256,
+    ):
+        super().__init__(model)
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ValueError(
+                "Lokaler Embedding-Provider benötigt onnxruntime und "
+                f"tokenizers: {str(e)}"
+            ) from e
+
+        path = Path(model_dir).expanduser()
+        self._tokenizer = Tokenizer.from_file(str(path / "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=max_seq_length)
+        self._tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = int(os.getenv("EMBEDDING_LOCAL_THREADS", "0"))
+        self._session = onnxruntime.InferenceSession(
+            str(path / "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        logger.info(f"✅ Lokales Embedding-Modell geladen: {path}")
+
+    def _embed_sync(self, texts: list[str]) -> tuple[list[np.ndarray], int]:
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        hidden = self._session.run(None, inputs)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return list(pooled.astype(np.float32)), int(attention_mask.sum())
+
+    async def embed(self, texts: list[str]) -> tuple[list[np.ndarray], int]:
+        # Inferenz blockiert die CPU: im Thread, damit der Event-Loop frei bleibt
+        return await asyncio.to_thread(self._embed_sync, texts)
+
+    async def warmup(self):
+        # Die erste Inferenz legt Speicher-Arenen und Thread-Pool der Session an
+        await self.embed(["warmup"])
+
+
+class HashProvider(EmbeddingProvider):
+    """Deterministische Embeddings per Feature-Hashing, ohne Netz und Kosten.
+
+    Jedes Wort (siehe ``app.lexical.tokenize``) landet mit Vorzeichen in
+    einem Hash-Bucket, der Vektor wird L2-normalisiert. Gleiche Texte
+    ergeben gleiche Vektoren, Texte mit gemeinsamen Wörtern sind ähnlich.
+    Für Lasttests, Benchmarks und CI gedacht.
+    """
+
+    name = "hash"
+
+    def __init__(
+        self, model: str = DEFAULT_HASH_MODEL, dimensions: Optional[int] = None
+    ):
+        super().__init__(model, dimensions)
+
+    def embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in tokenize(text):
+            h = int.from_bytes(
+                hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            vector[h % self.dimensions] += 1.0 if h >> 63 else -1.0
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            # Text ohne Wörter: fester Bucket aus dem ganzen Text
+            h = int.from_bytes(
+                hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            vector[h % self.dimensions] = 1.0
+            return vector
+        return vector / norm
+
+    async def embed(self, texts: list[str]) -> tuple[list[np.ndarray], int]:
+        embeddings = [self.embed_one(text) for text in texts]
+        return embeddings, sum(self.tokenizer.count(text) for text in texts)
+
+
+def create_embedding_provider() -> EmbeddingProvider:
+    """Erstellt den per EMBEDDING_PROVIDER gewählten Provider (openai | local | hash)"""
+    provider = os.getenv("EMBEDDING_PROVIDER", "openai").strip().lower()
+    model = os.getenv("EMBEDDING_MODEL") or None
+    dimensions = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+
+    if provider == "openai":
+        return OpenAIProvider(model or DEFAULT_EMBEDDING_MODEL, dimensions)
+
+    if provider == "local":
+        model_dir = os.getenv("EMBEDDING_LOCAL_MODEL_DIR")
+        if not model_dir:
+            raise ValueError(
+                "EMBEDDING_LOCAL_MODEL_DIR muss für den lokalen Provider gesetzt sein"
+            )
+        return LocalOnnxProvider(model_dir, model or DEFAULT_LOCAL_MODEL)
+
+    if provider == "hash":
+        return HashProvider(model or DEFAULT_HASH_MODEL, dimensions)
+
+    raise ValueError(
+        f"Unbekannter Embedding-Provider: {provider} (erlaubt: openai, local, hash)"
+    )
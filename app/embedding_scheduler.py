@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import random
+from collections import deque
+from typing import Any, Optional
+
+import numpy as np
+
+from app.embedding_providers import EmbeddingProvider
+from app.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Obergrenze für eine einzelne Wartezeit zwischen zwei Versuchen (Sekunden)
+MAX_RETRY_DELAY = 30.0
+
+
+def split_tokens(total: int, weights: list[int]) -> list[int]:
+    """Verteilt die Tokens eines Batch-Aufrufs anteilig auf die Texte.
+
+    Anteile nach den lokal gezählten Tokens; Rundungsreste gehen an die
+    größten Texte, die Summe bleibt exakt ``total``.
+    """
+    if not weights:
+        return []
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        weights, weight_sum = [1] * len(weights), len(weights)
+    shares = [total * weight // weight_sum for weight in weights]
+    remainder = total - sum(shares)
+    for i in sorted(range(len(weights)), key=lambda i: weights[i], reverse=True)[
+        :remainder
+    ]:
+        shares[i] += 1
+    return shares
+
+
+class EmbeddingScheduler:
+    """Bündelt einzelne Embedding-Anfragen gleichzeitiger Requests.
+
+    Anfragen werden bis zu ``window_ms`` Millisekunden (das Latenzbudget)
+    gesammelt oder bis ``max_inputs`` Texte bzw. ``max_tokens`` Tokens
+    erreicht sind und dann als ein Provider-Aufruf verschickt; die
+    Ergebnisse gehen an die wartenden Aufrufer zurück. Die Tokens des
+    Aufrufs werden anteilig verteilt.
+
+    Alle Provider-Aufrufe (auch ``embed_now`` für Batch-Importe) teilen sich
+    ein Limit gleichzeitiger Requests. Bei Rate-Limits halbiert es sich und
+    wächst mit jedem Erfolg wieder um eins bis ``max_concurrency``.
+    Rate-Limits und vorübergehende Fehler werden mit exponentiellem Backoff
+    (plus Jitter, Retry-After wird beachtet) bis zu ``max_retries`` Mal
+    wiederholt.
+    """
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        window_ms: float,
+        max_inputs: int,
+        max_tokens: int,
+        max_concurrency: int,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.5,
+    ):
+        self.provider = provider
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_inputs = max(max_inputs, 1)
+        self.max_tokens = max_tokens
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+
+        # (Text, Tokens, Future) der nächsten Sammlung
+        self._pending: list[tuple[str, int, "asyncio.Future"]] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._dispatches: set["asyncio.Task"] = set()
+
+        self._limit = self.max_concurrency
+        self._active = 0
+        self._waiters: deque["asyncio.Future"] = deque()
+
+        self.requests = 0
+        self.batches = 0
+        self.batched_inputs = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def embed(self, text: str, tokens: int) -> tuple[np.ndarray, int]:
+        """Embedding eines bereinigten Textes und sein Anteil an den Tokens"""
+        self.requests += 1
+        if not self.enabled:
+            embeddings, used = await self.embed_now([text])
+            return embeddings[0], used
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if self._pending and (
+            len(self._pending) >= self.max_inputs
+            or self._pending_tokens + tokens > self.max_tokens
+        ):
+            self._flush()
+        self._pending.append((text, tokens, future))
+        self._pending_tokens += tokens
+        if len(self._pending) >= self.max_inputs:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        """Verschickt die aktuelle Sammlung als eigenen Task"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: list[tuple[str, int, "asyncio.Future"]]):
+        # Abgebrochene Aufrufer nicht mehr mitschicken
+        batch = [item for item in batch if not item[2].done()]
+        if not batch:
+            return
+        try:
+            embeddings, tokens = await self.embed_now([text for text, _, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        shares = split_tokens(tokens, [count for _, count, _ in batch])
+        for (_, _, future), embedding, share in zip(batch, embeddings, shares):
+            if not future.done():
+                future.set_result((embedding, share))
+
+    @timed("embed_api")
+    async def embed_now(self, texts: list[str]) -> tuple[list[np.ndarray], int]:
+        """Ein Provider-Aufruf ohne Sammelfenster, mit Limit und Retries"""
+        attempt = 0
+        while True:
+            await self._acquire()
+            try:
+                result = await self.provider.embed(texts)
+            except Exception as e:
+                error = e
+            else:
+                if self._limit < self.max_concurrency:
+                    self._limit += 1
+                self.batches += 1
+                self.batched_inputs += len(texts)
+                return result
+            finally:
+                self._release()
+
+            rate_limited = self.provider.is_rate_limit(error)
+            if rate_limited:
+                self.rate_limited += 1
+                self._limit = max(1, self._limit // 2)
+            if attempt >= self.max_retries or not (
+                rate_limited or self.provider.is_transient(error)
+            ):
+                self.failures += 1
+                raise error
+            delay = self._retry_delay(attempt, error)
+            attempt += 1
+            self.retries += 1
+            logger.warning(
+                f"⚠️ Embedding-Request fehlgeschlagen ({type(error).__name__}), "
+                f"Versuch {attempt}/{self.max_retries} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Exponentieller Backoff mit Jitter, mindestens Retry-After"""
+        delay = self.retry_base_delay * (2**attempt) * random.uniform(0.5, 1.5)
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            delay = max(delay, float(headers.get("retry-after", 0)))
+        except (TypeError, ValueError):
+            pass
+        return min(delay, MAX_RETRY_DELAY)
+
+    async def _acquire(self):
+        while self._active >= self._limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                # Bereits geweckt: den freien Platz an den Nächsten weitergeben
+                self._wake()
+                raise
+        self._active += 1
+
+    def _release(self):
+        self._active -= 1
+        self._wake()
+
+    def _wake(self):
+        free = self._limit - self._active
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def drain(self):
+        """Verschickt die offene Sammlung und wartet auf laufende Aufrufe"""
+        self._flush()
+        if self._dispatches:
+            await asyncio.gather(*self._dispatches, return_exceptions=True)
+
+    def stats(self) -> dict[str, Any]:
+        """Sammelfenster, Batch-Größen, Retries und aktuelles Parallelitätslimit"""
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000,
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_inputs / self.batches, 2)
+            if self.batches
+            else 0.0,
+            "pending": len(self._pending),
+            "active_requests": self._active,
+            "concurrency_limit": self._limit,
+            "max_concurrency": self.max_concurrency,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+        }
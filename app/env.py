@@ -0,0 +1,15 @@
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+
+def load_environment():
+    """Lädt die globale Config (~/.raggadon.env), sonst eine lokale .env.
+
+    Bereits gesetzte Umgebungsvariablen haben Vorrang.
+    """
+    global_env = Path.home() / ".raggadon.env"
+    if global_env.exists():
+        load_dotenv(global_env)
+    else:
+        load_dotenv()  # Fallback auf lokale .env
@@ -0,0 +1,61 @@
+"""Auswertung von Claude-Code-Hook-Inhalten.
+
+Gemeinsam genutzt vom Endpoint ``/hook/save`` im laufenden Server und von
+``claude_auto_rag.py``; nur Standardbibliothek, damit der Import billig bleibt.
+"""
+
+import os
+
+# Muster, bei denen ein Hook-Inhalt gespeichert wird
+# fmt: off
+IMPORTANT_PATTERNS = (
+    "class ", "def ", "function ",  # Code-Definitionen
+    "API", "endpoint", "route",     # API-Infos
+    "database", "schema", "model",  # Datenbank
+    "config", "environment",        # Konfiguration
+    "TODO", "FIXME", "IMPORTANT",   # Wichtige Notizen
+    "architecture", "struktur",     # Architektur
+    "dependency", "requirement",    # Dependencies
+    "error", "bug", "issue",        # Probleme
+)
+# fmt: on
+DEFINITION_KEYWORDS = ("class ", "def ", "function ", "const ", "interface ")
+NOTE_MARKERS = ("TODO", "FIXME", "IMPORTANT", "NOTE")
+ROUTE_MARKERS = ("@app.", "@router.", "app.get", "app.post")
+
+RAG_CONFIG_PATH = "~/.rag_config"
+DEFAULT_RAG_MODE = "active"
+
+
+def should_save(content: str) -> bool:
+    """Entscheidet, ob ein Hook-Inhalt gespeichert werden soll"""
+    content_lower = content.lower()
+    return any(pattern in content_lower for pattern in IMPORTANT_PATTERNS)
+
+
+def extract_key_info(content: str) -> list[str]:
+    """Definitionen (mit 2 Folgezeilen), Notizen und Routen (mit 4 Folgezeilen)"""
+    lines = content.split("\n")
+    key_info = []
+    for i, line in enumerate(lines):
+        if any(keyword in line for keyword in DEFINITION_KEYWORDS):
+            key_info.append("\n".join(lines[i : i + 3]))
+        elif any(marker in line.upper() for marker in NOTE_MARKERS):
+            key_info.append(line.strip())
+        elif any(marker in line for marker in ROUTE_MARKERS):
+            key_info.append("\n".join(lines[i : i + 5]))
+    return key_info
+
+
+def read_rag_mode(path: str = RAG_CONFIG_PATH) -> str:
+    """Aktueller RAG-Modus (active, silent, ask); altes "verbose" wird zu "active" """
+    config_file = os.path.expanduser(path)
+    if not os.path.exists(config_file):
+        return DEFAULT_RAG_MODE
+    with open(config_file, encoding="utf-8") as f:
+        mode = f.read().strip()
+    if mode == "verbose":
+        mode = DEFAULT_RAG_MODE
+        with open(config_file, "w", encoding="utf-8") as f:
+            f.write(mode)
+    return mode or DEFAULT_RAG_MODE
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import socket
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Projektnamen sind kurz; längere Nachrichten werden nicht verschickt
+MAX_MESSAGE_BYTES = 4096
+
+
+class InvalidationBus:
+    """Verteilt Cache-Invalidierungen an die anderen Worker-Prozesse.
+
+    Jeder Worker bindet einen Unix-Datagram-Socket ``worker-<pid>.sock`` in
+    ``ipc_dir``. ``publish(project)`` schickt den Projektnamen an alle
+    anderen Sockets im Verzeichnis, ankommende Namen gehen im Event-Loop an
+    ``handler``. Zustellung ist best effort: ist der Puffer eines Workers
+    voll, wird die Nachricht verworfen und die TTL des Caches greift.
+    Sockets beendeter Worker werden beim nächsten Senden entfernt.
+    """
+
+    def __init__(self, ipc_dir: Optional[str], handler: Callable[[str], None]):
+        self.ipc_dir = Path(ipc_dir) if ipc_dir else None
+        self.handler = handler
+        self.path: Optional[Path] = None
+        self._sock: Optional[socket.socket] = None
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._sock is not None
+
+    def start(self):
+        """Bindet den Socket dieses Workers und registriert ihn im Event-Loop"""
+        if self.ipc_dir is None or self._sock is not None:
+            return
+        if not hasattr(socket, "AF_UNIX"):
+            logger.warning(
+                "⚠️ RAGGADON_IPC_DIR gesetzt, aber Unix-Sockets werden nicht unterstützt"
+            )
+            return
+        try:
+            self.ipc_dir.mkdir(parents=True, exist_ok=True)
+            self.path = self.ipc_dir / f"worker-{os.getpid()}.sock"
+            if self.path.exists():
+                self.path.unlink()
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            sock.bind(str(self.path))
+        except OSError as e:
+            logger.error(f"❌ IPC-Socket in {self.ipc_dir} nicht verfügbar: {str(e)}")
+            self.path = None
+            return
+        self._sock = sock
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._receive)
+        logger.info(f"✅ Cache-Invalidierung zwischen Workern über {self.path}")
+
+    def publish(self, project: str):
+        """Schickt eine Invalidierung an alle anderen Worker (blockiert nicht)"""
+        if self._sock is None:
+            return
+        message = project.encode("utf-8")
+        if len(message) > MAX_MESSAGE_BYTES:
+            self.dropped += 1
+            return
+        try:
+            peers = [
+                entry.path
+                for entry in os.scandir(self.ipc_dir)
+                if entry.name.endswith(".sock")
+            ]
+        except OSError:
+            return
+        for peer in peers:
+            if peer == str(self.path):
+                continue
+            try:
+                self._sock.sendto(message, peer)
+                self.sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker beendet: verwaisten Socket aufräumen
+                try:
+                    os.unlink(peer)
+                except OSError:
+                    pass
+            except OSError:
+                # Puffer des Empfängers voll (BlockingIOError) o.ä.
+                self.dropped += 1
+
+    def _receive(self):
+        while True:
+            try:
+                data = self._sock.recv(MAX_MESSAGE_BYTES)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.warning(f"⚠️ IPC-Empfang fehlgeschlagen: {str(e)}")
+                return
+            self.received += 1
+            try:
+                self.handler(data.decode("utf-8"))
+            except Exception as e:
+                logger.error(f"❌ Fehler bei der Cache-Invalidierung: {str(e)}")
+
+    def close(self):
+        """Meldet den Socket ab und entfernt die Datei"""
+        if self._sock is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        except RuntimeError:
+            pass
+        self._sock.close()
+        self._sock = None
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+    def stats(self) -> dict[str, Any]:
+        """Zustellungen an andere Worker, empfangene und verworfene Nachrichten"""
+        return {
+            "enabled": self.enabled,
+            "pid": os.getpid(),
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+        }
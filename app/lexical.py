@@ -0,0 +1,124 @@
+import math
+import re
+import threading
+from collections.abc import Sequence
+from typing import Any, Optional
+
+import numpy as np
+
+from app.ann import fit_mask, top_k
+
+# Wörter inkl. Unterstrich, damit Bezeichner wie create_embedding ganz bleiben
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Standard-Konstante der Reciprocal Rank Fusion (Cormack et al.)
+RRF_K = 60
+
+
+def tokenize(text: str) -> list[str]:
+    """Kleingeschriebene Tokens; Bezeichner zusätzlich in ihre Teile zerlegt"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if "_" in token:
+            tokens.extend(part for part in token.split("_") if part)
+    return tokens
+
+
+class InvertedIndex:
+    """BM25-Volltextindex für das lokale Backend.
+
+    Hält pro Token eine Posting-Liste (Zeile, Häufigkeit) im Speicher. Wie
+    beim IVF-Index werden neue Zeilen per ``sync`` inkrementell aufgenommen.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, tuple[list[int], list[int]]] = {}
+        self.doc_lengths: list[int] = []
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self.doc_lengths)
+
+    def sync(self, rows: Sequence[dict[str, Any]]):
+        """Indiziert den Content der Zeilen, die seit dem letzten Aufruf hinzukamen"""
+        with self._lock:
+            for row_id in range(self.size, len(rows)):
+                tokens = tokenize(rows[row_id].get("content") or "")
+                counts: dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, tf in counts.items():
+                    ids, tfs = self.postings.setdefault(token, ([], []))
+                    ids.append(row_id)
+                    tfs.append(tf)
+                self.doc_lengths.append(len(tokens))
+                self.total_length += len(tokens)
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+        exclude: Optional[np.ndarray] = None,
+    ) -> list[tuple[int, float]]:
+        """Top-k Zeilen nach BM25-Score (mindestens ein Query-Token muss vorkommen).
+
+        ``mask`` wählt Zeilen aus, ``exclude`` (Zeilenpositionen) nimmt einzelne aus.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n = self.size
+            if n == 0 or not terms:
+                return []
+            lists = [
+                (
+                    np.array(self.postings[t][0]),
+                    np.array(self.postings[t][1], dtype=np.float32),
+                )
+                for t in terms
+                if t in self.postings
+            ]
+            doc_lengths = np.array(self.doc_lengths, dtype=np.float32)
+            avg_length = self.total_length / n or 1.0
+
+        scores = np.zeros(n, dtype=np.float32)
+        norms = self.k1 * (1 - self.b + self.b * doc_lengths / avg_length)
+        for ids, tfs in lists:
+            idf = math.log(1 + (n - ids.shape[0] + 0.5) / (ids.shape[0] + 0.5))
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norms[ids])
+
+        matched = scores > 0
+        if mask is not None:
+            matched &= fit_mask(mask, n)
+        if exclude is not None:
+            matched[exclude[exclude < n]] = False
+        candidates = np.flatnonzero(matched)
+        if candidates.size == 0:
+            return []
+        top = top_k(scores[candidates], k)
+        return [(int(candidates[i]), float(scores[candidates[i]])) for i in top]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[list[dict[str, Any]]], limit: int, k: int = RRF_K
+) -> list[dict[str, Any]]:
+    """Führt mehrere Ergebnislisten per Reciprocal Rank Fusion zusammen.
+
+    Jeder Treffer bekommt ``score = Σ 1 / (k + Rang)`` über alle Listen, in
+    denen er vorkommt. Felder aus späteren Listen ergänzen frühere
+    (z.B. ``similarity`` und ``lexical_score``).
+    """
+    fused: dict[Any, dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            entry = fused.setdefault(item["id"], {"score": 0.0})
+            for key, value in item.items():
+                entry.setdefault(key, value)
+            entry["score"] += 1.0 / (k + rank)
+    ordered = sorted(fused.values(), key=lambda item: item["score"], reverse=True)
+    return ordered[:limit]
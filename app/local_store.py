@@ -0,0 +1,1052 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from app.ann import IVFIndex, fit_mask, top_k
+from app.lexical import InvertedIndex
+from app.metrics import timed
+from app.quantization import approximate_scores, check_quantization, code_width, encode
+from app.storage import (
+    DEFAULT_MATCH_THRESHOLD,
+    StorageBackend,
+    content_hash,
+    to_utc,
+    truncate_content,
+)
+
+logger = logging.getLogger(__name__)
+
+# Anzahl der Usage-Events pro Projekt, die für "recent activities" im Speicher bleiben
+RECENT_USAGE_SIZE = 100
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def count_top_level(rows: list[dict[str, Any]]) -> int:
+    """Anzahl der Einträge ohne Chunk-Zeilen (nur Zeilen ohne ``parent_id``)"""
+    return sum(1 for row in rows if "parent_id" not in row)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Normiert Zeilen auf Länge 1, damit Cosine Similarity ein Skalarprodukt ist"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class ProjectStore:
+    """Einträge eines Projekts auf der Platte.
+
+    ``vectors.f32`` enthält die normierten Embeddings als zusammenhängende
+    float32-Matrix (Zeile i gehört zu Zeile i in ``rows.jsonl``) und wird per
+    memmap gelesen. Neue Einträge werden an beide Dateien angehängt. Ab
+    ``ann_min_rows`` Zeilen sucht ein IVF-Index (``ivf.npz``) statt des
+    vollständigen Scans. ``seen.jsonl`` protokolliert ``last_seen`` erneut
+    gespeicherter Duplikate.
+
+    Gechunkte Dokumente: die Eltern-Zeile (``chunk_count``) bekommt einen
+    Null-Vektor und wird von allen Suchen ausgeschlossen, die Chunks folgen
+    direkt dahinter mit ``parent_id`` und ``chunk_index``.
+
+    Mit ``quantization`` (halfvec, int8, binary) scannt die exakte Suche
+    quantisierte Codes (``vectors.<modus>``, aus ``vectors.f32`` abgeleitet
+    und inkrementell nachgezogen) und bewertet nur die besten
+    ``limit * rerank_factor`` Kandidaten mit den float32-Vektoren neu.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ann_min_rows: int,
+        ann_nprobe: int,
+        quantization: str = "none",
+        rerank_factor: int = 4,
+    ):
+        self.path = path
+        self.rows_path = path / "rows.jsonl"
+        self.vectors_path = path / "vectors.f32"
+        self.info_path = path / "store.json"
+        self.index_path = path / "ivf.npz"
+        self.seen_path = path / "seen.jsonl"
+        self.quantization = check_quantization(quantization)
+        self.rerank_factor = max(1, rerank_factor)
+        self.codes_path = path / f"vectors.{self.quantization}"
+        self.ann_min_rows = ann_min_rows
+        self.rows: list[dict[str, Any]] = []
+        self.dim: Optional[int] = None
+        self.index: Optional[IVFIndex] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._codes: Optional[np.ndarray] = None
+        # Filter-Spalten als Arrays, inkrementell um neue Zeilen erweitert;
+        # Suchen laufen in Threads außerhalb des Projekt-Locks
+        self._columns_lock = threading.Lock()
+        self._roles = np.empty(0, dtype=object)
+        self._created = np.empty(0, dtype=np.float64)
+        self._searchable = np.empty(0, dtype=bool)
+        # Positionen der Eltern-Zeilen gechunkter Dokumente (nie Treffer)
+        self._parents = np.empty(0, dtype=np.int64)
+        # Volltextindex, beim ersten lexikalischen Suchen im Speicher aufgebaut
+        self._lexical: Optional[InvertedIndex] = None
+        # Content-Hash -> Zeile (erste Vorkommen), inkrementell nachgezogen
+        self._hashes: dict[str, int] = {}
+        self._hashed = 0
+        self._ids: dict[str, int] = {}
+        self._load()
+        if self.index_path.exists():
+            self.index = IVFIndex.load(self.index_path, ann_nprobe)
+            # Zuordnungen für Zeilen, die nach dem Abbruch verworfen wurden
+            if self.index.size > len(self.rows):
+                self.index = None
+
+    def _load(self):
+        if self.info_path.exists():
+            self.dim = json.loads(self.info_path.read_text())["dim"]
+
+        if self.rows_path.exists():
+            with open(self.rows_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        self.rows.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Abgebrochener Schreibvorgang: Rest verwerfen
+                        break
+
+        # Vektoren werden vor den Metadaten geschrieben; nach einem Abbruch
+        # auf den gemeinsamen Stand kürzen
+        if self.dim:
+            row_bytes = self.dim * 4
+            n_vectors = (
+                self.vectors_path.stat().st_size // row_bytes
+                if self.vectors_path.exists()
+                else 0
+            )
+            if len(self.rows) > n_vectors:
+                self.rows = self.rows[:n_vectors]
+                self._rewrite_rows()
+            if n_vectors > len(self.rows):
+                with open(self.vectors_path, "r+b") as f:
+                    f.truncate(len(self.rows) * row_bytes)
+
+        if self.seen_path.exists():
+            by_id = {row["id"]: row for row in self.rows}
+            with open(self.seen_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if event["id"] in by_id:
+                        by_id[event["id"]]["last_seen"] = event["last_seen"]
+
+    def _rewrite_rows(self):
+        tmp_path = self.rows_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(
+                json.dumps(row, ensure_ascii=False) + "\n" for row in self.rows
+            )
+        os.replace(tmp_path, self.rows_path)
+
+    def matrix(self) -> np.ndarray:
+        """Memmap der Vektoren (n x dim), neu gemappt wenn Zeilen hinzukamen"""
+        n = len(self.rows)
+        if n == 0 or self.dim is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        if self._matrix is None or self._matrix.shape[0] != n:
+            self._matrix = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim)
+            )
+        return self._matrix
+
+    def codes(self) -> np.ndarray:
+        """Memmap der quantisierten Codes.
+
+        Fehlende Zeilen werden aus den Vektoren ergänzt.
+        """
+        n = len(self.rows)
+        width = code_width(self.quantization, self.dim)
+        if self._codes is not None and self._codes.shape[0] == n:
+            return self._codes
+
+        self._codes = None
+        done = (
+            self.codes_path.stat().st_size // width if self.codes_path.exists() else 0
+        )
+        with open(self.codes_path, "ab") as f:
+            if done > n:
+                # Codes zu verworfenen Zeilen (Abbruch) abschneiden
+                f.truncate(n * width)
+            matrix = self.matrix()
+            for start in range(done, n, 8192):
+                block = np.asarray(
+                    matrix[start : min(n, start + 8192)], dtype=np.float32
+                )
+                f.write(
+                    np.ascontiguousarray(encode(self.quantization, block)).tobytes()
+                )
+        self._codes = np.memmap(
+            self.codes_path, dtype=np.uint8, mode="r", shape=(n, width)
+        )
+        return self._codes
+
+    def _drop_derived(self):
+        """Verwirft IVF-Index und quantisierte Codes (nach Neuschreiben der Vektoren)"""
+        self.index = None
+        self.index_path.unlink(missing_ok=True)
+        self._codes = None
+        for path in self.path.glob("vectors.*"):
+            if path != self.vectors_path:
+                path.unlink()
+
+    def append(self, rows: list[dict[str, Any]], vectors: np.ndarray):
+        """Hängt Einträge inkrementell an (Vektoren zuerst, dann Metadaten)"""
+        if self.dim is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.dim = int(vectors.shape[1])
+            self.info_path.write_text(json.dumps({"dim": self.dim}))
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding-Dimension {vectors.shape[1]} passt nicht "
+                f"zum Projekt ({self.dim})"
+            )
+
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self.rows_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        self.rows.extend(rows)
+
+    def hash_index(self) -> dict[str, int]:
+        """Content-Hash -> Zeilenindex; ältere Zeilen ohne Hash werden nachberechnet.
+
+        Chunks gechunkter Dokumente nehmen nicht an der Deduplizierung teil.
+        """
+        for i in range(self._hashed, len(self.rows)):
+            row = self.rows[i]
+            if "parent_id" in row:
+                continue
+            digest = row.get("content_hash") or content_hash(row["content"])
+            self._hashes.setdefault(digest, i)
+        self._hashed = len(self.rows)
+        return self._hashes
+
+    def id_index(self) -> dict[str, int]:
+        """ID -> Zeilenindex"""
+        for i in range(len(self._ids), len(self.rows)):
+            self._ids[self.rows[i]["id"]] = i
+        return self._ids
+
+    def append_unique(
+        self, rows: list[dict[str, Any]], vectors: np.ndarray
+    ) -> list[int]:
+        """Hängt nur Einträge mit neuem ``content_hash`` an.
+
+        Gibt pro Eingabe den Zeilenindex zurück (neu oder vorhanden).
+        """
+        hashes = self.hash_index()
+        pending: dict[str, int] = {}
+        positions: list[int] = []
+        new_rows: list[dict[str, Any]] = []
+        new_indices: list[int] = []
+        for i, row in enumerate(rows):
+            digest = row["content_hash"]
+            position = hashes.get(digest, pending.get(digest))
+            if position is None:
+                position = len(self.rows) + len(new_rows)
+                pending[digest] = position
+                new_rows.append(row)
+                new_indices.append(i)
+            positions.append(position)
+
+        if new_rows:
+            self.append(new_rows, vectors[new_indices])
+            hashes.update(pending)
+            self._hashed = len(self.rows)
+        return positions
+
+    def append_document(
+        self, parent: dict[str, Any], chunks: list[dict[str, Any]], vectors: np.ndarray
+    ) -> int:
+        """Hängt Eltern-Zeile (Null-Vektor) und Chunks an, sofern das Dokument neu ist.
+
+        Gibt den Zeilenindex der (neuen oder vorhandenen) Eltern-Zeile zurück.
+        """
+        existing = self.hash_index().get(parent["content_hash"])
+        if existing is not None:
+            return existing
+        position = len(self.rows)
+        parent_vector = np.zeros((1, vectors.shape[1]), dtype=np.float32)
+        self.append([parent, *chunks], np.vstack((parent_vector, vectors)))
+        self.hash_index()
+        return position
+
+    def touch(self, positions: list[int]):
+        """Setzt last_seen der Zeilen auf jetzt und protokolliert es in seen.jsonl"""
+        now = _now()
+        with open(self.seen_path, "a", encoding="utf-8") as f:
+            for i in positions:
+                self.rows[i]["last_seen"] = now
+                f.write(json.dumps({"id": self.rows[i]["id"], "last_seen": now}) + "\n")
+
+    def deduplicate(self) -> int:
+        """Entfernt Duplikate (gleicher Content-Hash) und behält den ältesten Eintrag.
+
+        Schreibt Vektoren und Metadaten neu und verwirft den IVF-Index. Nur
+        bei gestopptem Server ausführen. Gibt die Anzahl entfernter Zeilen zurück.
+        """
+        first: dict[str, int] = {}
+        keep: list[int] = []
+        kept_ids: set[str] = set()
+        for i, row in enumerate(self.rows):
+            if "parent_id" in row:
+                # Chunks bleiben genau dann, wenn ihr Dokument bleibt
+                if row["parent_id"] in kept_ids:
+                    keep.append(i)
+                continue
+            row["content_hash"] = row.get("content_hash") or content_hash(
+                row["content"]
+            )
+            j = first.get(row["content_hash"])
+            if j is None:
+                first[row["content_hash"]] = i
+                keep.append(i)
+                kept_ids.add(row["id"])
+                continue
+            kept = self.rows[j]
+            kept["last_seen"] = max(
+                kept.get("last_seen") or kept["created_at"], row["created_at"]
+            )
+
+        removed = len(self.rows) - len(keep)
+        if not removed:
+            return 0
+
+        matrix = self.matrix()
+        tmp_path = self.vectors_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(keep), 8192):
+                block = np.asarray(matrix[keep[start : start + 8192]], dtype=np.float32)
+                f.write(np.ascontiguousarray(block).tobytes())
+        self._matrix = None
+        del matrix
+
+        self.rows = [self.rows[i] for i in keep]
+        os.replace(tmp_path, self.vectors_path)
+        self._rewrite_rows()
+        self.seen_path.unlink(missing_ok=True)
+
+        self._drop_derived()
+        with self._columns_lock:
+            self._roles = np.empty(0, dtype=object)
+            self._created = np.empty(0, dtype=np.float64)
+            self._searchable = np.empty(0, dtype=bool)
+            self._parents = np.empty(0, dtype=np.int64)
+        self._lexical = None
+        self._hashes, self._hashed = {}, 0
+        self._ids = {}
+        return removed
+
+    def resize(self, dim: int) -> bool:
+        """Kürzt alle Vektoren auf ``dim`` Dimensionen und normiert sie neu.
+
+        Entspricht bei text-embedding-3 Modellen dem Parameter ``dimensions``
+        (EMBEDDING_DIMENSIONS), vorhandene Einträge müssen also nicht neu
+        eingebettet werden. Nur bei gestopptem Server ausführen.
+        """
+        if self.dim is None or self.dim == dim:
+            return False
+        if not 0 < dim < self.dim:
+            raise ValueError(
+                f"Dimension {dim} muss zwischen 1 und {self.dim - 1} liegen"
+            )
+
+        matrix = self.matrix()
+        tmp_path = self.vectors_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            for start in range(0, matrix.shape[0], 8192):
+                block = normalize_rows(
+                    np.asarray(matrix[start : start + 8192, :dim], dtype=np.float32)
+                )
+                f.write(np.ascontiguousarray(block).tobytes())
+        self._matrix = None
+        del matrix
+
+        os.replace(tmp_path, self.vectors_path)
+        self.dim = dim
+        self.info_path.write_text(json.dumps({"dim": self.dim}))
+        self._drop_derived()
+        return True
+
+    def _filter_columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Rolle, created_at (Epoch) und Suchbarkeit je Zeile als Arrays"""
+        n = len(self.rows)
+        with self._columns_lock:
+            done = self._roles.shape[0]
+            if done < n:
+                rows = self.rows[done:n]
+                searchable = np.array(
+                    ["chunk_count" not in row for row in rows], dtype=bool
+                )
+                self._roles = np.concatenate(
+                    (self._roles, np.array([row["role"] for row in rows], dtype=object))
+                )
+                self._created = np.concatenate(
+                    (
+                        self._created,
+                        np.array(
+                            [
+                                datetime.fromisoformat(row["created_at"]).timestamp()
+                                for row in rows
+                            ],
+                            dtype=np.float64,
+                        ),
+                    )
+                )
+                self._searchable = np.concatenate((self._searchable, searchable))
+                self._parents = np.concatenate(
+                    (self._parents, done + np.flatnonzero(~searchable))
+                )
+            return self._roles[:n], self._created[:n], self._searchable[:n]
+
+    def hidden_rows(self, n: int) -> np.ndarray:
+        """Eltern-Zeilen unter den ersten ``n`` Zeilen (aufsteigend)"""
+        self._filter_columns()
+        with self._columns_lock:
+            parents = self._parents
+        return parents[: np.searchsorted(parents, n)]
+
+    def filter_mask(
+        self,
+        role: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+    ) -> Optional[np.ndarray]:
+        """Bool-Maske der suchbaren Zeilen, die alle Filter erfüllen.
+
+        None ohne Filter; Eltern-Zeilen blendet die Suche dann selbst aus
+        (``hidden_rows``).
+        """
+        if role is None and created_after is None and created_before is None:
+            return None
+        roles, created, searchable = self._filter_columns()
+        mask = searchable.copy()
+        if role is not None:
+            mask &= roles == role
+        if created_after is not None:
+            mask &= created >= to_utc(created_after).timestamp()
+        if created_before is not None:
+            mask &= created < to_utc(created_before).timestamp()
+        return mask
+
+    def needs_index(self) -> bool:
+        """Index fehlt oder die Datenmenge hat sich seit dem Training verdoppelt"""
+        n = len(self.rows)
+        if n < self.ann_min_rows:
+            return False
+        return self.index is None or n >= 2 * self.index.trained_rows
+
+    def train_index(self, nlist: int, nprobe: int, force: bool = False) -> bool:
+        """(Neu-)Training des IVF-Index auf dem aktuellen Stand.
+
+        ``nlist=0`` wählt sqrt(n) Listen. Suchen laufen währenddessen mit dem
+        alten Index weiter; der neue wird erst nach dem Training eingesetzt.
+        """
+        matrix = self.matrix()
+        if matrix.shape[0] == 0 or not (force or self.needs_index()):
+            return False
+        nlist = nlist or max(1, int(np.sqrt(matrix.shape[0])))
+        index = IVFIndex.build(matrix, nlist, nprobe)
+        index.save(self.index_path)
+        self.index = index
+        return True
+
+    def lexical_search(
+        self, query: str, limit: int, mask: Optional[np.ndarray] = None
+    ) -> list[tuple[int, float]]:
+        """BM25-Suche über den Content; Index wird inkrementell nachgezogen"""
+        if self._lexical is None:
+            self._lexical = InvertedIndex()
+        self._lexical.sync(self.rows)
+        exclude = self.hidden_rows(len(self.rows)) if mask is None else None
+        return self._lexical.search(query, limit, mask=mask, exclude=exclude)
+
+    def save_index(self):
+        if self.index is not None:
+            self.index.sync(self.matrix())
+            self.index.save(self.index_path)
+
+    def search(
+        self,
+        query: np.ndarray,
+        limit: int,
+        threshold: float,
+        exact: bool = False,
+        mask: Optional[np.ndarray] = None,
+    ) -> list[tuple[int, float]]:
+        """Top-k Cosine-Suche; exakt per Matrix-Vektor-Produkt oder per IVF-Index.
+
+        ``mask`` beschränkt die Suche auf die markierten Zeilen. Bleiben
+        weniger als ``ann_min_rows`` übrig, wird die Teilmenge gescannt
+        (mit Quantisierung über die Codes plus Re-Ranking, ``exact`` erzwingt
+        den float32-Scan). Ohne Maske werden Eltern-Zeilen ausgeblendet.
+        """
+        matrix = self.matrix()
+        n = matrix.shape[0]
+        if n == 0:
+            return []
+        mask = fit_mask(mask, n)
+        hidden = self.hidden_rows(n) if mask is None else None
+        use_index = self.index is not None and not exact and n >= self.ann_min_rows
+        if use_index and (mask is None or int(mask.sum()) >= self.ann_min_rows):
+            return self.index.search(
+                matrix, query, limit, threshold, mask=mask, exclude=hidden
+            )
+
+        candidates = None
+        if mask is not None and mask.mean() <= 0.5:
+            candidates = np.flatnonzero(mask)
+            if candidates.size == 0:
+                return []
+
+        if self.quantization != "none" and not exact:
+            # Kandidaten über die Codes, Re-Ranking mit den float32-Vektoren
+            candidates = self._quantized_candidates(
+                query, limit, mask, candidates, hidden
+            )
+            scores = np.asarray(matrix[candidates]) @ query
+        elif candidates is None:
+            # Voller Scan ohne Kopie; ausgeschlossene Zeilen per -inf aussortieren
+            candidates = np.arange(n)
+            scores = matrix @ query
+            if mask is not None:
+                scores[~mask] = -np.inf
+            elif hidden.size:
+                scores[hidden] = -np.inf
+        else:
+            scores = np.asarray(matrix[candidates]) @ query
+        if scores.shape[0] == 0:
+            return []
+        top = top_k(scores, limit)
+        return [
+            (int(candidates[i]), float(scores[i])) for i in top if scores[i] > threshold
+        ]
+
+    def _quantized_candidates(
+        self,
+        query: np.ndarray,
+        limit: int,
+        mask: Optional[np.ndarray],
+        candidates: Optional[np.ndarray],
+        hidden: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Die ``limit * rerank_factor`` besten Zeilen nach den quantisierten Scores"""
+        codes = self.codes()
+        if candidates is None:
+            approx = approximate_scores(self.quantization, codes, query, self.dim)
+            if mask is not None:
+                approx[~mask] = -np.inf
+            elif hidden is not None:
+                approx[hidden] = -np.inf
+        else:
+            approx = approximate_scores(
+                self.quantization, codes[candidates], query, self.dim
+            )
+        top = top_k(approx, limit * self.rerank_factor)
+        top = top[np.isfinite(approx[top])]
+        # Sortiert, damit das Re-Ranking die memmap sequentiell liest
+        return np.sort(top if candidates is None else candidates[top])
+
+
+class LocalVectorStore(StorageBackend):
+    """Lokales Backend ohne Supabase: NumPy-Matrizen und JSONL-Dateien.
+
+    Für Single-Machine-Deployments und Tests. Aktiv mit
+    ``RAGGADON_STORAGE=local``, Daten liegen in ``RAGGADON_DATA_DIR``.
+    """
+
+    name = "local"
+
+    def __init__(self, data_dir: str):
+        self.data_dir = Path(data_dir).expanduser()
+        self.projects_dir = self.data_dir / "projects"
+        self.projects_dir.mkdir(parents=True, exist_ok=True)
+        self.usage_path = self.data_dir / "usage.jsonl"
+
+        # ANN: ab ann_min_rows Zeilen IVF statt exaktem Scan;
+        # nlist=0 -> sqrt(n) Listen, nprobe = gescannte Listen pro Query
+        self.ann_min_rows = int(os.getenv("RAGGADON_ANN_MIN_ROWS", "20000"))
+        self.ann_nlist = int(os.getenv("RAGGADON_ANN_NLIST", "0"))
+        self.ann_nprobe = int(os.getenv("RAGGADON_ANN_NPROBE", "16"))
+        # Quantisierte Kandidatensuche mit Re-Ranking (app.quantization)
+        self.quantization = check_quantization(os.getenv("VECTOR_QUANTIZATION", "none"))
+        self.rerank_factor = int(os.getenv("VECTOR_RERANK_FACTOR", "4"))
+        self._training: set[str] = set()
+
+        self._projects: dict[str, ProjectStore] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._usage_lock = asyncio.Lock()
+        # (project, month, usage_type) -> Rollup-Zeile wie embedding_usage_monthly
+        self._rollups: dict[tuple[str, str, str], dict[str, Any]] = {}
+        self._recent: dict[str, deque[dict[str, Any]]] = {}
+        self._load_usage()
+        logger.info(f"✅ Lokaler Vector Store initialisiert ({self.data_dir})")
+
+    def project_store(self, project: str) -> ProjectStore:
+        store = self._projects.get(project)
+        if store is None:
+            # Projektname als Verzeichnisname; "." kodieren, damit ".." nicht ausbricht
+            dirname = quote(project, safe="").replace(".", "%2E")
+            store = ProjectStore(
+                self.projects_dir / dirname,
+                self.ann_min_rows,
+                self.ann_nprobe,
+                self.quantization,
+                self.rerank_factor,
+            )
+            self._projects[project] = store
+        return store
+
+    def list_projects(self) -> list[str]:
+        """Alle Projekte mit Daten im Datenverzeichnis"""
+        return sorted(
+            unquote(path.name) for path in self.projects_dir.iterdir() if path.is_dir()
+        )
+
+    def _maybe_train_index(self, project: str, store: ProjectStore):
+        """Startet das Index-Training im Hintergrund, wenn es fällig ist"""
+        if project in self._training or not store.needs_index():
+            return
+        self._training.add(project)
+
+        async def train():
+            try:
+                await asyncio.to_thread(
+                    store.train_index, self.ann_nlist, self.ann_nprobe
+                )
+            except Exception as e:
+                logger.error(f"❌ Fehler beim Index-Training für '{project}': {str(e)}")
+            finally:
+                self._training.discard(project)
+
+        asyncio.create_task(train())
+
+    async def rebuild_index(self, project: str) -> dict[str, Any]:
+        """Trainiert den IVF-Index eines Projekts neu (unabhängig von der Größe)"""
+        store = self.project_store(project)
+        async with self._lock(project):
+            built = await asyncio.to_thread(
+                store.train_index, self.ann_nlist, self.ann_nprobe, True
+            )
+        return {
+            "project": project,
+            "rebuilt": built,
+            "rows": len(store.rows),
+            "nlist": store.index.nlist if store.index is not None else 0,
+            "nprobe": self.ann_nprobe,
+            "active": store.index is not None and len(store.rows) >= self.ann_min_rows,
+        }
+
+    def _lock(self, project: str) -> asyncio.Lock:
+        if project not in self._locks:
+            self._locks[project] = asyncio.Lock()
+        return self._locks[project]
+
+    @timed("store_insert")
+    async def save_memory(
+        self, project: str, role: str, content: str, embedding: Sequence[float]
+    ) -> dict[str, Any]:
+        """Speichert einen Eintrag lokal (bzw. liefert das vorhandene Duplikat)"""
+        try:
+            row = {
+                "id": str(uuid.uuid4()),
+                "project": project,
+                "role": role,
+                "content": content,
+                "content_hash": content_hash(content),
+                "created_at": _now(),
+            }
+            vectors = normalize_rows(np.asarray([embedding], dtype=np.float32))
+            store = self.project_store(project)
+            async with self._lock(project):
+                positions = await asyncio.to_thread(store.append_unique, [row], vectors)
+            self._maybe_train_index(project, store)
+
+            logger.debug(
+                "💾 Erfolgreich gespeichert: %d Zeichen für Projekt '%s'",
+                len(content),
+                project,
+            )
+            return store.rows[positions[0]]
+
+        except Exception as e:
+            logger.error(f"❌ Fehler beim lokalen Speichern: {str(e)}")
+            raise
+
+    @timed("store_insert")
+    async def save_memories(self, rows: list[dict[str, Any]]) -> int:
+        """Speichert mehrere Einträge, gruppiert nach Projekt"""
+        try:
+            by_project: dict[str, list[dict[str, Any]]] = {}
+            for row in rows:
+                by_project.setdefault(row["project"], []).append(row)
+
+            created_at = _now()
+            saved = 0
+            for project, project_rows in by_project.items():
+                vectors = normalize_rows(
+                    np.asarray(
+                        [row["embedding"] for row in project_rows], dtype=np.float32
+                    )
+                )
+                meta = [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "project": project,
+                        "role": row["role"],
+                        "content": row["content"],
+                        "content_hash": content_hash(row["content"]),
+                        "created_at": created_at,
+                    }
+                    for row in project_rows
+                ]
+                store = self.project_store(project)
+                async with self._lock(project):
+                    before = len(store.rows)
+                    await asyncio.to_thread(store.append_unique, meta, vectors)
+                    saved += len(store.rows) - before
+                self._maybe_train_index(project, store)
+
+            logger.info(
+                f"💾 Erfolgreich gespeichert: {saved} von {len(rows)} Einträgen (Batch)"
+            )
+            return saved
+
+        except Exception as e:
+            logger.error(f"❌ Fehler beim lokalen Batch-Speichern: {str(e)}")
+            raise
+
+    @timed("store_insert")
+    async def save_document(
+        self, project: str, role: str, content: str, chunks: list[dict[str, Any]]
+    ) -> dict[str, Any]:
+        """Speichert ein gechunktes Dokument lokal (bzw. liefert das vorhandene)"""
+        try:
+            created_at = _now()
+            parent = {
+                "id": str(uuid.uuid4()),
+                "project": project,
+                "role": role,
+                "content": content,
+                "content_hash": content_hash(content),
+                "chunk_count": len(chunks),
+                "created_at": created_at,
+            }
+            children = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "project": project,
+                    "role": role,
+                    "content": chunk["content"],
+                    "parent_id": parent["id"],
+                    "chunk_index": i,
+                    "created_at": created_at,
+                }
+                for i, chunk in enumerate(chunks)
+            ]
+            vectors = normalize_rows(
+                np.asarray([chunk["embedding"] for chunk in chunks], dtype=np.float32)
+            )
+            store = self.project_store(project)
+            async with self._lock(project):
+                position = await asyncio.to_thread(
+                    store.append_document, parent, children, vectors
+                )
+            self._maybe_train_index(project, store)
+
+            logger.info(
+                f"💾 Dokument mit {len(chunks)} Chunks "
+                f"für Projekt '{project}' gespeichert"
+            )
+            return store.rows[position]
+
+        except Exception as e:
+            logger.error(f"❌ Fehler beim lokalen Speichern des Dokuments: {str(e)}")
+            raise
+
+    async def get_memories(
+        self, project: str, ids: list[str]
+    ) -> dict[str, dict[str, Any]]:
+        """Einträge per ID aus dem Projekt"""
+        store = self.project_store(project)
+        index = store.id_index()
+        return {
+            memory_id: store.rows[index[memory_id]]
+            for memory_id in ids
+            if memory_id in index
+        }
+
+    @timed("vector_search")
+    async def search_memory(
+        self,
+        project: str,
+        query_embedding: Sequence[float],
+        limit: int = 5,
+        threshold: float = DEFAULT_MATCH_THRESHOLD,
+        offset: int = 0,
+        role: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        content_length: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Sucht ähnliche Einträge per vektorisiertem Matrixprodukt"""
+        try:
+            store = self.project_store(project)
+            self._maybe_train_index(project, store)
+            query = normalize_rows(np.asarray([query_embedding], dtype=np.float32))[0]
+            if store.dim is not None and query.shape[0] != store.dim:
+                raise ValueError(
+                    f"Query-Dimension {query.shape[0]} passt nicht zum Projekt "
+                    f"({store.dim})"
+                )
+
+            def run_search():
+                mask = store.filter_mask(role, created_after, created_before)
+                return store.search(query, offset + limit, threshold, mask=mask)
+
+            hits = (await asyncio.to_thread(run_search))[offset:]
+            results = [
+                self._result_row(
+                    store, project, i, content_length, similarity=similarity
+                )
+                for i, similarity in hits
+            ]
+            logger.debug(
+                "🔍 %d ähnliche Einträge für Projekt '%s' gefunden",
+                len(results),
+                project,
+            )
+            return results
+
+        except Exception as e:
+            logger.error(f"❌ Fehler bei der lokalen Suche: {str(e)}")
+            raise
+
+    @timed("lexical_search")
+    async def search_lexical(
+        self,
+        project: str,
+        query: str,
+        limit: int = 5,
+        offset: int = 0,
+        role: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        content_length: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Volltextsuche über den In-Memory BM25-Index des Projekts"""
+        try:
+            store = self.project_store(project)
+
+            def run_search():
+                mask = store.filter_mask(role, created_after, created_before)
+                return store.lexical_search(query, offset + limit, mask=mask)
+
+            hits = (await asyncio.to_thread(run_search))[offset:]
+            results = [
+                self._result_row(store, project, i, content_length, lexical_score=score)
+                for i, score in hits
+            ]
+            logger.debug(
+                "🔤 %d Volltext-Treffer für Projekt '%s'", len(results), project
+            )
+            return results
+
+        except Exception as e:
+            logger.error(f"❌ Fehler bei der lokalen Volltextsuche: {str(e)}")
+            raise
+
+    @staticmethod
+    def _result_row(
+        store: ProjectStore,
+        project: str,
+        i: int,
+        content_length: Optional[int],
+        **scores,
+    ) -> dict[str, Any]:
+        row = store.rows[i]
+        return {
+            "id": row["id"],
+            "project": project,
+            "role": row["role"],
+            "content": truncate_content(row["content"], content_length),
+            **scores,
+            "created_at": row["created_at"],
+            "parent_id": row.get("parent_id"),
+            "chunk_index": row.get("chunk_index"),
+        }
+
+    async def find_memories_by_hash(
+        self, project: str, hashes: list[str]
+    ) -> dict[str, dict[str, Any]]:
+        """Vorhandene Einträge über den In-Memory Hash-Index des Projekts"""
+        store = self.project_store(project)
+        index = await asyncio.to_thread(store.hash_index)
+        return {
+            digest: store.rows[index[digest]] for digest in hashes if digest in index
+        }
+
+    async def touch_memories(self, project: str, ids: list[str]):
+        """Setzt last_seen der Einträge auf jetzt"""
+        store = self.project_store(project)
+        async with self._lock(project):
+            index = store.id_index()
+            positions = [index[memory_id] for memory_id in ids if memory_id in index]
+            if positions:
+                await asyncio.to_thread(store.touch, positions)
+
+    async def count_project_memories(self, project: str) -> int:
+        """Zählt die Einträge eines Projekts (gechunkte Dokumente nur einmal)"""
+        return count_top_level(self.project_store(project).rows)
+
+    async def get_first_activity(self, project: str) -> Optional[str]:
+        """Zeitstempel des ersten Eintrags"""
+        rows = self.project_store(project).rows
+        return rows[0]["created_at"] if rows else None
+
+    async def get_last_activity(self, project: str) -> Optional[str]:
+        """Zeitstempel des letzten Eintrags"""
+        rows = self.project_store(project).rows
+        return rows[-1]["created_at"] if rows else None
+
+    async def fetch_memory_stats(
+        self, projects: Optional[list[str]] = None
+    ) -> dict[str, dict[str, Any]]:
+        """Anzahl (ohne Chunk-Zeilen), erster und letzter Eintrag pro Projekt.
+
+        Die Zeilen liegen nach created_at sortiert.
+        """
+        stats = {}
+        for project in self.list_projects() if projects is None else projects:
+            rows = self.project_store(project).rows
+            if rows:
+                stats[project] = {
+                    "project": project,
+                    "total_memories": count_top_level(rows),
+                    "first_activity": rows[0]["created_at"],
+                    "last_activity": rows[-1]["created_at"],
+                }
+        return stats
+
+    def _load_usage(self):
+        if not self.usage_path.exists():
+            return
+        with open(self.usage_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    self._apply_usage(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+
+    def _apply_usage(self, event: dict[str, Any]):
+        """Aktualisiert Rollup und Recent-Liste für ein Usage-Event"""
+        created_at = event["created_at"]
+        month = created_at[:7] + "-01"
+        key = (event["project"], month, event["usage_type"])
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            rollup = self._rollups[key] = {
+                "project": event["project"],
+                "month": month,
+                "usage_type": event["usage_type"],
+                "tokens": 0,
+                "operations": 0,
+                "first_usage": created_at,
+                "last_usage": created_at,
+            }
+        rollup["tokens"] += event["tokens"]
+        rollup["operations"] += 1
+        rollup["first_usage"] = min(rollup["first_usage"], created_at)
+        rollup["last_usage"] = max(rollup["last_usage"], created_at)
+
+        recent = self._recent.setdefault(
+            event["project"], deque(maxlen=RECENT_USAGE_SIZE)
+        )
+        recent.append(event)
+
+    @timed("usage_write")
+    async def insert_usage(self, rows: list[dict[str, Any]]):
+        """Hängt Usage-Events an usage.jsonl an"""
+        async with self._usage_lock:
+            with open(self.usage_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        for row in rows:
+            self._apply_usage(row)
+
+    async def fetch_usage_rollups(
+        self, project: Optional[str] = None, month: Optional[str] = None
+    ) -> list[dict[str, Any]]:
+        """Monatliche Rollups aus dem Speicher"""
+        return [
+            dict(rollup)
+            for (rollup_project, rollup_month, _), rollup in self._rollups.items()
+            if (project is None or rollup_project == project)
+            and (month is None or rollup_month == month)
+        ]
+
+    async def fetch_recent_usage(
+        self, project: str, limit: int = 5
+    ) -> list[dict[str, Any]]:
+        """Die letzten Usage-Events eines Projekts, neueste zuerst"""
+        recent = self._recent.get(project, ())
+        return list(reversed(recent))[:limit]
+
+    async def aclose(self):
+        """Speichert die IVF-Indizes inkl. neuer Zuordnungen"""
+        for store in self._projects.values():
+            store.save_index()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Wartung des lokalen Backends (Server vorher stoppen): "
+        "dedupe entfernt doppelte Einträge, "
+        "resize kürzt die Embeddings auf --dimensions"
+    )
+    parser.add_argument("command", choices=["dedupe", "resize"])
+    parser.add_argument(
+        "--data-dir", default=os.getenv("RAGGADON_DATA_DIR", "~/.raggadon/data")
+    )
+    parser.add_argument("--project", help="Nur dieses Projekt (Standard: alle)")
+    parser.add_argument("--dimensions", type=int, help="Ziel-Dimension für resize")
+    args = parser.parse_args()
+    if args.command == "resize" and not args.dimensions:
+        parser.error("resize braucht --dimensions")
+
+    logging.basicConfig(level=logging.INFO)
+    local_store = LocalVectorStore(args.data_dir)
+    projects = [args.project] if args.project else local_store.list_projects()
+    for name in projects:
+        if args.command == "dedupe":
+            removed = local_store.project_store(name).deduplicate()
+            logger.info(f"✅ {name}: {removed} Duplikate entfernt")
+        else:
+            if local_store.project_store(name).resize(args.dimensions):
+                logger.info(f"✅ {name}: auf {args.dimensions} Dimensionen gekürzt")
+            else:
+                logger.info(f"✅ {name}: unverändert")
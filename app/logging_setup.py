@@ -0,0 +1,170 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" oder "json" (eine JSON-Zeile pro Eintrag)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()
+# Anteil der Requests mit INFO/DEBUG-Logs; Warnungen und Fehler immer
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+# Inhalte (gekürzt) in DEBUG-Logs aufnehmen; standardmäßig nie
+LOG_CONTENT = os.getenv("LOG_CONTENT", "false").strip().lower() in ("1", "true", "yes")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+REQUEST_ID_HEADER = b"x-request-id"
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=True)
+_listener: Optional[QueueListener] = None
+
+
+def get_request_id() -> Optional[str]:
+    """Korrelations-ID des aktuellen Requests (None außerhalb eines Requests)"""
+    return _request_id.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """Ergänzt die Korrelations-ID und verwirft nicht gesampelte INFO/DEBUG-Logs"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get() or "-"
+        return record.levelno >= logging.WARNING or _sampled.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """Eine JSON-Zeile pro Eintrag: ts, level, logger, message, request_id, exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            entry["request_id"] = request_id
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Legt Records unformatiert in eine begrenzte Queue.
+
+    Formatiert und geschrieben wird im Thread des QueueListeners, der
+    Request wartet nie auf I/O. Ist die Queue voll, wird der Eintrag
+    verworfen und gezählt.
+    """
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Kein format() im Aufrufer; der Record bleibt im Prozess
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging():
+    """Richtet das Root-Logging ein (Level, Format, Queue-Handler).
+
+    Hat der Root-Logger schon Handler (z.B. über ``--log-config`` von
+    uvicorn oder beim Einbetten), bleibt die vorhandene Konfiguration
+    unverändert.
+    """
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(
+        JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+
+    handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(RequestContextFilter())
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Schreibt die restlichen Einträge und beendet den Listener-Thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _valid_request_id(value: bytes) -> Optional[str]:
+    try:
+        text = value.decode("ascii")
+    except UnicodeDecodeError:
+        return None
+    if 0 < len(text) <= 64 and all(c.isalnum() or c in "-_.:" for c in text):
+        return text
+    return None
+
+
+class RequestContextMiddleware:
+    """ASGI-Middleware: Korrelations-ID und Sampling-Entscheidung pro Request.
+
+    Übernimmt einen gültigen ``X-Request-ID``-Header oder erzeugt eine
+    neue ID und gibt sie in der Antwort zurück. Ob INFO/DEBUG-Logs des
+    Requests geschrieben werden, wird einmal pro Request entschieden
+    (``LOG_SAMPLE_RATE``), damit gesampelte Requests vollständig bleiben.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = _valid_request_id(value)
+                break
+        request_id = request_id or uuid.uuid4().hex
+        header = (REQUEST_ID_HEADER, request_id.encode("ascii"))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [header]
+            await send(message)
+
+        id_token = _request_id.set(request_id)
+        sampled_token = _sampled.set(
+            LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE
+        )
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _sampled.reset(sampled_token)
+            _request_id.reset(id_token)
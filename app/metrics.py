@@ -0,0 +1,284 @@
+import bisect
+import functools
+import os
+import time
+from collections.abc import Iterable, Sequence
+from typing import Any, Callable, Optional
+
+# Standard-Buckets in Sekunden (1 ms bis 10 s)
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# Starlette ergänzt charset=utf-8
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Projekte mit eigenem Label; alle weiteren zählen als "other"
+METRICS_MAX_PROJECTS = int(os.getenv("METRICS_MAX_PROJECTS", "50"))
+_METRICS_PROJECTS = {
+    project.strip()
+    for project in os.getenv("METRICS_PROJECTS", "").split(",")
+    if project.strip()
+}
+_seen_projects: set[str] = set()
+
+LabelValues = tuple[str, ...]
+
+
+def project_label(project: str) -> str:
+    """Label für ein Projekt mit begrenzter Kardinalität.
+
+    Mit METRICS_PROJECTS nur die genannten Projekte, sonst die ersten
+    METRICS_MAX_PROJECTS, die auftauchen; der Rest wird zu "other".
+    """
+    if _METRICS_PROJECTS:
+        return project if project in _METRICS_PROJECTS else "other"
+    if project in _seen_projects:
+        return project
+    if len(_seen_projects) < METRICS_MAX_PROJECTS:
+        _seen_projects.add(project)
+        return project
+    return "other"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monoton steigender Zähler pro Label-Kombination"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for values, value in self._values.items():
+            labels = _format_labels(self.labels, values)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Histogram:
+    """Histogramm mit festen Buckets pro Label-Kombination"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label_values -> [Zähler pro Bucket (nicht kumuliert) + +Inf, Summe]
+        self._values: dict[LabelValues, list[Any]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        entry = self._values.get(label_values)
+        if entry is None:
+            entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> Iterable[str]:
+        for values, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                bucket_labels = _format_labels(self.labels, values, le)
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            labels = _format_labels(self.labels, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CallbackMetric:
+    """Werte, die erst beim Abruf von /metrics gelesen werden (z.B. Cache-Zähler)"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        type: str,
+        labels: Sequence[str],
+        callback: Callable[[], Iterable[tuple[LabelValues, float]]],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.labels = tuple(labels)
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        for values, value in self.callback():
+            labels = _format_labels(self.labels, values)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """Sammelt die Metriken eines Prozesses und rendert das Prometheus-Textformat"""
+
+    def __init__(self):
+        self._metrics: dict[str, Any] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        type: str,
+        labels: Sequence[str],
+        callback: Callable[[], Iterable[tuple[LabelValues, float]]],
+    ) -> CallbackMetric:
+        return self.register(
+            CallbackMetric(name, documentation, type, labels, callback)
+        )
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "raggadon_stage_duration_seconds",
+    "Dauer einzelner Verarbeitungsschritte",
+    ["stage"],
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "raggadon_stage_errors_total",
+    "Fehlgeschlagene Verarbeitungsschritte",
+    ["stage"],
+)
+HTTP_DURATION = REGISTRY.histogram(
+    "raggadon_http_request_duration_seconds",
+    "Dauer der HTTP-Requests pro Route",
+    ["method", "route"],
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "raggadon_http_requests_total",
+    "HTTP-Requests pro Route und Status",
+    ["method", "route", "status"],
+)
+TOKENS = REGISTRY.counter(
+    "raggadon_embedding_tokens_total",
+    "Verbrauchte Embedding-Tokens",
+    ["project", "usage_type"],
+)
+PROJECT_REQUESTS = REGISTRY.counter(
+    "raggadon_project_requests_total",
+    "Speicher- und Such-Requests pro Projekt",
+    ["project", "operation"],
+)
+
+
+def timed(stage: str):
+    """Decorator für async Funktionen: Dauer und Fehler als Schritt ``stage``"""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                STAGE_ERRORS.inc(stage)
+                raise
+            finally:
+                STAGE_DURATION.observe(time.perf_counter() - started, stage)
+
+        return wrapper
+
+    return decorator
+
+
+class MetricsMiddleware:
+    """ASGI-Middleware: Dauer und Status jedes HTTP-Requests pro Route.
+
+    Als Label dient das Routen-Template (``/project/{project}/stats``),
+    nicht der Pfad, damit die Kardinalität begrenzt bleibt.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path: Optional[str] = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_DURATION.observe(time.perf_counter() - started, method, path)
+            HTTP_REQUESTS.inc(method, path, str(status))
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import struct
+import uuid
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+try:
+    import asyncpg
+except ImportError:  # optional: ohne asyncpg nur PostgREST
+    asyncpg = None
+
+logger = logging.getLogger(__name__)
+
+# Spalten, die beim Speichern übertragen werden (Rest per Default/generiert)
+INSERT_COLUMNS = (
+    "project",
+    "role",
+    "content",
+    "embedding",
+    "parent_id",
+    "chunk_index",
+    "chunk_count",
+)
+RETURN_COLUMNS = (
+    "id,project,role,content,content_hash,created_at,last_seen,"
+    "parent_id,chunk_index,chunk_count"
+)
+# RPC-Parameter, die als Text übergeben und in SQL gecastet werden
+_PARAM_CASTS = {
+    "created_after": "::text::timestamp",
+    "created_before": "::text::timestamp",
+}
+# Supabase-Pooler (Supavisor/PgBouncer) im Transaktionsmodus
+TRANSACTION_POOLER_PORT = 6543
+
+
+def uses_transaction_pooler(dsn: str) -> bool:
+    """True für Verbindungen über den Transaktions-Pooler (Port 6543)"""
+    try:
+        return urlparse(dsn).port == TRANSACTION_POOLER_PORT
+    except ValueError:
+        return False
+
+
+def encode_vector(vector) -> bytes:
+    """pgvector Binärformat: dim (int16), unused (int16), float32 big-endian"""
+    data = np.asarray(vector, dtype=">f4")
+    return struct.pack(">HH", data.shape[0], 0) + data.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    dim, _ = struct.unpack_from(">HH", data)
+    return np.frombuffer(data, dtype=">f4", count=dim, offset=4).astype(np.float32)
+
+
+def _row(record) -> dict[str, Any]:
+    """asyncpg-Record wie eine PostgREST-Zeile (UUIDs und Zeitstempel als Text)"""
+    row = dict(record)
+    for key, value in row.items():
+        if isinstance(value, uuid.UUID):
+            row[key] = str(value)
+        elif isinstance(value, datetime):
+            row[key] = value.isoformat()
+    return row
+
+
+class BinaryVectorPool:
+    """Direkte Postgres-Verbindung (asyncpg) mit binärem pgvector-Format.
+
+    Embeddings gehen als float32-Bytes statt als JSON-Zahlenlisten über die
+    Leitung: Multi-Row-Inserts per binärem COPY in eine temporäre Tabelle
+    und ``INSERT ... ON CONFLICT DO NOTHING``, Suchen als RPC-Aufruf mit
+    binärem Query-Vektor. Aktiv, wenn ``SUPABASE_DB_URL`` gesetzt ist; der
+    Pool wird beim ersten Zugriff aufgebaut.
+
+    Über den Transaktions-Pooler (Port 6543) wechselt die Serververbindung
+    zwischen Transaktionen, benannte Prepared Statements würden dort mit
+    "prepared statement ... does not exist" scheitern. Ohne Angabe von
+    ``statement_cache_size`` wird der Statement-Cache für diesen Port
+    daher abgeschaltet (0), sonst bleibt der asyncpg-Standard (100).
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        statement_cache_size: Optional[int] = None,
+    ):
+        if asyncpg is None:
+            raise ValueError("SUPABASE_DB_URL benötigt asyncpg (pip install asyncpg)")
+        self.dsn = dsn
+        self.max_size = max_size
+        self.timeout = timeout
+        if statement_cache_size is None:
+            statement_cache_size = 0 if uses_transaction_pooler(dsn) else 100
+        self.statement_cache_size = statement_cache_size
+        self._pool = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    async def _init_connection(conn):
+        await conn.set_type_codec(
+            "vector",
+            schema="public",
+            encoder=encode_vector,
+            decoder=decode_vector,
+            format="binary",
+        )
+
+    async def pool(self):
+        if self._pool is None:
+            async with self._lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        self.dsn,
+                        min_size=1,
+                        max_size=self.max_size,
+                        command_timeout=self.timeout,
+                        statement_cache_size=self.statement_cache_size,
+                        init=self._init_connection,
+                    )
+                    logger.info("✅ Binärer pgvector-Pool (asyncpg) verbunden")
+        return self._pool
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def insert_memory(self, row: dict[str, Any]) -> Optional[dict[str, Any]]:
+        """Fügt eine Zeile ein; None, wenn der Content-Hash schon existiert"""
+        columns = [column for column in INSERT_COLUMNS if row.get(column) is not None]
+        placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+        pool = await self.pool()
+        record = await pool.fetchrow(
+            f"INSERT INTO project_memory ({', '.join(columns)}) VALUES "
+            f"({placeholders}) "
+            "ON CONFLICT (project, content_hash) DO NOTHING RETURNING "
+            f"{RETURN_COLUMNS}",
+            *(row[column] for column in columns),
+        )
+        return _row(record) if record is not None else None
+
+    async def insert_memories(self, rows: Sequence[dict[str, Any]]) -> int:
+        """Multi-Row-Insert per binärem COPY; Rückgabe: eingefügte Zeilen"""
+        records = [tuple(row.get(column) for column in INSERT_COLUMNS) for row in rows]
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS raggadon_import ("
+                    "project text, role text, content text, embedding vector, "
+                    "parent_id uuid, chunk_index int, chunk_count int"
+                    ") ON COMMIT DELETE ROWS"
+                )
+                await conn.copy_records_to_table(
+                    "raggadon_import", records=records, columns=list(INSERT_COLUMNS)
+                )
+                status = await conn.execute(
+                    f"INSERT INTO project_memory ({', '.join(INSERT_COLUMNS)}) "
+                    f"SELECT {', '.join(INSERT_COLUMNS)} FROM raggadon_import "
+                    "ON CONFLICT (project, content_hash) DO NOTHING"
+                )
+        # Status "INSERT 0 <n>"
+        return int(status.split()[-1])
+
+    async def call(self, function: str, params: dict[str, Any]) -> list[dict[str, Any]]:
+        """Ruft eine Such-RPC mit benannten Parametern auf"""
+        names = list(params)
+        arguments = ", ".join(
+            f"{name} => ${i}{_PARAM_CASTS.get(name, '')}"
+            for i, name in enumerate(names, 1)
+        )
+        pool = await self.pool()
+        records = await pool.fetch(
+            f"SELECT * FROM {function}({arguments})", *(params[name] for name in names)
+        )
+        return [_row(record) for record in records]
@@ -0,0 +1,55 @@
+from typing import Any
+
+# Standardmodell für Embeddings
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Preise in USD pro 1K Tokens, Eingabelimits und Dimensionen je Embedding-Modell
+# (https://openai.com/pricing). Einzige Quelle für alle Kostenrechnungen.
+# "shortenable": das Modell liefert per ``dimensions`` gekürzte Embeddings.
+EMBEDDING_MODELS: dict[str, dict[str, Any]] = {
+    "text-embedding-3-small": {
+        "price_per_1k_tokens": 0.00002,
+        "max_input_tokens": 8191,
+        "dimensions": 1536,
+        "shortenable": True,
+    },
+    "text-embedding-3-large": {
+        "price_per_1k_tokens": 0.00013,
+        "max_input_tokens": 8191,
+        "dimensions": 3072,
+        "shortenable": True,
+    },
+    "text-embedding-ada-002": {
+        "price_per_1k_tokens": 0.0001,
+        "max_input_tokens": 8191,
+        "dimensions": 1536,
+    },
+    # Lokale Provider (app.embedding_providers): keine Kosten;
+    # max_input_tokens None = das Modell kürzt zu lange Eingaben selbst
+    "all-MiniLM-L6-v2": {
+        "price_per_1k_tokens": 0.0,
+        "max_input_tokens": None,
+        "dimensions": 384,
+    },
+    "hash-embedding": {
+        "price_per_1k_tokens": 0.0,
+        "max_input_tokens": 8191,
+        "dimensions": 1536,
+    },
+}
+
+
+def model_info(model: str) -> dict[str, Any]:
+    """Preis und Limits eines Modells (ValueError bei unbekanntem Modell)"""
+    try:
+        return EMBEDDING_MODELS[model]
+    except KeyError as e:
+        raise ValueError(
+            f"Unbekanntes Embedding-Modell: {model} (bekannt: "
+            f"{', '.join(EMBEDDING_MODELS)})"
+        ) from e
+
+
+def cost_for_tokens(tokens: int, model: str = DEFAULT_EMBEDDING_MODEL) -> float:
+    """Kosten in USD für die angegebenen Tokens"""
+    return (tokens / 1000) * model_info(model)["price_per_1k_tokens"]
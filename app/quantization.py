@@ -0,0 +1,87 @@
+import numpy as np
+
+# Quantisierung der Vektoren für die Kandidatensuche (VECTOR_QUANTIZATION);
+# die Kandidaten werden danach mit den float32-Vektoren neu bewertet.
+#   none:    Scan über float32 (4 Byte pro Dimension)
+#   halfvec: float16 (2 Byte), in Postgres als halfvec
+#   int8:    int8 mit Skalierung pro Zeile (1 Byte), nur lokales Backend
+#   binary:  1 Bit pro Dimension (Vorzeichen), Hamming-Distanz
+QUANTIZATION_MODES = ("none", "halfvec", "int8", "binary")
+
+# Zeilen pro Block beim Scan (begrenzt den temporären float32-Speicher)
+SCAN_BLOCK_ROWS = 65536
+
+# Gesetzte Bits pro Byte-Wert für die Hamming-Distanz
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def check_quantization(mode: str) -> str:
+    mode = mode.strip().lower()
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(
+            f"Unbekannte Quantisierung: {mode} (erlaubt: "
+            f"{', '.join(QUANTIZATION_MODES)})"
+        )
+    return mode
+
+
+def code_width(mode: str, dim: int) -> int:
+    """Bytes pro Zeile in der Codes-Datei"""
+    if mode == "halfvec":
+        return dim * 2
+    if mode == "int8":
+        # int8-Codes plus float32-Skalierung am Zeilenende
+        return dim + 4
+    if mode == "binary":
+        return (dim + 7) // 8
+    raise ValueError(f"Keine Codes für Quantisierung '{mode}'")
+
+
+def encode(mode: str, vectors: np.ndarray) -> np.ndarray:
+    """Codes für normierte float32-Vektoren als uint8-Matrix (n x code_width)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if mode == "halfvec":
+        return vectors.astype(np.float16).view(np.uint8)
+    if mode == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return np.hstack(
+            (codes.view(np.uint8), scales.astype(np.float32)[:, None].view(np.uint8))
+        )
+    if mode == "binary":
+        return np.packbits(vectors > 0, axis=1)
+    raise ValueError(f"Keine Codes für Quantisierung '{mode}'")
+
+
+def approximate_scores(
+    mode: str, codes: np.ndarray, query: np.ndarray, dim: int
+) -> np.ndarray:
+    """Näherungsweise Scores (größer = ähnlicher) aller Zeilen der Codes.
+
+    halfvec und int8 schätzen das Skalarprodukt, binary liefert die negative
+    Hamming-Distanz der Vorzeichen-Bits (nur für die Rangfolge geeignet).
+    """
+    n = codes.shape[0]
+    scores = np.empty(n, dtype=np.float32)
+    if mode == "binary":
+        query_bits = np.packbits(query > 0)
+        for start in range(0, n, SCAN_BLOCK_ROWS):
+            block = np.asarray(codes[start : start + SCAN_BLOCK_ROWS])
+            distances = _POPCOUNT[np.bitwise_xor(block, query_bits)].sum(
+                axis=1, dtype=np.int32
+            )
+            scores[start : start + block.shape[0]] = -distances
+        return scores
+
+    query = np.asarray(query, dtype=np.float32)
+    for start in range(0, n, SCAN_BLOCK_ROWS):
+        block = np.ascontiguousarray(codes[start : start + SCAN_BLOCK_ROWS])
+        if mode == "halfvec":
+            values = block.view(np.float16).astype(np.float32)
+            scores[start : start + block.shape[0]] = values @ query
+        else:
+            values = block[:, :dim].view(np.int8).astype(np.float32)
+            scales = block[:, dim:].view(np.float32)[:, 0]
+            scores[start : start + block.shape[0]] = (values @ query) * scales
+    return scores
@@ -0,0 +1,85 @@
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def _enabled(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes")
+
+
+def worker_count() -> int:
+    """Anzahl der Worker-Prozesse (RAGGADON_WORKERS, Standard 1, 0 = CPU-Kerne).
+
+    Standard ist ein Worker, weil /metrics und die Zähler pro Prozess
+    geführt werden; mit mehreren Workern landet jeder Scrape bei einem
+    zufälligen Worker. Mit RELOAD und mit dem lokalen Backend immer 1:
+    dessen Daten liegen im Speicher eines Prozesses, mehrere Schreiber
+    würden sich überschreiben.
+    """
+    workers = int(os.getenv("RAGGADON_WORKERS", "1")) or os.cpu_count() or 1
+    if _enabled("RELOAD"):
+        return 1
+    if (
+        workers > 1
+        and os.getenv("RAGGADON_STORAGE", "supabase").strip().lower() == "local"
+    ):
+        logger.warning(
+            "⚠️ Lokales Backend unterstützt nur einen Worker, starte mit "
+            "RAGGADON_WORKERS=1"
+        )
+        return 1
+    return workers
+
+
+def run():
+    """Startet main:app mit uvicorn.
+
+    Produktion: ``worker_count()`` Prozesse, die sich den Port
+    teilen. Jeder Worker baut seine Clients im lifespan auf und wärmt sie
+    vor. Bei SIGTERM/SIGINT nimmt der Server keine neuen Verbindungen mehr
+    an und wartet bis zu RAGGADON_SHUTDOWN_TIMEOUT Sekunden auf laufende
+    Requests, danach werden Usage-Queue und Pools geleert. Mit mehreren
+    Workern werden Cache-Invalidierungen über Unix-Sockets in
+    RAGGADON_IPC_DIR verteilt (ohne Angabe ein temporäres Verzeichnis).
+
+    Entwicklung: RELOAD=true startet einen Prozess mit Auto-Reload.
+    """
+    import uvicorn
+
+    workers = worker_count()
+    reload = _enabled("RELOAD")
+    ipc_dir = None
+    if workers > 1 and not os.getenv("RAGGADON_IPC_DIR"):
+        # Über die Umgebung an die Worker vererbt
+        ipc_dir = tempfile.mkdtemp(prefix="raggadon-ipc-")
+        os.environ["RAGGADON_IPC_DIR"] = ipc_dir
+
+    logger.info(f"🚀 Starte {workers} Worker{' mit Auto-Reload' if reload else ''}")
+    try:
+        uvicorn.run(
+            "main:app",
+            host=os.getenv("HOST", "0.0.0.0"),
+            port=int(os.getenv("PORT", "8000")),
+            workers=workers,
+            reload=reload,
+            timeout_graceful_shutdown=float(
+                os.getenv("RAGGADON_SHUTDOWN_TIMEOUT", "30")
+            ),
+            timeout_keep_alive=int(os.getenv("RAGGADON_KEEP_ALIVE", "5")),
+        )
+    finally:
+        if ipc_dir is not None:
+            shutil.rmtree(ipc_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    # python -m app.server: der Supervisor importiert weder FastAPI noch die App
+    from app.env import load_environment
+    from app.logging_setup import configure_logging
+
+    load_environment()
+    configure_logging()
+    run()
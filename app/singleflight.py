@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Hashable
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Fasst gleichzeitige identische Aufrufe zu einem zusammen.
+
+    Der erste Aufruf eines Schlüssels startet die Arbeit als eigenen Task,
+    alle weiteren warten, solange er läuft, auf dasselbe Ergebnis (bzw.
+    dieselbe Exception). Bricht ein wartender Request ab, läuft der Task
+    für die übrigen weiter. Nach Abschluss wird der Schlüssel freigegeben;
+    es wird nichts gecacht.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: dict[Hashable, "asyncio.Task"] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]]
+    ) -> tuple[Any, bool]:
+        """Führt ``fn`` einmal pro Schlüssel aus.
+
+        Gibt (Ergebnis, geteilt) zurück; ``geteilt`` ist True, wenn der
+        Aufruf sich an eine laufende Ausführung angehängt hat.
+        """
+        self.calls += 1
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: Hashable, task: "asyncio.Task"):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Exception abholen, auch wenn alle Wartenden abgebrochen haben
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"SingleFlight {self.name}: {task.exception()!r}")
+
+    def stats(self) -> dict[str, Any]:
+        """Aufrufe, tatsächliche Ausführungen und eingesparte Upstream-Aufrufe"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / self.calls, 4)
+            if self.calls
+            else 0.0,
+            "in_flight": len(self._in_flight),
+        }
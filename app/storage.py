@@ -0,0 +1,263 @@
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Mindest-Similarity, ab der ein Eintrag als Treffer zählt
+DEFAULT_MATCH_THRESHOLD = 0.5
+
+
+# Nur ASCII-Whitespace, damit raggadon_content_hash() in SQL identisch rechnet
+_WHITESPACE_RE = re.compile(r"[ \t\n\r\f\v]+")
+
+
+def normalize_content(content: str) -> str:
+    """NFC-normalisiert, Whitespace-Folgen zu einem Leerzeichen, getrimmt"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", content)).strip(" ")
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 des normalisierten Contents (Deduplizierung pro Projekt).
+
+    Muss mit raggadon_content_hash() aus migrations/005 übereinstimmen.
+    """
+    return hashlib.sha256(normalize_content(content).encode("utf-8")).hexdigest()
+
+
+def to_utc(value: datetime) -> datetime:
+    """Zeitpunkt als UTC (naive Werte gelten bereits als UTC)"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def truncate_content(
+    content: Optional[str], content_length: Optional[int]
+) -> Optional[str]:
+    """None = voller Content, 0 = kein Content, n = die ersten n Zeichen"""
+    if content_length is None or content is None:
+        return content
+    if content_length == 0:
+        return None
+    return content[:content_length]
+
+
+def summarize_usage_rollups(
+    project: str, rows: list[dict[str, Any]], month: str
+) -> dict[str, Any]:
+    """Verdichtet die Rollup-Zeilen eines Projekts (wie project_usage_stats in SQL)"""
+    first_usages = [row["first_usage"] for row in rows if row.get("first_usage")]
+    last_usages = [row["last_usage"] for row in rows if row.get("last_usage")]
+    return {
+        "project": project,
+        "total_tokens": sum(row["tokens"] for row in rows),
+        "monthly_tokens": sum(row["tokens"] for row in rows if row["month"] == month),
+        "save_operations": sum(
+            row["operations"] for row in rows if row["usage_type"] == "save"
+        ),
+        "search_operations": sum(
+            row["operations"] for row in rows if row["usage_type"] == "search"
+        ),
+        "total_operations": sum(row["operations"] for row in rows),
+        "first_usage": min(first_usages) if first_usages else None,
+        "last_usage": max(last_usages) if last_usages else None,
+    }
+
+
+class StorageBackend(ABC):
+    """Schnittstelle für Projektgedächtnis und Usage-Daten.
+
+    Implementierungen: ``SupabaseClient`` (pgvector über PostgREST) und
+    ``LocalVectorStore`` (NumPy-Matrizen auf der lokalen Platte).
+    """
+
+    name = "abstract"
+
+    @abstractmethod
+    async def save_memory(
+        self, project: str, role: str, content: str, embedding: Sequence[float]
+    ) -> dict[str, Any]:
+        """Speichert einen Eintrag und gibt die gespeicherte Zeile zurück.
+
+        Existiert der Content-Hash im Projekt schon, wird die vorhandene
+        Zeile zurückgegeben.
+        """
+
+    @abstractmethod
+    async def save_memories(self, rows: list[dict[str, Any]]) -> int:
+        """Speichert mehrere Einträge (project, role, content, embedding).
+
+        Einträge, deren Content-Hash im Projekt schon existiert, werden
+        übersprungen. Gibt die Anzahl der gespeicherten Zeilen zurück.
+        """
+
+    @abstractmethod
+    async def save_document(
+        self, project: str, role: str, content: str, chunks: list[dict[str, Any]]
+    ) -> dict[str, Any]:
+        """Speichert ein gechunktes Dokument und gibt die Eltern-Zeile zurück.
+
+        Die Eltern-Zeile enthält den vollständigen Content ohne Embedding und
+        ``chunk_count``; jeder Chunk (content, embedding) wird als Kind-Zeile
+        mit ``parent_id`` und ``chunk_index`` gespeichert. Nur die Eltern-Zeile
+        nimmt an der Deduplizierung teil.
+        """
+
+    @abstractmethod
+    async def get_memories(
+        self, project: str, ids: list[str]
+    ) -> dict[str, dict[str, Any]]:
+        """Einträge per ID (ID -> Zeile ohne Embedding)"""
+
+    @abstractmethod
+    async def search_memory(
+        self,
+        project: str,
+        query_embedding: Sequence[float],
+        limit: int = 5,
+        threshold: float = DEFAULT_MATCH_THRESHOLD,
+        offset: int = 0,
+        role: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        content_length: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Liefert die ähnlichsten Einträge eines Projekts.
+
+        Eltern-Zeilen gechunkter Dokumente haben kein Embedding und werden
+        nie geliefert; Chunk-Treffer tragen ``parent_id`` und ``chunk_index``.
+        Die Filter (Rolle, Zeitraum [created_after, created_before)) werden
+        vom Backend vor der Top-k Auswahl angewendet; ``offset`` überspringt
+        die ersten Treffer, ``content_length`` kürzt den Content (siehe
+        ``truncate_content``).
+        """
+
+    @abstractmethod
+    async def search_lexical(
+        self,
+        project: str,
+        query: str,
+        limit: int = 5,
+        offset: int = 0,
+        role: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        content_length: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Volltextsuche ohne Embedding, sortiert nach ``lexical_score``.
+
+        Filter, Paging und Chunk-Felder wie bei ``search_memory``.
+        """
+
+    @abstractmethod
+    async def find_memories_by_hash(
+        self, project: str, hashes: list[str]
+    ) -> dict[str, dict[str, Any]]:
+        """Bereits gespeicherte Einträge zu den Content-Hashes (Hash -> Zeile)"""
+
+    @abstractmethod
+    async def touch_memories(self, project: str, ids: list[str]):
+        """Setzt last_seen der Einträge auf jetzt (erneut gespeicherte Duplikate)"""
+
+    @abstractmethod
+    async def count_project_memories(self, project: str) -> int:
+        """Zählt die Einträge eines Projekts; ein gechunktes Dokument zählt einmal"""
+
+    @abstractmethod
+    async def get_first_activity(self, project: str) -> Optional[str]:
+        """Zeitstempel des ersten Eintrags"""
+
+    @abstractmethod
+    async def get_last_activity(self, project: str) -> Optional[str]:
+        """Zeitstempel des letzten Eintrags"""
+
+    @abstractmethod
+    async def fetch_memory_stats(
+        self, projects: Optional[list[str]] = None
+    ) -> dict[str, dict[str, Any]]:
+        """Anzahl, erster und letzter Eintrag pro Projekt (ohne Filter: alle Projekte).
+
+        Projekte ohne Einträge fehlen im Ergebnis.
+        """
+
+    @abstractmethod
+    async def insert_usage(self, rows: list[dict[str, Any]]):
+        """Schreibt Usage-Events (project, usage_type, tokens, created_at)"""
+
+    @abstractmethod
+    async def fetch_usage_rollups(
+        self, project: Optional[str] = None, month: Optional[str] = None
+    ) -> list[dict[str, Any]]:
+        """Monatliche Usage-Rollups, optional gefiltert nach Projekt und Monat"""
+
+    @abstractmethod
+    async def fetch_recent_usage(
+        self, project: str, limit: int = 5
+    ) -> list[dict[str, Any]]:
+        """Die letzten Usage-Events eines Projekts, neueste zuerst"""
+
+    async def fetch_usage_stats(
+        self, month: str, projects: Optional[list[str]] = None
+    ) -> dict[str, dict[str, Any]]:
+        """Token- und Operationssummen pro Projekt aus den Monats-Rollups.
+
+        ``monthly_tokens`` zählt nur den Monat ``month``. Die Standard-
+        implementierung verdichtet ``fetch_usage_rollups`` in Python.
+        """
+        project = projects[0] if projects and len(projects) == 1 else None
+        rows_by_project: dict[str, list[dict[str, Any]]] = {}
+        for row in await self.fetch_usage_rollups(project):
+            if projects is None or row["project"] in projects:
+                rows_by_project.setdefault(row["project"], []).append(row)
+        return {
+            name: summarize_usage_rollups(name, rows, month)
+            for name, rows in rows_by_project.items()
+        }
+
+    def coalescing_stats(self) -> dict[str, Any]:
+        """Zähler der zusammengefassten (single-flight) Storage-Aufrufe"""
+        return {}
+
+    async def rebuild_index(self, project: str) -> dict[str, Any]:
+        """Baut den Suchindex eines Projekts neu auf"""
+        raise NotImplementedError(
+            f"Index-Rebuild wird vom Backend '{self.name}' nicht unterstützt"
+        )
+
+    async def create_tables_if_not_exist(self):
+        """Prüft bzw. erstellt die benötigten Tabellen (Standard: nichts zu tun)"""
+        return None
+
+    async def warmup(self):
+        """Öffnet Verbindungen vorab (Standard: nichts zu tun)"""
+        return None
+
+    async def aclose(self):
+        """Gibt Verbindungen und Dateien frei (Standard: nichts zu tun)"""
+        return None
+
+
+def create_storage_backend() -> StorageBackend:
+    """Erstellt das per RAGGADON_STORAGE gewählte Backend (supabase | local)"""
+    backend = os.getenv("RAGGADON_STORAGE", "supabase").strip().lower()
+
+    if backend == "supabase":
+        from app.supabase_client import SupabaseClient
+
+        return SupabaseClient()
+
+    if backend == "local":
+        from app.local_store import LocalVectorStore
+
+        return LocalVectorStore(os.getenv("RAGGADON_DATA_DIR", "~/.raggadon/data"))
+
+    raise ValueError(
+        f"Unbekanntes Storage-Backend: {backend} (erlaubt: supabase, local)"
+    )
@@ -1,29 +1,140 @@
-import os
+import asyncio
 import logging
-from typing import List, Dict, Any
-from supabase import create_client, Client
+import os
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import httpx
+import numpy as np
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from postgrest.types import ReturnMethod
+
+from app.metrics import timed
+from app.pgvector_binary import BinaryVectorPool
+from app.quantization import check_quantization
+from app.singleflight import SingleFlight
+from app.storage import (
+    DEFAULT_MATCH_THRESHOLD,
+    StorageBackend,
+    content_hash,
+    to_utc,
+)
 
 logger = logging.getLogger(__name__)
 
+# Eindeutiger Index aus migrations/005_content_hash_dedup.sql
+DEDUP_CONFLICT_COLUMNS = "project,content_hash"
+# Spalten für Treffer der Hash-Suche (ohne Embedding)
+MEMORY_COLUMNS = (
+    "id,project,role,content,content_hash,created_at,last_seen,"
+    "parent_id,chunk_index,chunk_count"
+)
+
+
+def _json_vector(embedding) -> list[float]:
+    """Embedding als JSON-Liste für PostgREST (auch aus NumPy-Arrays)"""
+    return embedding.tolist() if hasattr(embedding, "tolist") else embedding
+
+
+class _PooledPostgrestClient(AsyncPostgrestClient):
+    """AsyncPostgrestClient mit konfigurierbarem Connection-Pool"""
+
+    def __init__(self, base_url: str, *, limits: httpx.Limits, **kwargs):
+        self._limits = limits
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url, headers, timeout, *args, **kwargs):
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=self._limits,
+        )
+
+
+class SupabaseClient(StorageBackend):
+    name = "supabase"
 
-class SupabaseClient:
     def __init__(self):
         self.url = os.getenv("SUPABASE_URL")
         self.key = os.getenv("SUPABASE_API_KEY")
-        
+
         if not self.url or not self.key:
             raise ValueError("SUPABASE_URL und SUPABASE_API_KEY müssen gesetzt sein")
-        
-        self.client: Client = create_client(self.url, self.key)
+
+        # Gesamt-Deadline pro Query (Sekunden); httpx-Timeouts gelten pro Phase
+        self.timeout = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+        max_connections = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+        # Maximale Zeilen pro Multi-Row-Insert
+        self.insert_batch_size = int(os.getenv("SUPABASE_INSERT_BATCH_SIZE", "500"))
+        # HNSW-Suchtiefe pro Query (höher = bessere Recall, langsamer)
+        self.ef_search = int(os.getenv("SUPABASE_HNSW_EF_SEARCH", "40"))
+        # Quantisierte Kandidatensuche mit Re-Ranking (migrations/007)
+        self.quantization = check_quantization(os.getenv("VECTOR_QUANTIZATION", "none"))
+        if self.quantization == "int8":
+            raise ValueError(
+                "VECTOR_QUANTIZATION=int8 wird nur vom lokalen Backend unterstützt"
+            )
+        self.rerank_factor = int(os.getenv("VECTOR_RERANK_FACTOR", "4"))
+        # Optional: direkte Postgres-Verbindung für binäre Vektoren (Inserts, Suche)
+        db_url = os.getenv("SUPABASE_DB_URL")
+        self.binary: Optional[BinaryVectorPool] = None
+        if db_url:
+            # Leer: 0 für den Transaktions-Pooler (Port 6543), sonst 100
+            statement_cache_size = os.getenv("SUPABASE_DB_STATEMENT_CACHE_SIZE")
+            self.binary = BinaryVectorPool(
+                db_url,
+                max_size=max_connections,
+                timeout=self.timeout,
+                statement_cache_size=int(statement_cache_size)
+                if statement_cache_size
+                else None,
+            )
+        # Gleichzeitige identische Suchen teilen sich einen RPC-Aufruf
+        self.search_flights = SingleFlight("search")
+
+        # Ein geteilter, gepoolter HTTP-Client für alle Requests des Workers
+        self.client = _PooledPostgrestClient(
+            f"{self.url.rstrip('/')}/rest/v1",
+            headers={
+                **DEFAULT_POSTGREST_CLIENT_HEADERS,
+                "apikey": self.key,
+                "Authorization": f"Bearer {self.key}",
+            },
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
         logger.info("✅ Supabase Client initialisiert")
 
+    async def execute(self, query):
+        """Führt eine PostgREST-Query asynchron mit Timeout aus.
+
+        Wird der aufrufende Task abgebrochen, wird auch der HTTP-Request
+        abgebrochen und die Verbindung an den Pool zurückgegeben.
+        """
+        return await asyncio.wait_for(query.execute(), timeout=self.timeout)
+
+    async def warmup(self):
+        """Baut die HTTP-Verbindung (und den asyncpg-Pool) vor dem ersten Request auf"""
+        await self.execute(self.client.from_("project_memory").select("id").limit(1))
+        if self.binary is not None:
+            await self.binary.pool()
+
+    async def aclose(self):
+        """Schließt den Connection-Pool"""
+        await self.client.aclose()
+        if self.binary is not None:
+            await self.binary.close()
+
+    @timed("store_insert")
     async def save_memory(
-        self, 
-        project: str, 
-        role: str, 
-        content: str, 
-        embedding: List[float]
-    ) -> Dict[str, Any]:
+        self, project: str, role: str, content: str, embedding: Sequence[float]
+    ) -> dict[str, Any]:
         """Speichert Projektinhalt mit Embedding in project_memory Tabelle"""
         try:
             data = {
@@ -32,111 +143,467 @@ class SupabaseClient:
                 "content": content,
                 "embedding": embedding,
             }
-            
-            result = self.client.table("project_memory").insert(data).execute()
-            
-            if result.data:
-                logger.info(f"💾 Erfolgreich gespeichert: {len(content)} Zeichen für Projekt '{project}'")
-                return result.data[0]
+
+            # content_hash ist eine generierte Spalte; Duplikate werden ignoriert
+            if self.binary is not None:
+                saved = await self.binary.insert_memory(data)
             else:
-                raise Exception("Keine Daten zurückgegeben")
-                
+                data["embedding"] = _json_vector(embedding)
+                result = await self.execute(
+                    self.client.table("project_memory").upsert(
+                        data, ignore_duplicates=True, on_conflict=DEDUP_CONFLICT_COLUMNS
+                    )
+                )
+                saved = result.data[0] if result.data else None
+
+            if saved:
+                logger.debug(
+                    "💾 Erfolgreich gespeichert: %d Zeichen für Projekt '%s'",
+                    len(content),
+                    project,
+                )
+                return saved
+
+            # Parallel gespeichertes Duplikat: vorhandene Zeile zurückgeben
+            digest = content_hash(content)
+            existing = await self.find_memories_by_hash(project, [digest])
+            if digest in existing:
+                return existing[digest]
+            raise Exception("Keine Daten zurückgegeben")
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Speichern in Supabase: {str(e)}")
             raise
 
+    @timed("store_insert")
+    async def save_memories(self, rows: list[dict[str, Any]]) -> int:
+        """Speichert mehrere Einträge per Multi-Row-Insert in project_memory.
+
+        Jede Zeile braucht die Felder project, role, content und embedding.
+        Duplikate (gleicher Content-Hash im Projekt) werden von der Datenbank
+        übersprungen. Über PostgREST werden sie mitgezählt (returning=minimal
+        meldet nicht, welche Zeilen eingefügt wurden); der binäre Pfad
+        (SUPABASE_DB_URL) zählt exakt.
+        """
+        try:
+            saved = 0
+            for start in range(0, len(rows), self.insert_batch_size):
+                chunk = rows[start : start + self.insert_batch_size]
+                if self.binary is not None:
+                    saved += await self.binary.insert_memories(chunk)
+                    continue
+                # returning=minimal: die Embeddings nicht zurück übertragen
+                await self.execute(
+                    self.client.table("project_memory").upsert(
+                        [
+                            {**row, "embedding": _json_vector(row["embedding"])}
+                            for row in chunk
+                        ],
+                        returning=ReturnMethod.minimal,
+                        ignore_duplicates=True,
+                        on_conflict=DEDUP_CONFLICT_COLUMNS,
+                    )
+                )
+                saved += len(chunk)
+
+            logger.info(f"💾 Erfolgreich gespeichert: {saved} Einträge (Batch)")
+            return saved
+
+        except Exception as e:
+            logger.error(f"❌ Fehler beim Batch-Speichern in Supabase: {str(e)}")
+            raise
+
+    @timed("store_insert")
+    async def save_document(
+        self, project: str, role: str, content: str, chunks: list[dict[str, Any]]
+    ) -> dict[str, Any]:
+        """Speichert Eltern-Zeile (ohne Embedding) und Chunks (migrations/006)"""
+        try:
+            parent = {
+                "project": project,
+                "role": role,
+                "content": content,
+                "chunk_count": len(chunks),
+            }
+            result = await self.execute(
+                self.client.table("project_memory").upsert(
+                    parent, ignore_duplicates=True, on_conflict=DEDUP_CONFLICT_COLUMNS
+                )
+            )
+            if not result.data:
+                # Parallel gespeichertes Duplikat: vorhandenes Dokument zurückgeben
+                digest = content_hash(content)
+                existing = await self.find_memories_by_hash(project, [digest])
+                if digest in existing:
+                    return existing[digest]
+                raise Exception("Keine Daten zurückgegeben")
+
+            parent_row = result.data[0]
+            await self.save_memories(
+                [
+                    {
+                        "project": project,
+                        "role": role,
+                        "content": chunk["content"],
+                        "embedding": chunk["embedding"],
+                        "parent_id": parent_row["id"],
+                        "chunk_index": i,
+                    }
+                    for i, chunk in enumerate(chunks)
+                ]
+            )
+            logger.info(
+                f"💾 Dokument mit {len(chunks)} Chunks "
+                f"für Projekt '{project}' gespeichert"
+            )
+            return parent_row
+
+        except Exception as e:
+            logger.error(f"❌ Fehler beim Speichern des Dokuments (Supabase): {str(e)}")
+            raise
+
+    async def get_memories(
+        self, project: str, ids: list[str]
+    ) -> dict[str, dict[str, Any]]:
+        """Einträge per ID ohne Embedding"""
+        if not ids:
+            return {}
+        try:
+            result = await self.execute(
+                self.client.table("project_memory")
+                .select(MEMORY_COLUMNS)
+                .eq("project", project)
+                .in_("id", list(set(ids)))
+            )
+            return {row["id"]: row for row in result.data or []}
+
+        except Exception as e:
+            logger.error(f"❌ Fehler beim Laden der Einträge aus Supabase: {str(e)}")
+            raise
+
+    @staticmethod
+    def _filter_params(
+        offset: int,
+        role: Optional[str],
+        created_after: Optional[datetime],
+        created_before: Optional[datetime],
+        content_length: Optional[int],
+    ) -> dict[str, Any]:
+        """Nur gesetzte Filter senden, sonst greifen die SQL-Defaults"""
+        params: dict[str, Any] = {}
+        if offset:
+            params["match_offset"] = offset
+        if role is not None:
+            params["role_filter"] = role
+        if created_after is not None:
+            params["created_after"] = (
+                to_utc(created_after).replace(tzinfo=None).isoformat()
+            )
+        if created_before is not None:
+            params["created_before"] = (
+                to_utc(created_before).replace(tzinfo=None).isoformat()
+            )
+        if content_length is not None:
+            params["content_length"] = content_length
+        return params
+
+    @timed("vector_search")
     async def search_memory(
-        self, 
-        project: str, 
-        query_embedding: List[float], 
-        limit: int = 5
-    ) -> List[Dict[str, Any]]:
-        """Sucht ähnliche Inhalte basierend auf Cosine Similarity"""
+        self,
+        project: str,
+        query_embedding: Sequence[float],
+        limit: int = 5,
+        threshold: float = DEFAULT_MATCH_THRESHOLD,
+        offset: int = 0,
+        role: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        content_length: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Sucht ähnliche Inhalte basierend auf Cosine Similarity.
+
+        Alle Filter werden an match_documents übergeben und in der Datenbank
+        angewendet (migrations/003_match_documents_filters.sql). Mit
+        VECTOR_QUANTIZATION sucht match_documents_quantized die Kandidaten
+        über halfvec- bzw. Binär-Indizes (migrations/007). Gleichzeitige
+        identische Suchen (gleicher Vektor und gleiche Filter) teilen sich
+        einen RPC-Aufruf.
+        """
         try:
-            # Verwende RPC (Remote Procedure Call) für Vektor-Ähnlichkeitssuche
-            result = self.client.rpc(
-                "match_documents",
-                {
-                    "query_embedding": query_embedding,
-                    "match_threshold": 0.5,
-                    "match_count": limit,
-                    "project_filter": project,
-                }
-            ).execute()
-            
-            if result.data:
-                logger.info(f"🔍 {len(result.data)} ähnliche Einträge für Projekt '{project}' gefunden")
-                return result.data
+            filter_params = self._filter_params(
+                offset, role, created_after, created_before, content_length
+            )
+            key = (
+                project,
+                np.asarray(query_embedding, dtype=np.float32).tobytes(),
+                limit,
+                threshold,
+                tuple(sorted(filter_params.items())),
+            )
+            rows, _ = await self.search_flights.do(
+                key,
+                lambda: self._match_documents(
+                    project, query_embedding, limit, threshold, filter_params
+                ),
+            )
+            # Eigene Kopien pro Aufrufer, die Zeilen können geteilt sein
+            data = [dict(row) for row in rows]
+
+            if data:
+                logger.debug(
+                    "🔍 %d ähnliche Einträge für Projekt '%s' gefunden",
+                    len(data),
+                    project,
+                )
+                return data
             else:
-                logger.info(f"🔍 Keine ähnlichen Einträge für Projekt '{project}' gefunden")
+                logger.debug(
+                    "🔍 Keine ähnlichen Einträge für Projekt '%s' gefunden", project
+                )
                 return []
-                
+
         except Exception as e:
             logger.error(f"❌ Fehler bei der Suche in Supabase: {str(e)}")
             raise
 
+    async def _match_documents(
+        self,
+        project: str,
+        query_embedding: Sequence[float],
+        limit: int,
+        threshold: float,
+        filter_params: dict[str, Any],
+    ) -> list[dict[str, Any]]:
+        """Ein Aufruf von match_documents bzw. match_documents_quantized"""
+        params: dict[str, Any] = {
+            "query_embedding": query_embedding
+            if self.binary is not None
+            else _json_vector(query_embedding),
+            "match_threshold": threshold,
+            "match_count": limit,
+            "project_filter": project,
+            "ef_search": self.ef_search,
+            **filter_params,
+        }
+
+        function = "match_documents"
+        if self.quantization != "none":
+            function = "match_documents_quantized"
+            params["quantization"] = self.quantization
+            params["rerank_factor"] = self.rerank_factor
+
+        # Verwende RPC (Remote Procedure Call) für Vektor-Ähnlichkeitssuche
+        if self.binary is not None:
+            return await self.binary.call(function, params)
+        return (await self.execute(self.client.rpc(function, params))).data or []
+
+    def coalescing_stats(self) -> dict[str, Any]:
+        return {"search": self.search_flights.stats()}
+
+    @timed("lexical_search")
+    async def search_lexical(
+        self,
+        project: str,
+        query: str,
+        limit: int = 5,
+        offset: int = 0,
+        role: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        content_length: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Volltext- und Trigram-Suche über match_documents_lexical (Migration 004)"""
+        try:
+            params: dict[str, Any] = {
+                "query_text": query,
+                "match_count": limit,
+                "project_filter": project,
+                **self._filter_params(
+                    offset, role, created_after, created_before, content_length
+                ),
+            }
+            result = await self.execute(
+                self.client.rpc("match_documents_lexical", params)
+            )
+            logger.debug(
+                "🔤 %d Volltext-Treffer für Projekt '%s'",
+                len(result.data or []),
+                project,
+            )
+            return result.data or []
+
+        except Exception as e:
+            logger.error(f"❌ Fehler bei der Volltextsuche in Supabase: {str(e)}")
+            raise
+
+    async def find_memories_by_hash(
+        self, project: str, hashes: list[str]
+    ) -> dict[str, dict[str, Any]]:
+        """Sucht Einträge über den eindeutigen Index (project, content_hash)"""
+        if not hashes:
+            return {}
+        try:
+            result = await self.execute(
+                self.client.table("project_memory")
+                .select(MEMORY_COLUMNS)
+                .eq("project", project)
+                .in_("content_hash", list(set(hashes)))
+            )
+            return {row["content_hash"]: row for row in result.data or []}
+
+        except Exception as e:
+            logger.error(f"❌ Fehler bei der Hash-Suche in Supabase: {str(e)}")
+            raise
+
+    async def touch_memories(self, project: str, ids: list[str]):
+        """Setzt last_seen der Einträge auf jetzt (UTC)"""
+        if not ids:
+            return
+        now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+        await self.execute(
+            self.client.table("project_memory")
+            .update({"last_seen": now}, returning=ReturnMethod.minimal)
+            .eq("project", project)
+            .in_("id", ids)
+        )
+
     async def count_project_memories(self, project: str) -> int:
-        """Zählt die Anzahl der gespeicherten Einträge für ein Projekt"""
+        """Zählt die gespeicherten Einträge eines Projekts (ohne Chunk-Zeilen)"""
         try:
-            result = self.client.table("project_memory")\
-                .select("id", count="exact")\
-                .eq("project", project)\
-                .execute()
-            
+            result = await self.execute(
+                self.client.table("project_memory")
+                .select("id", count="exact")
+                .eq("project", project)
+                .is_("parent_id", "null")
+            )
+
             return result.count or 0
-                
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Zählen der Einträge: {str(e)}")
             return 0
-    
-    async def get_first_activity(self, project: str) -> Dict[str, Any]:
+
+    async def get_first_activity(self, project: str) -> dict[str, Any]:
         """Holt die erste Aktivität eines Projekts"""
         try:
-            result = self.client.table("project_memory")\
-                .select("created_at")\
-                .eq("project", project)\
-                .order("created_at", desc=False)\
-                .limit(1)\
-                .execute()
-            
+            result = await self.execute(
+                self.client.table("project_memory")
+                .select("created_at")
+                .eq("project", project)
+                .order("created_at", desc=False)
+                .limit(1)
+            )
+
             if result.data and len(result.data) > 0:
                 return result.data[0]["created_at"]
             return None
-                
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Abrufen der ersten Aktivität: {str(e)}")
             return None
-    
-    async def get_last_activity(self, project: str) -> Dict[str, Any]:
+
+    async def get_last_activity(self, project: str) -> dict[str, Any]:
         """Holt die letzte Aktivität eines Projekts"""
         try:
-            result = self.client.table("project_memory")\
-                .select("created_at")\
-                .eq("project", project)\
-                .order("created_at", desc=True)\
-                .limit(1)\
-                .execute()
-            
+            result = await self.execute(
+                self.client.table("project_memory")
+                .select("created_at")
+                .eq("project", project)
+                .order("created_at", desc=True)
+                .limit(1)
+            )
+
             if result.data and len(result.data) > 0:
                 return result.data[0]["created_at"]
             return None
-                
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Abrufen der letzten Aktivität: {str(e)}")
             return None
 
+    async def fetch_memory_stats(
+        self, projects: Optional[list[str]] = None
+    ) -> dict[str, dict[str, Any]]:
+        """Anzahl, erster und letzter Eintrag pro Projekt in einer Abfrage.
+
+        Nutzt die RPC aus migrations/008.
+        """
+        try:
+            result = await self.execute(
+                self.client.rpc("project_memory_stats", {"project_filter": projects})
+            )
+            return {row["project"]: row for row in result.data or []}
+
+        except Exception as e:
+            logger.error(f"❌ Fehler beim Abrufen der Projekt-Statistiken: {str(e)}")
+            raise
+
+    async def fetch_usage_stats(
+        self, month: str, projects: Optional[list[str]] = None
+    ) -> dict[str, dict[str, Any]]:
+        """Usage-Summen pro Projekt, in SQL gruppiert (RPC aus migrations/008)"""
+        result = await self.execute(
+            self.client.rpc(
+                "project_usage_stats",
+                {"current_month": month, "project_filter": projects},
+            )
+        )
+        return {row["project"]: row for row in result.data or []}
+
+    @timed("usage_write")
+    async def insert_usage(self, rows: list[dict[str, Any]]):
+        """Schreibt Usage-Events per Multi-Row-Insert nach embedding_usage"""
+        await self.execute(
+            self.client.table("embedding_usage").insert(
+                rows, returning=ReturnMethod.minimal
+            )
+        )
+
+    async def fetch_usage_rollups(
+        self, project: Optional[str] = None, month: Optional[str] = None
+    ) -> list[dict[str, Any]]:
+        """Lädt Zeilen aus embedding_usage_monthly"""
+        query = self.client.table("embedding_usage_monthly").select("*")
+        if project is not None:
+            query = query.eq("project", project)
+        if month is not None:
+            query = query.eq("month", month)
+        result = await self.execute(query)
+        return result.data or []
+
+    async def fetch_recent_usage(
+        self, project: str, limit: int = 5
+    ) -> list[dict[str, Any]]:
+        """Lädt die letzten Zeilen aus embedding_usage"""
+        result = await self.execute(
+            self.client.table("embedding_usage")
+            .select("*")
+            .eq("project", project)
+            .order("created_at", desc=True)
+            .limit(limit)
+        )
+        return result.data or []
+
     async def create_tables_if_not_exist(self):
         """Erstellt notwendige Tabellen falls sie nicht existieren"""
         try:
             # Prüfe ob project_memory Tabelle existiert
-            result = self.client.table("project_memory").select("id").limit(1).execute()
+            await self.execute(
+                self.client.table("project_memory").select("id").limit(1)
+            )
             logger.info("✅ project_memory Tabelle existiert bereits")
         except Exception:
-            logger.warning("⚠️ project_memory Tabelle nicht gefunden - bitte manuell erstellen")
-            
+            logger.warning(
+                "⚠️ project_memory Tabelle nicht gefunden - bitte manuell erstellen"
+            )
+
         try:
             # Prüfe ob embedding_usage Tabelle existiert
-            result = self.client.table("embedding_usage").select("id").limit(1).execute()
+            await self.execute(
+                self.client.table("embedding_usage").select("id").limit(1)
+            )
             logger.info("✅ embedding_usage Tabelle existiert bereits")
         except Exception:
-            logger.warning("⚠️ embedding_usage Tabelle nicht gefunden - bitte manuell erstellen")
\ No newline at end of file
+            logger.warning(
+                "⚠️ embedding_usage Tabelle nicht gefunden - bitte manuell erstellen"
+            )
@@ -0,0 +1,58 @@
+import logging
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Grobe Schätzung: ~4 Zeichen pro Token bei englischem/deutschem Text
+CHARS_PER_TOKEN = 4
+
+try:
+    import tiktoken
+except ImportError:  # optional: ohne tiktoken wird geschätzt
+    tiktoken = None
+
+
+class TokenCounter:
+    """Zählt Tokens lokal, ohne die Embedding-API aufzurufen.
+
+    Mit installiertem ``tiktoken`` exakt über das BPE-Encoding des Modells
+    (nur für OpenAI-Modelle, siehe ``use_tiktoken``), sonst per
+    Zeichen-Schätzung. Die Schätzung liegt für normalen Text eher zu hoch,
+    ist also als Obergrenze für Limits und Kosten geeignet.
+    """
+
+    def __init__(self, model: str, use_tiktoken: bool = True):
+        self.model = model
+        self._encoding = None
+        if use_tiktoken and tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except Exception as e:
+                # z.B. unbekanntes Modell oder BPE-Datei nicht ladbar (offline)
+                logger.warning(
+                    f"⚠️ tiktoken nicht nutzbar für '{model}', schätze Tokens: {str(e)}"
+                )
+        logger.info(
+            f"🔢 Token-Zählung für '{model}': "
+            f"{'tiktoken' if self.exact else 'Schätzung'}"
+        )
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        """Tokens eines Textes"""
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    def segment_counter(self) -> Callable[[str], float]:
+        """Zähler für Textstücke beim Chunking.
+
+        Die Schätzung rechnet hier anteilig, sonst würde jedes Wort
+        mindestens ein Token kosten.
+        """
+        if self._encoding is not None:
+            return self.count
+        return lambda segment: len(segment) / CHARS_PER_TOKEN
@@ -1,23 +1,50 @@
 import logging
+import time
 from datetime import datetime, timezone
-from typing import Dict, Any
-from app.supabase_client import SupabaseClient
+from typing import Any, Optional
+
+from app.metrics import TOKENS, project_label, timed
+from app.pricing import DEFAULT_EMBEDDING_MODEL, cost_for_tokens
+from app.storage import StorageBackend, summarize_usage_rollups
+from app.usage_writer import UsageWriter
 
 logger = logging.getLogger(__name__)
 
 
+# Sekunden, nach denen der In-Process-Zähler aus dem Rollup neu geladen wird
+# (andere Worker schreiben ebenfalls in dieselben Rollups)
+MONTHLY_COUNTER_TTL = 60.0
+
+
+def _current_month() -> str:
+    """Erster Tag des aktuellen Monats (UTC) als ISO-Datum"""
+    return datetime.now(timezone.utc).date().replace(day=1).isoformat()
+
+
 class UsageTracker:
-    def __init__(self, supabase_client: SupabaseClient):
-        self.supabase = supabase_client
+    def __init__(
+        self,
+        storage: StorageBackend,
+        writer: Optional[UsageWriter] = None,
+        model: str = DEFAULT_EMBEDDING_MODEL,
+    ):
+        self.storage = storage
+        # Preis aus der gemeinsamen Tabelle in app.pricing
+        self.model = model
+        # Mit laufendem Writer werden Events im Hintergrund gebündelt geschrieben
+        self.writer = writer
+        # project -> (monat, tokens, geladen_um)
+        self._monthly: dict[str, tuple[str, int, float]] = {}
         logger.info("✅ Usage Tracker initialisiert")
 
     async def track_usage(
-        self, 
-        project: str, 
-        usage_type: str, 
-        tokens: int
-    ) -> Dict[str, Any]:
-        """Speichert Token-Verbrauch in embedding_usage Tabelle"""
+        self, project: str, usage_type: str, tokens: int
+    ) -> dict[str, Any]:
+        """Speichert Token-Verbrauch in embedding_usage Tabelle.
+
+        Läuft der UsageWriter, wird das Event nur eingereiht und der Request
+        wartet nicht auf den Insert.
+        """
         try:
             data = {
                 "project": project,
@@ -25,153 +52,181 @@ class UsageTracker:
                 "tokens": tokens,
                 "created_at": datetime.now(timezone.utc).isoformat(),
             }
-            
-            result = self.supabase.client.table("embedding_usage").insert(data).execute()
-            
-            if result.data:
-                logger.info(f"📊 Usage getrackt: {tokens} Tokens ({usage_type}) für Projekt '{project}'")
-                return result.data[0]
-            else:
-                raise Exception("Keine Daten zurückgegeben")
-                
+
+            TOKENS.inc(project_label(project), usage_type, amount=tokens)
+            if self.writer is not None and self.writer.running:
+                if self.writer.enqueue(data):
+                    self._add_to_monthly_counter(project, tokens)
+                return data
+
+            await self.storage.insert_usage([data])
+            self._add_to_monthly_counter(project, tokens)
+            logger.debug(
+                "📊 Usage getrackt: %d Tokens (%s) für Projekt '%s'",
+                tokens,
+                usage_type,
+                project,
+            )
+            return data
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Tracking der Usage: {str(e)}")
             raise
 
+    def _add_to_monthly_counter(self, project: str, tokens: int):
+        """Erhöht den In-Process-Zähler, falls er für diesen Monat geladen ist"""
+        entry = self._monthly.get(project)
+        if entry and entry[0] == _current_month():
+            self._monthly[project] = (entry[0], entry[1] + tokens, entry[2])
+
+    @timed("monthly_usage")
     async def get_monthly_usage(self, project: str) -> int:
-        """Ermittelt den monatlichen Token-Verbrauch für ein Projekt"""
+        """Ermittelt den monatlichen Token-Verbrauch für ein Projekt.
+
+        Liest aus dem In-Process-Zähler; nur bei Monatswechsel oder nach
+        MONTHLY_COUNTER_TTL wird die (eine) Rollup-Zeile neu geladen.
+        """
         try:
-            # Aktueller Monat - Anfang und Ende
-            now = datetime.now(timezone.utc)
-            month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            
-            # Query für aktuellen Monat
-            result = self.supabase.client.table("embedding_usage").select("tokens").eq(
-                "project", project
-            ).gte("created_at", month_start.isoformat()).execute()
-            
-            if result.data:
-                total_tokens = sum(entry["tokens"] for entry in result.data)
-                logger.info(f"📈 Monatlicher Verbrauch für '{project}': {total_tokens:,} Tokens")
-                return total_tokens
-            else:
-                return 0
-                
+            month = _current_month()
+            entry = self._monthly.get(project)
+            if (
+                entry
+                and entry[0] == month
+                and time.monotonic() - entry[2] < MONTHLY_COUNTER_TTL
+            ):
+                return entry[1]
+
+            rows = await self.storage.fetch_usage_rollups(project, month)
+
+            total_tokens = sum(row["tokens"] for row in rows)
+            # Eingereihte, aber noch nicht geschriebene Events mitzählen
+            if self.writer is not None:
+                total_tokens += self.writer.pending_tokens(project)
+            self._monthly[project] = (month, total_tokens, time.monotonic())
+            logger.debug(
+                "📈 Monatlicher Verbrauch für '%s': %d Tokens", project, total_tokens
+            )
+            return total_tokens
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Abrufen der monatlichen Usage: {str(e)}")
             return 0
 
-    async def get_project_stats(self, project: str) -> Dict[str, Any]:
+    def _add_pending(self, project_stats: dict[str, Any]):
+        """Rechnet eingereihte, noch nicht geschriebene Events in die Summen ein"""
+        for event in self.writer.pending_events(project_stats["project"]):
+            project_stats["total_tokens"] += event["tokens"]
+            project_stats["monthly_tokens"] += event["tokens"]
+            operation_key = f"{event['usage_type']}_operations"
+            if operation_key in project_stats:
+                project_stats[operation_key] += 1
+            project_stats["total_operations"] += 1
+            if not project_stats["first_usage"]:
+                project_stats["first_usage"] = event["created_at"]
+            if (
+                not project_stats["last_usage"]
+                or event["created_at"] > project_stats["last_usage"]
+            ):
+                project_stats["last_usage"] = event["created_at"]
+
+    async def get_usage_stats(
+        self, projects: Optional[list[str]] = None
+    ) -> dict[str, dict[str, Any]]:
+        """Usage-Summen und geschätzte Kosten pro Projekt in einer Abfrage.
+
+        Eingereihte, aber noch nicht geschriebene Events zählen mit.
+        """
+        month = _current_month()
+        stats = await self.storage.fetch_usage_stats(month, projects)
+        if self.writer is not None:
+            for project in self.writer.pending_projects():
+                if projects is None or project in projects:
+                    stats.setdefault(
+                        project, summarize_usage_rollups(project, [], month)
+                    )
+        for project_stats in stats.values():
+            if self.writer is not None:
+                self._add_pending(project_stats)
+            project_stats["estimated_cost_usd"] = round(
+                cost_for_tokens(project_stats["total_tokens"], self.model), 6
+            )
+        return stats
+
+    async def get_project_stats(self, project: str) -> dict[str, Any]:
         """Liefert detaillierte Statistiken für ein Projekt"""
         try:
-            # Alle Usage-Einträge für das Projekt
-            result = self.supabase.client.table("embedding_usage").select("*").eq(
-                "project", project
-            ).order("created_at", desc=True).execute()
-            
-            if not result.data:
-                return {
-                    "project": project,
-                    "total_tokens": 0,
-                    "monthly_tokens": 0,
-                    "save_operations": 0,
-                    "search_operations": 0,
-                    "estimated_cost_usd": 0.0,
-                    "first_usage": None,
-                    "last_usage": None,
-                }
-            
-            entries = result.data
-            
-            # Gesamtstatistiken
-            total_tokens = sum(entry["tokens"] for entry in entries)
-            save_ops = len([e for e in entries if e["usage_type"] == "save"])
-            search_ops = len([e for e in entries if e["usage_type"] == "search"])
-            
-            # Monatliche Tokens
-            monthly_tokens = await self.get_monthly_usage(project)
-            
-            # Kosten berechnen (text-embedding-3-small: $0.00002 per 1K tokens)
-            estimated_cost = (total_tokens / 1000) * 0.00002
-            
-            stats = {
-                "project": project,
-                "total_tokens": total_tokens,
-                "monthly_tokens": monthly_tokens,
-                "save_operations": save_ops,
-                "search_operations": search_ops,
-                "estimated_cost_usd": round(estimated_cost, 6),
-                "first_usage": entries[-1]["created_at"] if entries else None,
-                "last_usage": entries[0]["created_at"] if entries else None,
-                "total_operations": len(entries),
+            stats = (await self.get_usage_stats([project])).get(project) or {
+                **summarize_usage_rollups(project, [], _current_month()),
+                "estimated_cost_usd": 0.0,
             }
-            
-            logger.info(f"📊 Projekt-Stats für '{project}': {total_tokens:,} Tokens, ${estimated_cost:.6f}")
+
+            logger.info(
+                f"📊 Projekt-Stats für '{project}': {stats['total_tokens']:,} Tokens, "
+                f"${stats['estimated_cost_usd']:.6f}"
+            )
             return stats
-            
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Abrufen der Projekt-Statistiken: {str(e)}")
             raise
 
-    async def get_all_projects_usage(self) -> Dict[str, Any]:
+    async def get_all_projects_usage(self) -> dict[str, Any]:
         """Liefert Usage-Übersicht für alle Projekte"""
         try:
-            # Alle Projekte ermitteln
-            result = self.supabase.client.table("embedding_usage").select("project").execute()
-            
-            if not result.data:
+            # Eine aggregierte Abfrage, gruppiert nach Projekt
+            project_stats = list((await self.get_usage_stats()).values())
+
+            if not project_stats:
                 return {"projects": [], "total_tokens": 0, "estimated_cost_usd": 0.0}
-            
-            # Einzigartige Projekte
-            projects = list(set(entry["project"] for entry in result.data))
-            
-            project_stats = []
-            total_tokens = 0
-            
-            for project in projects:
-                stats = await self.get_project_stats(project)
-                project_stats.append(stats)
-                total_tokens += stats["total_tokens"]
-            
+
+            total_tokens = sum(stats["total_tokens"] for stats in project_stats)
+
             # Nach Tokens sortieren
             project_stats.sort(key=lambda x: x["total_tokens"], reverse=True)
-            
-            total_cost = (total_tokens / 1000) * 0.00002
-            
+
+            total_cost = cost_for_tokens(total_tokens, self.model)
+
             overview = {
                 "projects": project_stats,
-                "total_projects": len(projects),
+                "total_projects": len(project_stats),
                 "total_tokens": total_tokens,
                 "estimated_cost_usd": round(total_cost, 6),
                 "generated_at": datetime.now(timezone.utc).isoformat(),
             }
-            
-            logger.info(f"📊 Gesamt-Usage: {len(projects)} Projekte, {total_tokens:,} Tokens, ${total_cost:.6f}")
+
+            logger.info(
+                f"📊 Gesamt-Usage: {len(project_stats)} Projekte, {total_tokens:,} "
+                f"Tokens, ${total_cost:.6f}"
+            )
             return overview
-            
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Abrufen der Gesamt-Usage: {str(e)}")
             raise
 
     async def get_recent_activities(self, project: str, limit: int = 5) -> list:
-        """Liefert die letzten Aktivitäten für ein Projekt"""
+        """Letzte Aktivitäten eines Projekts (inkl. eingereihter Events)"""
         try:
-            result = self.supabase.client.table("embedding_usage")\
-                .select("*")\
-                .eq("project", project)\
-                .order("created_at", desc=True)\
-                .limit(limit)\
-                .execute()
-            
-            if result.data:
-                return [{
+            pending = (
+                self.writer.pending_events(project)[::-1]
+                if self.writer is not None
+                else []
+            )
+            entries = pending[:limit]
+            if len(entries) < limit:
+                entries += await self.storage.fetch_recent_usage(
+                    project, limit - len(entries)
+                )
+
+            return [
+                {
                     "type": entry["usage_type"],
                     "tokens": entry["tokens"],
-                    "timestamp": entry["created_at"]
-                } for entry in result.data]
-            else:
-                return []
-                
+                    "timestamp": entry["created_at"],
+                }
+                for entry in entries
+            ]
+
         except Exception as e:
             logger.error(f"❌ Fehler beim Abrufen der Aktivitäten: {str(e)}")
-            return []
\ No newline at end of file
+            return []
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Any, Optional
+
+from app.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# Sentinel, mit dem stop() den Flusher beendet
+_STOP = object()
+
+
+class UsageWriter:
+    """Schreibt Usage-Events gebündelt im Hintergrund nach embedding_usage.
+
+    Requests legen Events nur in eine begrenzte Queue. Ein Flusher-Task
+    schreibt sie als Multi-Row-Insert, sobald ``batch_size`` Events
+    vorliegen oder ``flush_interval`` Sekunden vergangen sind. Ist die Queue
+    voll, wird das Event verworfen und gezählt statt den Request zu blockieren.
+    """
+
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+        self.max_queue = int(os.getenv("USAGE_QUEUE_SIZE", "10000"))
+        self.batch_size = int(os.getenv("USAGE_FLUSH_BATCH_SIZE", "200"))
+        self.flush_interval = float(os.getenv("USAGE_FLUSH_INTERVAL", "1.0"))
+        self.max_retries = 3
+        self._queue: Optional["asyncio.Queue[Any]"] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        # Eingereihte, aber noch nicht geschriebene Events und Tokens pro
+        # Projekt (in Queue-Reihenfolge, Batches werden vorne abgebaut)
+        self._pending: dict[str, deque[dict[str, Any]]] = {}
+        self._pending_tokens: dict[str, int] = {}
+        logger.info("✅ Usage Writer initialisiert")
+
+    def start(self):
+        """Startet den Flusher-Task (im laufenden Event-Loop aufrufen)"""
+        if self._task is None:
+            self._closing = False
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._closing
+
+    def enqueue(self, event: dict[str, Any]) -> bool:
+        """Legt ein Event in die Queue, ohne zu blockieren"""
+        if self._closing or self._queue is None:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(
+                f"⚠️ Usage-Queue voll ({self.max_queue}), Event verworfen "
+                f"(insgesamt {self.dropped} verworfen)"
+            )
+            return False
+        self.enqueued += 1
+        project = event["project"]
+        self._pending.setdefault(project, deque()).append(event)
+        self._pending_tokens[project] = (
+            self._pending_tokens.get(project, 0) + event["tokens"]
+        )
+        return True
+
+    def pending_tokens(self, project: str) -> int:
+        """Noch nicht geschriebene Tokens eines Projekts"""
+        return self._pending_tokens.get(project, 0)
+
+    def pending_events(self, project: str) -> list[dict[str, Any]]:
+        """Noch nicht geschriebene Events eines Projekts (älteste zuerst)"""
+        return list(self._pending.get(project, ()))
+
+    def pending_projects(self) -> list[str]:
+        """Projekte mit noch nicht geschriebenen Events"""
+        return list(self._pending)
+
+    def _release(self, batch: list[dict[str, Any]]):
+        for event in batch:
+            project = event["project"]
+            events = self._pending.get(project)
+            if events:
+                events.popleft()
+            if not events:
+                self._pending.pop(project, None)
+                self._pending_tokens.pop(project, None)
+            else:
+                self._pending_tokens[project] -= event["tokens"]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await self._queue.get()
+            if event is _STOP:
+                return
+            batch = [event]
+            stop = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if event is _STOP:
+                    stop = True
+                    break
+                batch.append(event)
+            await self._write(batch)
+            if stop:
+                return
+
+    async def _write(self, batch: list[dict[str, Any]]):
+        """Schreibt einen Batch mit Retry und Backoff"""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await self.storage.insert_usage(batch)
+                self.written += len(batch)
+                self.flushes += 1
+                self._release(batch)
+                logger.info(f"📊 Usage geschrieben: {len(batch)} Events")
+                return
+            except Exception as e:
+                logger.warning(
+                    "⚠️ Usage-Flush fehlgeschlagen (Versuch "
+                    f"{attempt}/{self.max_retries}): {str(e)}"
+                )
+                if attempt < self.max_retries:
+                    await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+        self.failed += len(batch)
+        self._release(batch)
+        logger.error(f"❌ {len(batch)} Usage-Events konnten nicht geschrieben werden")
+
+    async def stop(self, timeout: float = 10.0):
+        """Nimmt keine Events mehr an und schreibt die Queue leer"""
+        self._closing = True
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.put(_STOP), timeout)
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.error(
+                f"❌ Usage-Queue nicht vollständig geschrieben, "
+                f"{self._queue.qsize()} Events verworfen"
+            )
+        self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        """Zähler für geschriebene, verworfene und wartende Events"""
+        return {
+            "backlog": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "running": self.running,
+        }
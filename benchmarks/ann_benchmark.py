@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Recall vs. Latenz: IVF-Index des lokalen Backends gegen die exakte Suche.
+
+Erzeugt einen synthetischen Datensatz (geclusterte, normierte Vektoren),
+speichert ihn in einem temporären ProjectStore und misst für mehrere
+nprobe-Werte recall@k und die Latenz pro Query.
+
+    python benchmarks/ann_benchmark.py --rows 200000 --dim 1536 --queries 200
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.ann import IVFIndex  # noqa: E402
+from app.local_store import ProjectStore, normalize_rows  # noqa: E402
+
+
+def synthetic_vectors(centers: np.ndarray, rows: int, seed: int) -> np.ndarray:
+    """Gaußsche Cluster um feste Zentren, wie thematisch gruppierte Notizen"""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, centers.shape[0], rows)
+    noise = rng.standard_normal((rows, centers.shape[1])).astype(np.float32) * 0.6
+    return normalize_rows(centers[labels] + noise)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = sqrt(rows)")
+    parser.add_argument(
+        "--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64]
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProjectStore(Path(tmp), ann_min_rows=0, ann_nprobe=args.nprobe[0])
+        centers = (
+            np.random.default_rng(args.seed)
+            .standard_normal((args.clusters, args.dim))
+            .astype(np.float32)
+        )
+        print(f"📦 Erzeuge {args.rows} Vektoren (dim {args.dim}) ...")
+        batch = 20000
+        for start in range(0, args.rows, batch):
+            n = min(batch, args.rows - start)
+            vectors = synthetic_vectors(centers, n, args.seed + 1 + start)
+            store.append([{"id": str(start + i)} for i in range(n)], vectors)
+
+        queries = synthetic_vectors(centers, args.queries, args.seed - 1)
+        matrix = store.matrix()
+
+        # Exakte Suche als Referenz
+        truth, exact_times = [], []
+        for query in queries:
+            started = time.perf_counter()
+            hits = store.search(query, args.k, -1.0, exact=True)
+            exact_times.append(time.perf_counter() - started)
+            truth.append({i for i, _ in hits})
+
+        started = time.perf_counter()
+        nlist = args.nlist or int(np.sqrt(args.rows))
+        index = IVFIndex.build(matrix, nlist, args.nprobe[0])
+        build_seconds = time.perf_counter() - started
+
+        print(
+            f"\n🧭 IVF: {index.nlist} Listen, Build {build_seconds:.2f}s, k={args.k}\n"
+        )
+        print(
+            f"{'Modus':<14}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'Speedup':>10}"
+        )
+        exact_p50 = percentile_ms(exact_times, 50)
+        print(
+            f"{'exakt':<14}{1.0:>10.3f}{exact_p50:>10.2f}"
+            f"{percentile_ms(exact_times, 95):>10.2f}{1.0:>10.1f}"
+        )
+
+        for nprobe in args.nprobe:
+            recalls, times = [], []
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                hits = index.search(matrix, query, args.k, -1.0, nprobe=nprobe)
+                times.append(time.perf_counter() - started)
+                recalls.append(
+                    len(expected & {i for i, _ in hits}) / max(1, len(expected))
+                )
+            p50 = percentile_ms(times, 50)
+            print(
+                f"{'nprobe=' + str(nprobe):<14}{np.mean(recalls):>10.3f}{p50:>10.2f}"
+                f"{percentile_ms(times, 95):>10.2f}{exact_p50 / p50:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
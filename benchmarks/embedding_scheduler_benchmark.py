@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Durchsatz und Latenz einzelner Embedding-Anfragen mit und ohne Micro-Batching.
+
+Simuliert einen Provider mit fester Latenz pro API-Aufruf (--call-ms) plus
+einem kleinen Anteil pro Text (--per-input-ms) und schickt --requests
+Anfragen mit --concurrency gleichzeitigen Aufrufern durch den
+EmbeddingScheduler, je einmal pro Sammelfenster (--windows, 0 = ohne
+Bündelung, wie EMBEDDING_BATCH_WINDOW_MS):
+
+    python benchmarks/embedding_scheduler_benchmark.py --windows 0 2 5 10
+
+Das Parallelitätslimit (--max-concurrency) entspricht
+EMBEDDING_MAX_CONCURRENCY; ohne Bündelung begrenzt es den Durchsatz auf
+max_concurrency / call_ms.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.embedding_providers import HashProvider  # noqa: E402
+from app.embedding_scheduler import EmbeddingScheduler  # noqa: E402
+
+
+class SimulatedProvider(HashProvider):
+    """Hash-Embeddings mit simulierter API-Latenz"""
+
+    def __init__(self, call_ms: float, per_input_ms: float):
+        super().__init__()
+        self.call_seconds = call_ms / 1000
+        self.per_input_seconds = per_input_ms / 1000
+        self.calls = 0
+
+    async def embed(self, texts):
+        self.calls += 1
+        await asyncio.sleep(self.call_seconds + self.per_input_seconds * len(texts))
+        return await super().embed(texts)
+
+
+async def run(args, window_ms: float):
+    provider = SimulatedProvider(args.call_ms, args.per_input_ms)
+    scheduler = EmbeddingScheduler(
+        provider,
+        window_ms,
+        max_inputs=512,
+        max_tokens=50000,
+        max_concurrency=args.max_concurrency,
+    )
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(f"anfrage {i} über das projektgedächtnis")
+    latencies = []
+
+    async def worker():
+        while not queue.empty():
+            text = queue.get_nowait()
+            started = time.perf_counter()
+            await scheduler.embed(text, provider.tokenizer.count(text))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    return (
+        args.requests / elapsed,
+        float(np.percentile(latencies, 50) * 1000),
+        float(np.percentile(latencies, 95) * 1000),
+        provider.calls,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--concurrency", type=int, default=64, help="Gleichzeitige Aufrufer"
+    )
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5, 10])
+    parser.add_argument(
+        "--call-ms", type=float, default=80.0, help="Latenz pro API-Aufruf"
+    )
+    parser.add_argument(
+        "--per-input-ms", type=float, default=0.2, help="Zusätzliche Latenz pro Text"
+    )
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    print(
+        f"📦 {args.requests} Anfragen, {args.concurrency} Aufrufer, "
+        f"{args.call_ms:.0f} ms pro Aufruf, max. {args.max_concurrency} parallel"
+    )
+    print(
+        f"\n{'Fenster ms':>11}{'Anfragen/s':>12}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'API-Aufrufe':>13}"
+    )
+    for window_ms in args.windows:
+        throughput, p50, p95, calls = asyncio.run(run(args, window_ms))
+        print(f"{window_ms:>11.1f}{throughput:>12.0f}{p50:>9.1f}{p95:>9.1f}{calls:>13}")
+
+
+if __name__ == "__main__":
+    main()
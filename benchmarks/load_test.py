@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Lasttest der FastAPI-App mit lokalen Stand-ins, reproduzierbar per Seed.
+
+Startet main.py per uvicorn in einem eigenen Prozess mit dem Hash-Provider
+(EMBEDDING_PROVIDER=hash, ohne Netz und Kosten) und dem lokalen Backend in
+einem temporären Verzeichnis, legt synthetische Projekte an (per
+/save/batch) und treibt dann jedes Szenario mit fester Parallelität:
+
+    python benchmarks/load_test.py --rows 2000 --concurrency 16 --requests 2000
+
+Szenarien: ``save`` (POST /save mit neuem Inhalt), ``search`` (GET /search
+mit Queries aus einem festen Pool), ``stats`` (GET /project/{project}/stats)
+und ``mixed`` (save und search gleichzeitig, Anteil der Saves per
+--mixed-save-ratio; misst Suchen, während Indizes und Caches wachsen).
+Ausgegeben werden Durchsatz und p50/p95/p99 pro Szenario, bei ``mixed``
+zusätzlich getrennt als ``mixed:save`` und ``mixed:search``.
+
+    # Ergebnis als Baseline speichern
+    python benchmarks/load_test.py --write-baseline benchmarks/baselines/load_test.json
+    # Gegen die Baseline prüfen (Exit-Code 1 bei Regression)
+    python benchmarks/load_test.py --baseline benchmarks/baselines/load_test.json
+
+Gegen Supabase bzw. eine lokale Postgres+pgvector-Instanz: mit
+``--storage supabase`` gelten SUPABASE_URL, SUPABASE_API_KEY und optional
+SUPABASE_DB_URL aus der Umgebung (z.B. ``supabase start``). Mit ``--url``
+wird statt eines eigenen Prozesses ein laufender Server getestet.
+Baselines sind nur auf derselben Maschine mit denselben Parametern
+vergleichbar.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ("save", "search", "stats", "mixed")
+# Metriken, die gegen die Baseline geprüft werden (höher = schlechter)
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+# Kleines Vokabular: Texte mit gemeinsamen Wörtern sind für den
+# Hash-Provider ähnlich, Suchen liefern also echte Treffer
+VOCABULARY = (
+    "api auth backend bug cache cli config cursor datenbank deploy docker embedding "
+    "endpoint fehler frontend funktion hook index komponente latenz log middleware "
+    "migration modell monitoring parser performance projekt prompt query queue rag "
+    "release route schema server service session speicher suche test token upload "
+    "usage vektor version worker"
+).split()
+
+
+def synthetic_text(rng: np.random.Generator, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY, size=words))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, data_dir: str):
+    """Startet uvicorn mit main:app und wartet auf /health"""
+    port = free_port()
+    env = {
+        **os.environ,
+        "EMBEDDING_PROVIDER": "hash",
+        "RAGGADON_STORAGE": args.storage,
+        "RAGGADON_DATA_DIR": data_dir,
+    }
+    log = open(Path(data_dir) / "server.log", "wb")
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(args.workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server beendet, siehe {log.name}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server nicht rechtzeitig gestartet")
+
+
+async def seed(client: httpx.AsyncClient, args, rng: np.random.Generator):
+    """Legt --projects Projekte mit je --rows Einträgen an"""
+    for p in range(args.projects):
+        for start in range(0, args.rows, 500):
+            items = [
+                {
+                    "role": "user",
+                    "content": f"{synthetic_text(rng, args.words)} #{p}-{i}",
+                }
+                for i in range(start, min(start + 500, args.rows))
+            ]
+            response = await client.post(
+                "/save/batch",
+                json={"project": f"bench-{p}", "items": items},
+                timeout=300,
+            )
+            response.raise_for_status()
+
+
+def make_request(scenario: str, args, rng: np.random.Generator, queries, counter: int):
+    """(Methode, Pfad, Parameter, Body) für eine Anfrage des Szenarios"""
+    project = f"bench-{int(rng.integers(args.projects))}"
+    if scenario == "save":
+        content = f"{synthetic_text(rng, args.words)} neu-{counter}"
+        return (
+            "POST",
+            "/save",
+            None,
+            {"project": project, "role": "user", "content": content},
+        )
+    if scenario == "search":
+        query = queries[int(rng.integers(len(queries)))]
+        return (
+            "GET",
+            "/search",
+            {"project": project, "query": query, "limit": 5, "threshold": 0},
+            None,
+        )
+    return "GET", f"/project/{project}/stats", None, None
+
+
+def summarize(latencies, errors: int, duration: float, args, total: int):
+    """Durchsatz und Perzentile aus den gemessenen Latenzen (Sekunden)"""
+    measured = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        # Warmup-Anteil grob herausrechnen
+        "throughput_rps": round(len(latencies) / (duration * args.requests / total), 1),
+        "p50_ms": round(float(np.percentile(measured, 50)), 2),
+        "p95_ms": round(float(np.percentile(measured, 95)), 2),
+        "p99_ms": round(float(np.percentile(measured, 99)), 2),
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, args, queries):
+    """Ergebnisse pro Szenario.
+
+    ``mixed`` liefert zusätzlich ``mixed:save`` und ``mixed:search``.
+    """
+    rng = np.random.default_rng(args.seed + SCENARIOS.index(scenario) + 1)
+    total = args.warmup + args.requests
+    next_index = 0
+    latencies = {}
+    errors = {}
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            kind = scenario
+            if scenario == "mixed":
+                kind = "save" if rng.random() < args.mixed_save_ratio else "search"
+            method, path, params, body = make_request(kind, args, rng, queries, index)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params, json=body)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if index >= args.warmup:
+                latencies.setdefault(kind, []).append(elapsed)
+                errors[kind] = errors.get(kind, 0) + (not ok)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+    if scenario != "mixed":
+        return {
+            scenario: summarize(
+                latencies[scenario], errors[scenario], duration, args, total
+            )
+        }
+
+    # Durchsatz der Teil-Szenarien bezieht sich auf dieselbe Laufzeit
+    results = {
+        scenario: summarize(
+            [value for values in latencies.values() for value in values],
+            sum(errors.values()),
+            duration,
+            args,
+            total,
+        )
+    }
+    for kind in sorted(latencies):
+        results[f"{scenario}:{kind}"] = summarize(
+            latencies[kind], errors[kind], duration, args, total
+        )
+    return results
+
+
+def compare(results, baseline, tolerance: float) -> bool:
+    """Meldet Regressionen gegenüber der Baseline; True, wenn es welche gibt"""
+    regressions = []
+    for scenario, current in results["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(scenario)
+        if reference is None:
+            continue
+        for key in LATENCY_KEYS:
+            if current[key] > reference[key] * (1 + tolerance):
+                regressions.append(
+                    f"{scenario} {key}: {reference[key]} -> {current[key]}"
+                )
+        if current["throughput_rps"] < reference["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario} throughput_rps: {reference['throughput_rps']} -> "
+                f"{current['throughput_rps']}"
+            )
+        if current["errors"] > reference["errors"]:
+            regressions.append(
+                f"{scenario} errors: {reference['errors']} -> {current['errors']}"
+            )
+
+    if set(baseline.get("parameters", {}).items()) != set(
+        results["parameters"].items()
+    ):
+        print(
+            "⚠️ Parameter weichen von der Baseline ab, Vergleich nur eingeschränkt "
+            "aussagekräftig"
+        )
+    if regressions:
+        print(f"\n🔺 Regressionen (Toleranz {tolerance:.0%}):")
+        for line in regressions:
+            print(f"   {line}")
+        return True
+    print(f"\n✅ Keine Regression gegenüber der Baseline (Toleranz {tolerance:.0%})")
+    return False
+
+
+async def run(args):
+    rng = np.random.default_rng(args.seed)
+    queries = [synthetic_text(rng, 3) for _ in range(args.query_pool)]
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        process = None
+        url = args.url
+        if url is None:
+            process, url = start_server(args, data_dir)
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(
+                base_url=url, limits=limits, timeout=60
+            ) as client:
+                started = time.perf_counter()
+                if args.rows:
+                    await seed(client, args, rng)
+                print(
+                    f"📦 {args.projects} Projekte à {args.rows} Einträge angelegt "
+                    f"({time.perf_counter() - started:.1f}s)"
+                )
+                scenarios = {}
+                for scenario in args.scenarios:
+                    scenarios.update(
+                        await run_scenario(client, scenario, args, queries)
+                    )
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+    return {
+        "parameters": {
+            "projects": args.projects,
+            "rows": args.rows,
+            "words": args.words,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "query_pool": args.query_pool,
+            "mixed_save_ratio": args.mixed_save_ratio,
+            "storage": args.storage,
+            "workers": args.workers,
+            "seed": args.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "scenarios": scenarios,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--projects", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=2000, help="Einträge pro Projekt")
+    parser.add_argument("--words", type=int, default=40, help="Wörter pro Eintrag")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--requests", type=int, default=2000, help="Gemessene Anfragen pro Szenario"
+    )
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument(
+        "--query-pool", type=int, default=500, help="Verschiedene Suchanfragen"
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument(
+        "--mixed-save-ratio",
+        type=float,
+        default=0.2,
+        help="Anteil Saves im Szenario mixed",
+    )
+    parser.add_argument("--storage", choices=("local", "supabase"), default="local")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn-Worker")
+    parser.add_argument("--url", help="Laufenden Server testen statt einen zu starten")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="Baseline-JSON zum Vergleich")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Erlaubte Verschlechterung (0.2 = 20%%)",
+    )
+    parser.add_argument("--write-baseline", help="Ergebnis als Baseline-JSON speichern")
+    parser.add_argument("--output", help="Ergebnis als JSON speichern")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(
+        f"\n{'Szenario':<14}{'Anfragen':>10}{'Fehler':>8}{'req/s':>10}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    )
+    for scenario, r in results["scenarios"].items():
+        print(
+            f"{scenario:<14}{r['requests']:>10}{r['errors']:>8}{r['throughput_rps']:>10.1f}"
+            f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+        )
+
+    for path in (args.output, args.write_baseline):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(
+                json.dumps(results, indent=2) + "\n", encoding="utf-8"
+            )
+            print(f"💾 Ergebnis gespeichert: {path}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
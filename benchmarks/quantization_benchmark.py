@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Speicher, Latenz und recall@k für gekürzte und quantisierte Embeddings.
+
+Misst mit dem lokalen Backend (ProjectStore) jede Kombination aus Dimension
+(--dims, gekürzt und neu normiert wie EMBEDDING_DIMENSIONS) und
+Quantisierung (--quantization, wie VECTOR_QUANTIZATION) gegen die exakte
+float32-Suche mit voller Dimension:
+
+    python benchmarks/quantization_benchmark.py --rows 100000 --dims 1536 512 256
+
+Synthetische Vektoren sind beim Kürzen pessimistisch (die Information ist
+gleichmäßig verteilt, bei text-embedding-3 steckt sie vorne). Für echte
+Zahlen mit --embeddings eine .npy-Datei (n x dim) mit gespeicherten
+Embeddings übergeben; die letzten --queries Zeilen dienen als Queries.
+
+Spalten: Scan = Bytes pro Vektor, die die Kandidatensuche liest; Disk =
+Bytes pro Vektor auf der Platte (float32 plus Codes); JSON = Bytes pro
+Vektor als JSON-Liste beim Insert.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.local_store import ProjectStore, normalize_rows  # noqa: E402
+from app.quantization import code_width  # noqa: E402
+
+
+def synthetic_vectors(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Gaußsche Cluster um feste Zentren, wie thematisch gruppierte Notizen"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    noise = rng.standard_normal((rows, dim)).astype(np.float32) * 0.6
+    return normalize_rows(centers[labels] + noise)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument(
+        "--dim", type=int, default=1536, help="Volle Dimension (synthetisch)"
+    )
+    parser.add_argument("--dims", type=int, nargs="+", default=[1536, 512, 256])
+    parser.add_argument(
+        "--quantization", nargs="+", default=["none", "halfvec", "int8", "binary"]
+    )
+    parser.add_argument("--rerank-factor", type=int, nargs="+", default=[4])
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--embeddings", help=".npy-Datei mit echten Embeddings (n x dim)"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.embeddings:
+        data = normalize_rows(np.load(args.embeddings).astype(np.float32))
+        vectors, queries = data[: -args.queries], data[-args.queries :]
+    else:
+        data = synthetic_vectors(
+            args.rows + args.queries, args.dim, args.clusters, args.seed
+        )
+        vectors, queries = data[: args.rows], data[args.rows :]
+    full_dim = vectors.shape[1]
+    rows = [{"id": str(i)} for i in range(vectors.shape[0])]
+    print(
+        f"📦 {vectors.shape[0]} Vektoren (dim {full_dim}), {queries.shape[0]} Queries, "
+        f"k={args.k}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Referenz: exakte Suche mit voller Dimension
+        reference = ProjectStore(
+            Path(tmp) / "reference", ann_min_rows=10**12, ann_nprobe=1
+        )
+        reference.append(rows, vectors)
+        truth = [
+            {i for i, _ in reference.search(query, args.k, -1.0, exact=True)}
+            for query in queries
+        ]
+
+        print(
+            f"\n{'Dim':>6}{'Quantisierung':>15}{'Rerank':>8}{'Scan B':>9}{'Disk B':>9}"
+            f"{'JSON B':>9}{'recall@k':>10}{'p50 ms':>9}{'p95 ms':>9}"
+        )
+        for dim in args.dims:
+            if dim > full_dim:
+                continue
+            reduced = normalize_rows(vectors[:, :dim])
+            reduced_queries = normalize_rows(queries[:, :dim])
+            json_bytes = np.mean([len(json.dumps(v.tolist())) for v in reduced[:200]])
+
+            for quantization in args.quantization:
+                factors = args.rerank_factor if quantization != "none" else [1]
+                for factor in factors:
+                    path = Path(tmp) / f"{dim}-{quantization}-{factor}"
+                    store = ProjectStore(path, 10**12, 1, quantization, factor)
+                    store.append(rows, reduced)
+                    scan_bytes = dim * 4
+                    if quantization != "none":
+                        store.codes()
+                        scan_bytes = code_width(quantization, dim)
+                    disk_bytes = (
+                        sum(p.stat().st_size for p in path.glob("vectors.*"))
+                        / vectors.shape[0]
+                    )
+
+                    recalls, times = [], []
+                    for query, expected in zip(reduced_queries, truth):
+                        started = time.perf_counter()
+                        hits = store.search(query, args.k, -1.0)
+                        times.append(time.perf_counter() - started)
+                        recalls.append(len(expected & {i for i, _ in hits}) / args.k)
+
+                    print(
+                        f"{dim:>6}{quantization:>15}"
+                        f"{factor if quantization != 'none' else '-':>8}"
+                        f"{scan_bytes:>9}{disk_bytes:>9.0f}{json_bytes:>9.0f}"
+                        f"{np.mean(recalls):>10.3f}{percentile_ms(times, 50):>9.2f}"
+                        f"{percentile_ms(times, 95):>9.2f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Startzeiten: Import von main, Server bis /health und Hook-Skripte.
+
+Misst jeweils --runs frische Prozesse und meldet den Median:
+
+- ``import_main_ms``: ``python -X importtime -c "import main"`` (gesamt),
+  dazu die teuersten direkten Imports von main
+- ``supervisor_import_ms``: Import von ``app.server`` (Einstieg von
+  start_server.sh, ohne FastAPI und App)
+- ``ready_ms``: ``python -m app.server`` mit Hash-Provider und lokalem
+  Backend, bis /health antwortet (Import, lifespan, Warm-up)
+- ``hook_auto_rag_ms`` / ``hook_rag_mode_ms``: Kaltstart von
+  claude_auto_rag.py und get_rag_mode.py, die pro Editor-Hook laufen
+- ``hook_shell_mode_ms``: ``raggadon-hook.sh mode`` (ohne Python)
+
+    python benchmarks/startup_benchmark.py --runs 5
+
+Wie beim Lasttest lassen sich Ergebnisse als Baseline speichern und
+vergleichen (Exit-Code 1 bei Überschreitung):
+
+    cd benchmarks
+    python startup_benchmark.py --write-baseline baselines/startup.json
+    python startup_benchmark.py --baseline baselines/startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+METRICS = (
+    "import_main_ms",
+    "supervisor_import_ms",
+    "ready_ms",
+    "hook_auto_rag_ms",
+    "hook_rag_mode_ms",
+    "hook_shell_mode_ms",
+)
+
+
+def benchmark_env(data_dir: str) -> dict:
+    return {
+        **os.environ,
+        "EMBEDDING_PROVIDER": "hash",
+        "RAGGADON_STORAGE": "local",
+        "RAGGADON_DATA_DIR": data_dir,
+        "RAGGADON_WORKERS": "1",
+        "RELOAD": "false",
+    }
+
+
+def import_times(module: str, env: dict):
+    """Gesamtzeit (ms) und direkte Imports (Name, ms) laut -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Zeilen: "import time: self | kumuliert | <Einrückung>name",
+    # Kinder stehen vor dem Elternmodul
+    children = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2][1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        milliseconds = int(parts[1]) / 1000
+        if depth == 0:
+            if name.strip() == module:
+                return milliseconds, children
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), milliseconds))
+    raise RuntimeError(f"{module} nicht in der importtime-Ausgabe")
+
+
+def wall_time(args_list, env: dict, executable: str = sys.executable) -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        [executable, *args_list], cwd=ROOT, env=env, capture_output=True, check=False
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def ready_time(env: dict) -> float:
+    """Vom Prozessstart bis zur ersten erfolgreichen /health-Antwort"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server"],
+        cwd=ROOT,
+        env={**env, "HOST": "127.0.0.1", "PORT": str(port)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + 60
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("Server beendet")
+            try:
+                with urllib.request.urlopen(
+                    f"http://127.0.0.1:{port}/health", timeout=1
+                ):
+                    return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("Server nicht rechtzeitig gestartet")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def compare(results, baseline, tolerance: float) -> bool:
+    """Meldet Überschreitungen gegenüber der Baseline; True, wenn es welche gibt"""
+    regressions = []
+    for key in METRICS:
+        reference = baseline.get("metrics", {}).get(key)
+        current = results["metrics"].get(key)
+        if (
+            reference is not None
+            and current is not None
+            and current > reference * (1 + tolerance)
+        ):
+            regressions.append(f"{key}: {reference} -> {current}")
+    if regressions:
+        print(f"\n🔺 Regressionen (Toleranz {tolerance:.0%}):")
+        for line in regressions:
+            print(f"   {line}")
+        return True
+    print(f"\n✅ Keine Regression gegenüber der Baseline (Toleranz {tolerance:.0%})")
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--top", type=int, default=10, help="Teuerste direkte Imports von main"
+    )
+    parser.add_argument("--baseline", help="Baseline-JSON zum Vergleich")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="Erlaubte Verschlechterung (0.3 = 30%%)",
+    )
+    parser.add_argument("--write-baseline", help="Ergebnis als Baseline-JSON speichern")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = benchmark_env(data_dir)
+        samples = {key: [] for key in METRICS}
+        children_runs = []
+        for _ in range(args.runs):
+            total, children = import_times("main", env)
+            samples["import_main_ms"].append(total)
+            children_runs.append(dict(children))
+            samples["supervisor_import_ms"].append(import_times("app.server", env)[0])
+            samples["ready_ms"].append(ready_time(env))
+            samples["hook_auto_rag_ms"].append(wall_time(["claude_auto_rag.py"], env))
+            samples["hook_rag_mode_ms"].append(wall_time(["get_rag_mode.py"], env))
+            samples["hook_shell_mode_ms"].append(
+                wall_time(["raggadon-hook.sh", "mode"], env, "sh")
+            )
+
+    metrics = {
+        key: round(statistics.median(values), 1) for key, values in samples.items()
+    }
+    modules = {
+        name: round(statistics.median(run.get(name, 0.0) for run in children_runs), 1)
+        for name in children_runs[0]
+    }
+    top = sorted(modules.items(), key=lambda item: item[1], reverse=True)[: args.top]
+
+    print(f"⏱️ Median aus {args.runs} Läufen\n")
+    for key in METRICS:
+        print(f"{key:<24}{metrics[key]:>10.1f} ms")
+    print("\nTeuerste Imports von main:")
+    for name, ms in top:
+        print(f"   {name:<32}{ms:>8.1f} ms")
+
+    results = {
+        "parameters": {"runs": args.runs},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "metrics": metrics,
+        "main_imports_ms": dict(top),
+    }
+    if args.write_baseline:
+        Path(args.write_baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.write_baseline).write_text(
+            json.dumps(results, indent=2) + "\n", encoding="utf-8"
+        )
+        print(f"💾 Ergebnis gespeichert: {args.write_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
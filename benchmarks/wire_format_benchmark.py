@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+CPU-Zeit der Übertragungsformate pro Request (ohne Netzwerk).
+
+Vergleicht für jeden Schritt das bisherige JSON-Format mit dem kompakten:
+
+* Embedding-Antwort der API: JSON-Zahlenlisten vs. base64 -> float32-Array
+* Embeddings zum Storage: JSON-Liste für PostgREST vs. pgvector-Binärformat
+  (asyncpg-Pfad mit SUPABASE_DB_URL)
+* /search-Antwort: Pydantic/Standard-JSON vs. orjson vs. MessagePack
+
+    python benchmarks/wire_format_benchmark.py --dim 1536 --batch 32 --results 20
+
+orjson und msgpack sind optional; fehlende Varianten werden übersprungen.
+"""
+
+import argparse
+import base64
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.pgvector_binary import encode_vector  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def measure(fn, repeat: int) -> float:
+    """Median in Mikrosekunden"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return float(np.median(times) * 1e6)
+
+
+def report(title: str, variants, repeat: int):
+    print(f"\n{title}")
+    baseline = None
+    for label, fn in variants:
+        us = measure(fn, repeat)
+        baseline = baseline or us
+        print(f"  {label:<34}{us:>12.1f} µs{baseline / us:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument(
+        "--batch", type=int, default=32, help="Embeddings pro API-Antwort"
+    )
+    parser.add_argument(
+        "--results", type=int, default=20, help="Treffer pro /search-Antwort"
+    )
+    parser.add_argument("--content-length", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    from typing import Any, Optional
+
+    from pydantic import BaseModel
+
+    class SearchResponse(BaseModel):
+        results: list[dict[str, Any]]
+        tokens_used: int
+        monthly_project_usage: int
+        estimated_cost_usd: float
+        next_cursor: Optional[str] = None
+
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((args.batch, args.dim)).astype(np.float32)
+
+    float_body = json.dumps(
+        {"data": [{"index": i, "embedding": v.tolist()} for i, v in enumerate(vectors)]}
+    )
+    base64_body = json.dumps(
+        {
+            "data": [
+                {
+                    "index": i,
+                    "embedding": base64.b64encode(v.astype("<f4").tobytes()).decode(),
+                }
+                for i, v in enumerate(vectors)
+            ]
+        }
+    )
+    print(
+        f"📦 {args.batch} Embeddings à {args.dim} Dimensionen: "
+        f"JSON {len(float_body) / 1024:.0f} KiB, base64 {len(base64_body) / 1024:.0f} "
+        "KiB"
+    )
+
+    report(
+        "Embedding-Antwort dekodieren",
+        [
+            (
+                "JSON-Floats -> Listen",
+                lambda: [d["embedding"] for d in json.loads(float_body)["data"]],
+            ),
+            (
+                "base64 -> float32 (frombuffer)",
+                lambda: [
+                    np.frombuffer(base64.b64decode(d["embedding"]), dtype="<f4")
+                    for d in json.loads(base64_body)["data"]
+                ],
+            ),
+        ],
+        args.repeat,
+    )
+
+    rows = [
+        {"project": "p", "role": "user", "content": "x", "embedding": v}
+        for v in vectors
+    ]
+    variants = [
+        (
+            "PostgREST: JSON-Liste",
+            lambda: json.dumps(
+                [{**row, "embedding": row["embedding"].tolist()} for row in rows]
+            ),
+        ),
+        (
+            "asyncpg: pgvector binär",
+            lambda: [encode_vector(row["embedding"]) for row in rows],
+        ),
+    ]
+    report("Embeddings zum Storage kodieren", variants, args.repeat)
+
+    payload = {
+        "results": [
+            {
+                "id": f"00000000-0000-0000-0000-{i:012d}",
+                "project": "p",
+                "role": "user",
+                "content": "x" * args.content_length,
+                "similarity": float(rng.random()),
+                "created_at": "2024-01-01T00:00:00+00:00",
+                "parent_id": None,
+                "chunk_index": None,
+            }
+            for i in range(args.results)
+        ],
+        "tokens_used": 12,
+        "monthly_project_usage": 123456,
+        "estimated_cost_usd": 0.0025,
+        "next_cursor": None,
+    }
+    variants = [
+        ("Pydantic-Modell -> JSON", lambda: SearchResponse(**payload).model_dump_json())
+    ]
+    if orjson is not None:
+        variants.append(("orjson", lambda: orjson.dumps(payload)))
+    if msgpack is not None:
+        variants.append(("msgpack", lambda: msgpack.packb(payload, use_bin_type=True)))
+    report("/search-Antwort serialisieren", variants, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,107 +3,107 @@
 Claude Auto-RAG Integration
 Dieses Script kann von Claude Code automatisch verwendet werden,
 um wichtige Informationen proaktiv zu speichern.
+
+Läuft pro Hook-Aufruf als eigener Prozess: nur Standardbibliothek (urllib
+statt requests), die eigentliche Arbeit macht der laufende Server. Alle
+Infos eines Aufrufs gehen in einem Request an /save/batch. Für Hooks ohne
+Python-Kaltstart gibt es raggadon-hook.sh (curl an /hook/save).
 """
 
+import json
 import os
 import sys
-import json
-import requests
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any
+
+from app import hooks
 
 RAGGADON_URL = os.getenv("RAGGADON_URL", "http://127.0.0.1:8000")
+# Hooks sollen den Editor nicht blockieren
+RAGGADON_TIMEOUT = float(os.getenv("RAGGADON_TIMEOUT", "5"))
+
+
+def post_json(path: str, payload: dict[str, Any]) -> dict[str, Any]:
+    """POST an den laufenden Raggadon-Server, Antwort als dict"""
+    # Erst hier importiert: Aufrufe ohne Speichern laden den HTTP-Stack nicht
+    import urllib.request
+
+    request = urllib.request.Request(
+        f"{RAGGADON_URL}{path}",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=RAGGADON_TIMEOUT) as response:
+        return json.loads(response.read())
+
 
 class RaggadonAutoSaver:
     def __init__(self):
         self.project = Path.cwd().name
         self.saved_items = []
-        
+
     def should_save(self, content: str) -> bool:
         """Entscheidet ob Content gespeichert werden soll"""
-        # Wichtige Muster die gespeichert werden sollten
-        important_patterns = [
-            "class ", "def ", "function ",  # Code-Definitionen
-            "API", "endpoint", "route",     # API-Infos
-            "database", "schema", "model",   # Datenbank
-            "config", "environment",         # Konfiguration
-            "TODO", "FIXME", "IMPORTANT",    # Wichtige Notizen
-            "architecture", "struktur",      # Architektur
-            "dependency", "requirement",     # Dependencies
-            "error", "bug", "issue",         # Probleme
-        ]
-        
-        # Prüfe ob eines der Muster vorkommt
-        content_lower = content.lower()
-        return any(pattern in content_lower for pattern in important_patterns)
-    
-    def extract_key_info(self, content: str) -> List[str]:
+        return hooks.should_save(content)
+
+    def extract_key_info(self, content: str) -> list[str]:
         """Extrahiert wichtige Informationen aus dem Content"""
-        lines = content.split('\n')
-        key_info = []
-        
-        for i, line in enumerate(lines):
-            # Code-Definitionen
-            if any(keyword in line for keyword in ['class ', 'def ', 'function ', 'const ', 'interface ']):
-                # Nimm die Definition und die nächsten 2 Zeilen
-                key_info.append('\n'.join(lines[i:min(i+3, len(lines))]))
-            
-            # Wichtige Kommentare
-            elif any(marker in line.upper() for marker in ['TODO', 'FIXME', 'IMPORTANT', 'NOTE']):
-                key_info.append(line.strip())
-            
-            # API Endpoints
-            elif any(method in line for method in ['@app.', '@router.', 'app.get', 'app.post']):
-                key_info.append('\n'.join(lines[i:min(i+5, len(lines))]))
-        
-        return key_info
-    
+        return hooks.extract_key_info(content)
+
     def save_to_rag(self, content: str, role: str = "assistant") -> bool:
         """Speichert Content in Raggadon"""
+        return self.save_many_to_rag([{"role": role, "content": content}])
+
+    def save_many_to_rag(self, items: list[dict[str, str]]) -> bool:
+        """Speichert mehrere Einträge in einem Request (/save/batch)"""
+        if not items:
+            return True
         try:
-            response = requests.post(
-                f"{RAGGADON_URL}/save",
-                json={
-                    "project": self.project,
-                    "role": role,
-                    "content": content
-                },
-                timeout=5
-            )
-            return response.status_code == 200
-        except:
+            post_json("/save/batch", {"project": self.project, "items": items})
+            return True
+        except (OSError, ValueError):
+            # Server nicht erreichbar, Timeout oder HTTP-Fehler
             return False
-    
-    def auto_save_from_conversation(self, messages: List[Dict[str, Any]]):
+
+    def auto_save_from_conversation(self, messages: list[dict[str, Any]]):
         """Analysiert Konversation und speichert wichtige Infos"""
+        items = []
         for msg in messages:
             if msg.get("role") in ["user", "assistant"]:
                 content = msg.get("content", "")
-                
+
                 # Prüfe ob wichtig
                 if self.should_save(content):
                     # Extrahiere Schlüsselinfos
-                    key_infos = self.extract_key_info(content)
-                    
-                    # Speichere jede wichtige Info
-                    for info in key_infos:
+                    for info in self.extract_key_info(content):
                         if info and info not in self.saved_items:
-                            if self.save_to_rag(info, msg["role"]):
-                                self.saved_items.append(info)
-                                print(f"✅ Auto-saved: {info[:50]}...")
+                            self.saved_items.append(info)
+                            items.append({"role": msg["role"], "content": info})
+
+        # Alle Infos in einem Request speichern
+        if self.save_many_to_rag(items):
+            for item in items:
+                print(f"✅ Auto-saved: {item['content'][:50]}...")
+        else:
+            for item in items:
+                self.saved_items.remove(item["content"])
+
 
 # CLI für Tests
 if __name__ == "__main__":
     saver = RaggadonAutoSaver()
-    
+
     if len(sys.argv) > 1:
         content = " ".join(sys.argv[1:])
         if saver.should_save(content):
             key_infos = saver.extract_key_info(content)
-            for info in key_infos:
-                if saver.save_to_rag(info):
+            if saver.save_many_to_rag(
+                [{"role": "assistant", "content": info} for info in key_infos]
+            ):
+                for info in key_infos:
                     print(f"✅ Gespeichert: {info}")
         else:
             print("ℹ️ Content nicht wichtig genug zum Speichern")
     else:
-        print("Usage: python claude_auto_rag.py <content>")
\ No newline at end of file
+        print("Usage: python claude_auto_rag.py <content>")
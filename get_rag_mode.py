@@ -1,21 +1,15 @@
 #!/usr/bin/env python3
 """
 Helper script to get current RAG mode for Claude
+
+Hooks without a Python cold start can use ``raggadon-hook.sh mode`` instead.
 """
-import os
+from app.hooks import read_rag_mode
+
 
 def get_rag_mode():
-    config_file = os.path.expanduser("~/.rag_config")
-    if os.path.exists(config_file):
-        with open(config_file, 'r') as f:
-            mode = f.read().strip()
-            # Convert old verbose to active
-            if mode == "verbose":
-                mode = "active"
-                with open(config_file, 'w') as f:
-                    f.write("active")
-            return mode
-    return "active"  # Default mode
+    return read_rag_mode()
+
 
 if __name__ == "__main__":
-    print(get_rag_mode())
\ No newline at end of file
+    print(get_rag_mode())
@@ -9,6 +9,10 @@ mkdir -p ~/bin
 cp rag ~/bin/rag
 chmod +x ~/bin/rag
 
+# Hook-Client für Claude Code (curl statt Python-Prozess pro Event)
+cp raggadon-hook.sh ~/bin/raggadon-hook
+chmod +x ~/bin/raggadon-hook
+
 # Füge ~/bin zum PATH hinzu falls noch nicht vorhanden
 if [[ ":$PATH:" != *":$HOME/bin:"* ]]; then
     echo 'export PATH="$HOME/bin:$PATH"' >> ~/.zshrc
@@ -21,5 +25,7 @@ echo "📝 Verwendung:"
 echo "  rag save \"Wichtige Info\"  # Speichert im aktuellen Projekt"
 echo "  rag search \"keyword\"      # Sucht im aktuellen Projekt"
 echo "  rag status                # Prüft Server-Status"
+echo "  raggadon-hook mode        # RAG-Modus für Claude-Code-Hooks"
+echo "  raggadon-hook save        # Hook-Inhalt (stdin) an den Server"
 echo ""
 echo "🚀 Falls PATH nicht aktualisiert: source ~/.zshrc"
\ No newline at end of file
@@ -1,27 +1,57 @@
 import os
-from pathlib import Path
-from dotenv import load_dotenv
+
+from app.env import load_environment
 
 # Lade globale Config zuerst, dann lokale (falls vorhanden)
-global_env = Path.home() / '.raggadon.env'
-if global_env.exists():
-    load_dotenv(global_env)
-else:
-    load_dotenv()  # Fallback auf lokale .env
+load_environment()
 
+import asyncio
+import base64
+import json
 import logging
 from contextlib import asynccontextmanager
-from typing import Dict, Any
+from datetime import datetime, timezone
+from typing import Any, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
-from app.supabase_client import SupabaseClient
+try:
+    import orjson
+except ImportError:  # optional: sonst Standard-JSON von FastAPI
+    orjson = None
+try:
+    import msgpack
+except ImportError:  # optional: /search mit Accept: application/msgpack
+    msgpack = None
+
+from app import metrics
+from app.cache import ALL_PROJECTS, ResponseCache
+from app.chunking import TextChunker
 from app.embedding import EmbeddingService
+from app.hooks import extract_key_info, should_save
+from app.ipc import InvalidationBus
+from app.lexical import reciprocal_rank_fusion
+from app.logging_setup import (
+    LOG_CONTENT,
+    RequestContextMiddleware,
+    configure_logging,
+    shutdown_logging,
+)
+from app.pricing import model_info
+from app.storage import (
+    StorageBackend,
+    content_hash,
+    create_storage_backend,
+    truncate_content,
+)
 from app.usage import UsageTracker
+from app.usage_writer import UsageWriter
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -29,6 +59,7 @@ class SaveRequest(BaseModel):
     project: str
     role: str
     content: str
+    dry_run: bool = False
 
 
 class SearchRequest(BaseModel):
@@ -36,26 +67,127 @@ class SearchRequest(BaseModel):
     query: str
 
 
+class BatchItem(BaseModel):
+    role: str
+    content: str
+
+
+class SaveBatchRequest(BaseModel):
+    project: str
+    items: list[BatchItem]
+    dry_run: bool = False
+
+
 class SaveResponse(BaseModel):
     success: bool
     message: str
     tokens_used: int
     monthly_project_usage: int
     estimated_cost_usd: float
+    id: Optional[str] = None
+    duplicate: bool = False
+    chunks: int = 0
+    dry_run: bool = False
+    estimated_tokens: Optional[int] = None
+    estimated_request_cost_usd: Optional[float] = None
+
+
+class SaveBatchResponse(BaseModel):
+    success: bool
+    message: str
+    saved: int
+    tokens_used: int
+    monthly_project_usage: int
+    estimated_cost_usd: float
+    dry_run: bool = False
+    estimated_tokens: Optional[int] = None
+    estimated_request_cost_usd: Optional[float] = None
 
 
 class SearchResponse(BaseModel):
-    results: list[Dict[str, Any]]
+    results: list[dict[str, Any]]
     tokens_used: int
     monthly_project_usage: int
     estimated_cost_usd: float
+    next_cursor: Optional[str] = None
+
+
+def _encode_cursor(offset: int) -> str:
+    """Opaker Cursor für die nächste Ergebnisseite"""
+    raw = json.dumps({"offset": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded))["offset"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor") from None
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+    return offset
+
+
+# Clients und Pools entstehen pro Worker-Prozess im lifespan, nicht beim Import
+storage: Optional[StorageBackend] = None
+embedding_service: Optional[EmbeddingService] = None
+usage_writer: Optional[UsageWriter] = None
+usage_tracker: Optional[UsageTracker] = None
+chunker: Optional[TextChunker] = None
+
+
+def _create_services():
+    global storage, embedding_service, usage_writer, usage_tracker, chunker
+    storage = create_storage_backend()
+    embedding_service = EmbeddingService()
+    usage_writer = UsageWriter(storage)
+    usage_tracker = UsageTracker(
+        storage, writer=usage_writer, model=embedding_service.model
+    )
+    chunker = TextChunker(embedding_service.tokenizer)
+
+
+async def _warmup():
+    """Öffnet Verbindungen und lädt Modelle vor dem ersten Request.
+
+    Fehler verhindern den Start nicht.
+    """
+    for name, warmup in (
+        ("Storage", storage.warmup),
+        ("Embedding", embedding_service.warmup),
+    ):
+        try:
+            await asyncio.wait_for(warmup(), timeout=WARMUP_TIMEOUT)
+        except Exception as e:
+            logger.warning(
+                f"⚠️ Warm-up {name} fehlgeschlagen: {type(e).__name__}: {str(e)}"
+            )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("🚀 Raggadon RAG-Middleware startet...")
+    logger.info(f"🚀 Raggadon RAG-Middleware startet (PID {os.getpid()})...")
+    _create_services()
+    warmup_task = None
+    if WARMUP_MODE == "background":
+        # Sofort Requests annehmen; was noch fehlt, lädt der erste Request selbst
+        warmup_task = asyncio.ensure_future(_warmup())
+    elif WARMUP_MODE != "off":
+        await _warmup()
+    usage_writer.start()
+    invalidation_bus.start()
     yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    # Laufende Requests hat der Server schon abgewartet (RAGGADON_SHUTDOWN_TIMEOUT)
+    invalidation_bus.close()
+    # Ausstehende Usage-Events schreiben, bevor der Pool geschlossen wird
+    await usage_writer.stop()
+    await storage.aclose()
+    await embedding_service.aclose()
     logger.info("🛑 Raggadon RAG-Middleware beendet.")
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -65,6 +197,8 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(RequestContextMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -73,114 +207,732 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-supabase_client = SupabaseClient()
-embedding_service = EmbeddingService()
-usage_tracker = UsageTracker(supabase_client)
+# Kurzlebiger Cache für /search und die Statistiken, ungültig nach /save
+response_cache = ResponseCache(int(os.getenv("RESPONSE_CACHE_SIZE", "1000")))
+RESPONSE_CACHE_SEARCH_TTL = float(os.getenv("RESPONSE_CACHE_SEARCH_TTL", "30"))
+RESPONSE_CACHE_STATS_TTL = float(os.getenv("RESPONSE_CACHE_STATS_TTL", "5"))
+# Mehrere Worker: Invalidierungen per Unix-Socket an die anderen weitergeben
+invalidation_bus = InvalidationBus(
+    os.getenv("RAGGADON_IPC_DIR"), response_cache.invalidate
+)
+# blocking: Warm-up vor dem ersten Request | background: parallel dazu | off
+WARMUP_MODE = os.getenv("RAGGADON_WARMUP", "blocking").strip().lower()
+WARMUP_TIMEOUT = float(os.getenv("RAGGADON_WARMUP_TIMEOUT", "10"))
+
+
+def _invalidate_project(project: str):
+    """Leert die gecachten Antworten eines Projekts in allen Workern"""
+    response_cache.invalidate(project)
+    invalidation_bus.publish(project)
+
+
+# Bei erneut gespeicherten Duplikaten last_seen aktualisieren
+DEDUP_TOUCH_LAST_SEEN = os.getenv("DEDUP_TOUCH_LAST_SEEN", "true").strip().lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+async def _save_chunked(project: str, role: str, content: str):
+    """Teilt langen Content in Chunks, bettet sie gemeinsam ein und speichert alles.
+
+    Gibt (Eltern-Zeile, Tokens, Anzahl Chunks) zurück.
+    """
+    chunks = chunker.split(content)
+    embedding_result = await embedding_service.create_batch_embeddings(chunks)
+    parent = await storage.save_document(
+        project,
+        role,
+        content,
+        [
+            {"content": chunk, "embedding": embedded["embedding"]}
+            for chunk, embedded in zip(chunks, embedding_result["embeddings"])
+        ],
+    )
+    return parent, embedding_result["tokens"], len(chunks)
+
+
+def _estimate_save(content: str):
+    """Lokal geschätzte Tokens für das Speichern eines Inhalts (Dry-Run).
+
+    Gibt (Tokens, Anzahl Chunks) zurück; zu lange Einzeltexte lösen wie
+    beim echten Speichern einen ValueError aus.
+    """
+    if chunker.needs_chunking(content):
+        chunks = chunker.split(content)
+        return embedding_service.estimate_embedding_tokens(chunks), len(chunks)
+    return embedding_service.estimate_embedding_tokens([content]), 0
 
 
 @app.post("/save", response_model=SaveResponse)
 async def save_memory(request: SaveRequest):
-    """Speichert Projektinhalt mit Embedding in Supabase"""
+    """Speichert Projektinhalt mit Embedding in Supabase.
+
+    Ist derselbe (normalisierte) Content im Projekt schon gespeichert, wird
+    der vorhandene Eintrag zurückgegeben, ohne ein Embedding zu erstellen.
+    Mit ``dry_run`` werden nur Tokens und Kosten geschätzt, ohne Embedding
+    und ohne zu speichern.
+    """
     try:
-        logger.info(f"💾 Speichere Inhalt für Projekt: {request.project}")
-        logger.info(f"💾 Content: {request.content[:100]}...")
-        
-        # Test embedding service first
-        logger.info("🧠 Creating embedding...")
-        embedding_result = await embedding_service.create_embedding(request.content)
-        embedding_vector = embedding_result["embedding"]
-        tokens_used = embedding_result["tokens"]
-        logger.info(f"🧠 Embedding created: {tokens_used} tokens")
-        
-        # Test supabase save
-        logger.info("💾 Saving to Supabase...")
-        await supabase_client.save_memory(
-            project=request.project,
-            role=request.role,
-            content=request.content,
-            embedding=embedding_vector,
-        )
-        logger.info("💾 Saved to Supabase successfully")
-        
-        # Test usage tracking (optional - table might not exist)
-        logger.info("📊 Tracking usage...")
+        logger.debug(
+            "💾 Speichere %d Zeichen für Projekt: %s",
+            len(request.content),
+            request.project,
+        )
+        metrics.PROJECT_REQUESTS.inc(metrics.project_label(request.project), "save")
+        if LOG_CONTENT:
+            logger.debug("💾 Content: %.100s", request.content)
+
+        digest = content_hash(request.content)
+        existing = (await storage.find_memories_by_hash(request.project, [digest])).get(
+            digest
+        )
+        if existing is not None:
+            logger.info("♻️ Duplikat erkannt, vorhandener Eintrag %s", existing["id"])
+            if DEDUP_TOUCH_LAST_SEEN and not request.dry_run:
+                await storage.touch_memories(request.project, [existing["id"]])
+            monthly_usage = 0
+            try:
+                monthly_usage = await usage_tracker.get_monthly_usage(request.project)
+            except Exception as usage_error:
+                logger.warning(f"⚠️ Usage lookup failed: {str(usage_error)}")
+            return SaveResponse(
+                success=True,
+                message=(
+                    f"Inhalt für Projekt '{request.project}' war bereits gespeichert"
+                ),
+                tokens_used=0,
+                monthly_project_usage=monthly_usage,
+                estimated_cost_usd=embedding_service.calculate_cost(monthly_usage),
+                id=existing["id"],
+                duplicate=True,
+                dry_run=request.dry_run,
+                estimated_tokens=0 if request.dry_run else None,
+                estimated_request_cost_usd=0.0 if request.dry_run else None,
+            )
+
+        if request.dry_run:
+            estimated_tokens, chunk_count = _estimate_save(request.content)
+            monthly_usage = 0
+            try:
+                monthly_usage = await usage_tracker.get_monthly_usage(request.project)
+            except Exception as usage_error:
+                logger.warning(f"⚠️ Usage lookup failed: {str(usage_error)}")
+            logger.info(
+                f"🧪 Dry-Run: ~{estimated_tokens} Tokens für Projekt "
+                f"'{request.project}'"
+            )
+            return SaveResponse(
+                success=True,
+                message=(
+                    f"Dry-Run: Inhalt für Projekt '{request.project}' würde gespeichert"
+                ),
+                tokens_used=0,
+                monthly_project_usage=monthly_usage,
+                estimated_cost_usd=embedding_service.calculate_cost(monthly_usage),
+                chunks=chunk_count,
+                dry_run=True,
+                estimated_tokens=estimated_tokens,
+                estimated_request_cost_usd=embedding_service.calculate_cost(
+                    estimated_tokens
+                ),
+            )
+
+        chunk_count = 0
+        if chunker.needs_chunking(request.content):
+            # Lange Inhalte: Dokument mit eingebetteten Chunks
+            saved_row, tokens_used, chunk_count = await _save_chunked(
+                request.project, request.role, request.content
+            )
+        else:
+            embedding_result = await embedding_service.create_embedding(request.content)
+            embedding_vector = embedding_result["embedding"]
+            tokens_used = embedding_result["tokens"]
+
+            saved_row = await storage.save_memory(
+                project=request.project,
+                role=request.role,
+                content=request.content,
+                embedding=embedding_vector,
+            )
+        _invalidate_project(request.project)
+
+        # Usage tracking ist optional (Tabelle fehlt evtl.)
         monthly_usage = 0
         estimated_cost = 0.0
         try:
-            await usage_tracker.track_usage(
-                project=request.project,
-                usage_type="save",
-                tokens=tokens_used,
-            )
+            # Cache-Treffer verursachen keine Kosten und werden nicht getrackt
+            if tokens_used:
+                await usage_tracker.track_usage(
+                    project=request.project,
+                    usage_type="save",
+                    tokens=tokens_used,
+                )
             monthly_usage = await usage_tracker.get_monthly_usage(request.project)
-            estimated_cost = monthly_usage * 0.00002
+            estimated_cost = embedding_service.calculate_cost(monthly_usage)
         except Exception as usage_error:
-            logger.warning(f"⚠️ Usage tracking failed (table might not exist): {str(usage_error)}")
+            logger.warning(
+                f"⚠️ Usage tracking failed (table might not exist): {str(usage_error)}"
+            )
             # Continue without usage tracking
             monthly_usage = tokens_used  # Just use current tokens
-            estimated_cost = (tokens_used / 1000) * 0.00002
-        
-        logger.info(f"🧾 Tokenverbrauch: {monthly_usage:,} Tokens (~${estimated_cost:.4f}) für Projekt '{request.project}'")
-        
+            estimated_cost = embedding_service.calculate_cost(tokens_used)
+
+        logger.info(
+            "🧾 Tokenverbrauch: %d Tokens (~$%.4f) für Projekt '%s' (+%d)",
+            monthly_usage,
+            estimated_cost,
+            request.project,
+            tokens_used,
+        )
+
         return SaveResponse(
             success=True,
             message=f"Inhalt für Projekt '{request.project}' gespeichert",
             tokens_used=tokens_used,
             monthly_project_usage=monthly_usage,
             estimated_cost_usd=estimated_cost,
+            id=saved_row.get("id"),
+            chunks=chunk_count,
         )
-        
+
+    except ValueError as e:
+        # Leere oder zu lange Inhalte, bevor ein Embedding angefragt wird
+        raise HTTPException(status_code=422, detail=str(e)) from e
     except Exception as e:
         error_msg = f"Fehler beim Speichern: {str(e)} | Type: {type(e).__name__}"
         logger.error(f"❌ {error_msg}")
-        raise HTTPException(status_code=500, detail=error_msg)
+        raise HTTPException(status_code=500, detail=error_msg) from e
+
+
+# Einträge pro Embedding/Insert-Durchlauf beim NDJSON-Import
+BATCH_STREAM_CHUNK_SIZE = int(os.getenv("BATCH_STREAM_CHUNK_SIZE", "500"))
+
 
+async def _ingest_items(project: str, items: list[BatchItem], dry_run: bool = False):
+    """Erstellt Embeddings für alle Items und speichert sie per Multi-Row-Insert.
+
+    Duplikate (innerhalb des Batches oder bereits gespeichert) werden vor dem
+    Embedding aussortiert, lange Inhalte als gechunkte Dokumente gespeichert.
+    Gibt (gespeicherte Einträge, Tokens) zurück; mit ``dry_run`` die Einträge,
+    die gespeichert würden, und die lokal geschätzten Tokens.
+    """
+    unique: dict[str, BatchItem] = {}
+    for item in items:
+        unique.setdefault(content_hash(item.content), item)
+    existing = await storage.find_memories_by_hash(project, list(unique))
+    if existing and DEDUP_TOUCH_LAST_SEEN and not dry_run:
+        await storage.touch_memories(project, [row["id"] for row in existing.values()])
+    items = [item for digest, item in unique.items() if digest not in existing]
+    if dry_run:
+        return len(items), sum(_estimate_save(item.content)[0] for item in items)
 
-@app.get("/search", response_model=SearchResponse)
-async def search_memory(project: str, query: str):
-    """Sucht ähnliche Inhalte im Projektgedächtnis"""
     try:
-        logger.info(f"🔍 Suche in Projekt: {project}")
-        
-        embedding_result = await embedding_service.create_embedding(query)
-        query_embedding = embedding_result["embedding"]
-        tokens_used = embedding_result["tokens"]
-        
-        results = await supabase_client.search_memory(
-            project=project,
-            query_embedding=query_embedding,
-            limit=5,
-        )
-        
-        # Track usage (optional - table might not exist)
+        saved, tokens_used = 0, 0
+        long_items = [item for item in items if chunker.needs_chunking(item.content)]
+        for item in long_items:
+            _, tokens, _ = await _save_chunked(project, item.role, item.content)
+            saved += 1
+            tokens_used += tokens
+        items = [item for item in items if not chunker.needs_chunking(item.content)]
+        if not items:
+            return saved, tokens_used
+
+        embedding_result = await embedding_service.create_batch_embeddings(
+            [item.content for item in items]
+        )
+        rows = [
+            {
+                "project": project,
+                "role": item.role,
+                "content": item.content,
+                "embedding": embedded["embedding"],
+            }
+            for item, embedded in zip(items, embedding_result["embeddings"])
+        ]
+        saved += await storage.save_memories(rows)
+        return saved, tokens_used + embedding_result["tokens"]
+    finally:
+        # Auch nach Teilerfolg: gecachte Suchen könnten veraltet sein
+        _invalidate_project(project)
+
+
+async def _batch_response(
+    project: str, saved: int, tokens_used: int, dry_run: bool = False
+) -> SaveBatchResponse:
+    """Trackt den Verbrauch eines Batches als eine aggregierte Usage-Zeile.
+
+    Bei ``dry_run`` ist ``tokens_used`` die Schätzung und wird nicht getrackt.
+    """
+    if dry_run:
         monthly_usage = 0
-        estimated_cost = 0.0
         try:
+            monthly_usage = await usage_tracker.get_monthly_usage(project)
+        except Exception as usage_error:
+            logger.warning(f"⚠️ Usage lookup failed: {str(usage_error)}")
+        logger.info(
+            f"🧪 Dry-Run Batch: {saved} Einträge, ~{tokens_used:,} Tokens für Projekt "
+            f"'{project}'"
+        )
+        return SaveBatchResponse(
+            success=True,
+            message=(
+                f"Dry-Run: {saved} Einträge für Projekt '{project}' würden gespeichert"
+            ),
+            saved=saved,
+            tokens_used=0,
+            monthly_project_usage=monthly_usage,
+            estimated_cost_usd=embedding_service.calculate_cost(monthly_usage),
+            dry_run=True,
+            estimated_tokens=tokens_used,
+            estimated_request_cost_usd=embedding_service.calculate_cost(tokens_used),
+        )
+
+    monthly_usage = tokens_used
+    try:
+        if tokens_used:
             await usage_tracker.track_usage(
                 project=project,
-                usage_type="search",
+                usage_type="save",
                 tokens=tokens_used,
             )
+        monthly_usage = await usage_tracker.get_monthly_usage(project)
+    except Exception as usage_error:
+        logger.warning(f"⚠️ Usage tracking failed: {str(usage_error)}")
+    estimated_cost = embedding_service.calculate_cost(monthly_usage)
+
+    logger.info(
+        f"🧾 Batch: {saved} Einträge, {tokens_used:,} Tokens für Projekt '{project}'"
+    )
+
+    return SaveBatchResponse(
+        success=True,
+        message=f"{saved} Einträge für Projekt '{project}' gespeichert",
+        saved=saved,
+        tokens_used=tokens_used,
+        monthly_project_usage=monthly_usage,
+        estimated_cost_usd=estimated_cost,
+    )
+
+
+@app.post("/save/batch", response_model=SaveBatchResponse)
+async def save_memory_batch(request: SaveBatchRequest):
+    """Speichert viele Einträge mit Batch-Embeddings und Multi-Row-Inserts"""
+    try:
+        logger.info(
+            f"💾 Speichere {len(request.items)} Einträge für Projekt: {request.project}"
+        )
+        metrics.PROJECT_REQUESTS.inc(
+            metrics.project_label(request.project), "save_batch"
+        )
+        saved, tokens_used = 0, 0
+        if request.items:
+            saved, tokens_used = await _ingest_items(
+                request.project, request.items, request.dry_run
+            )
+        return await _batch_response(
+            request.project, saved, tokens_used, request.dry_run
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except Exception as e:
+        error_msg = f"Fehler beim Batch-Speichern: {str(e)} | Type: {type(e).__name__}"
+        logger.error(f"❌ {error_msg}")
+        raise HTTPException(status_code=500, detail=error_msg) from e
+
+
+@app.post("/save/batch/stream", response_model=SaveBatchResponse)
+async def save_memory_batch_stream(
+    project: str, request: Request, dry_run: bool = False
+):
+    """Importiert NDJSON (eine Zeile {"role", "content"} pro Eintrag) gestreamt.
+
+    Der Body wird inkrementell gelesen und in Blöcken von
+    BATCH_STREAM_CHUNK_SIZE Einträgen eingebettet und gespeichert, sodass
+    auch sehr große Importe mit konstantem Speicher laufen. ``dry_run``
+    schätzt nur Tokens und Kosten des Imports.
+    """
+    saved = 0
+    tokens_used = 0
+    pending: list[BatchItem] = []
+    buffer = b""
+    line_number = 0
+
+    def parse_lines(lines: list[bytes]):
+        nonlocal line_number
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                try:
+                    pending.append(BatchItem.model_validate_json(line))
+                except Exception as e:
+                    raise HTTPException(
+                        status_code=422,
+                        detail=f"Ungültige NDJSON-Zeile {line_number} "
+                        f"({saved} Einträge bereits gespeichert): {str(e)}",
+                    ) from e
+
+    try:
+        logger.info(f"💾 NDJSON-Import für Projekt: {project}")
+        metrics.PROJECT_REQUESTS.inc(metrics.project_label(project), "save_stream")
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            parse_lines(lines)
+            while len(pending) >= BATCH_STREAM_CHUNK_SIZE:
+                block = pending[:BATCH_STREAM_CHUNK_SIZE]
+                del pending[:BATCH_STREAM_CHUNK_SIZE]
+                block_saved, block_tokens = await _ingest_items(project, block, dry_run)
+                saved += block_saved
+                tokens_used += block_tokens
+
+        parse_lines([buffer])
+        if pending:
+            block_saved, block_tokens = await _ingest_items(project, pending, dry_run)
+            saved += block_saved
+            tokens_used += block_tokens
+
+        return await _batch_response(project, saved, tokens_used, dry_run)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except Exception as e:
+        error_msg = (
+            f"Fehler beim NDJSON-Import nach {saved} Einträgen: {str(e)} "
+            f"| Type: {type(e).__name__}"
+        )
+        logger.error(f"❌ {error_msg}")
+        raise HTTPException(status_code=500, detail=error_msg) from e
+
+
+@app.post("/hook/save", response_model=SaveBatchResponse)
+async def save_hook_content(project: str, request: Request, role: str = "assistant"):
+    """Speichert die Schlüsselinfos eines Claude-Code-Hook-Inhalts (Body als Text).
+
+    Gegenstück zu ``raggadon-hook.sh``: der Hook reicht den Inhalt per curl
+    durch, Auswahl und Extraktion (app.hooks) laufen im bereits gestarteten
+    Server statt in einem eigenen Python-Prozess pro Event.
+    """
+    try:
+        content = (await request.body()).decode("utf-8", errors="replace")
+        metrics.PROJECT_REQUESTS.inc(metrics.project_label(project), "save_hook")
+        saved, tokens_used = 0, 0
+        if should_save(content):
+            items = [
+                BatchItem(role=role, content=info)
+                for info in dict.fromkeys(extract_key_info(content))
+                if info.strip()
+            ]
+            if items:
+                logger.info(
+                    f"💾 Hook speichert {len(items)} Einträge für Projekt: {project}"
+                )
+                saved, tokens_used = await _ingest_items(project, items)
+        return await _batch_response(project, saved, tokens_used)
+
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except Exception as e:
+        error_msg = f"Fehler beim Hook-Speichern: {str(e)} | Type: {type(e).__name__}"
+        logger.error(f"❌ {error_msg}")
+        raise HTTPException(status_code=500, detail=error_msg) from e
+
+
+async def _vector_search(
+    project: str,
+    query: str,
+    limit: int,
+    offset: int,
+    threshold: float,
+    filters: dict[str, Any],
+):
+    """Embedding der Query + Similarity-Suche; gibt (Ergebnisse, Tokens) zurück"""
+    embedding_result = await embedding_service.create_embedding(query)
+    results = await storage.search_memory(
+        project=project,
+        query_embedding=embedding_result["embedding"],
+        limit=limit,
+        threshold=threshold,
+        offset=offset,
+        **filters,
+    )
+    return results, embedding_result["tokens"]
+
+
+async def _run_search(
+    mode: str,
+    project: str,
+    query: str,
+    limit: int,
+    offset: int,
+    threshold: float,
+    filters: dict[str, Any],
+):
+    """Führt die Suche im gewählten Modus aus; gibt (Ergebnisse, Tokens) zurück"""
+    if mode == "lexical":
+        results = await storage.search_lexical(
+            project, query, limit=limit, offset=offset, **filters
+        )
+        return results, 0
+    if mode == "hybrid":
+        # Beide Listen bis zur aktuellen Seite holen, fusionieren, dann schneiden
+        (vector_results, tokens_used), lexical_results = await asyncio.gather(
+            _vector_search(project, query, offset + limit, 0, threshold, filters),
+            storage.search_lexical(project, query, limit=offset + limit, **filters),
+        )
+        results = reciprocal_rank_fusion(
+            [vector_results, lexical_results], offset + limit
+        )[offset:]
+        return results, tokens_used
+    return await _vector_search(project, query, limit, offset, threshold, filters)
+
+
+# Beim Zusammenfassen von Chunks: so viele Treffer mehr holen, wie angefordert
+CHUNK_COLLAPSE_OVERFETCH = int(os.getenv("CHUNK_COLLAPSE_OVERFETCH", "4"))
+
+
+async def _collapse_chunks(
+    project: str, results: list[dict[str, Any]], content_length: Optional[int]
+) -> list[dict[str, Any]]:
+    """Fasst Chunk-Treffer zu ihrem Dokument zusammen (bester Treffer zählt).
+
+    Das Dokument übernimmt die Scores des besten Chunks; ``matched_chunks``
+    listet alle getroffenen Chunk-Indizes.
+    """
+    parent_ids = [r["parent_id"] for r in results if r.get("parent_id")]
+    parents = await storage.get_memories(project, parent_ids) if parent_ids else {}
+
+    collapsed: dict[str, dict[str, Any]] = {}
+    for result in results:
+        parent = parents.get(result.get("parent_id"))
+        if parent is None:
+            collapsed.setdefault(result["id"], result)
+            continue
+        item = collapsed.get(parent["id"])
+        if item is None:
+            item = {
+                key: value
+                for key, value in result.items()
+                if key not in ("id", "content", "parent_id", "chunk_index")
+            }
+            item.update(
+                id=parent["id"],
+                role=parent["role"],
+                content=truncate_content(parent["content"], content_length),
+                created_at=parent["created_at"],
+                parent_id=None,
+                chunk_index=None,
+                matched_chunks=[],
+            )
+            collapsed[parent["id"]] = item
+        item["matched_chunks"].append(result["chunk_index"])
+    return list(collapsed.values())
+
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+def _render(
+    request: Request,
+    payload: dict[str, Any],
+    model: Optional[type] = None,
+    headers: Optional[dict[str, str]] = None,
+):
+    """Serialisiert eine Antwort ohne Umweg über das Pydantic-Modell.
+
+    ``Accept: application/msgpack`` liefert MessagePack, sonst JSON über
+    orjson. Ohne die optionalen Pakete wird ``model`` validiert und mit
+    dem Standard-JSON von FastAPI serialisiert.
+    """
+    if msgpack is not None and MSGPACK_MEDIA_TYPE in request.headers.get("accept", ""):
+        return Response(
+            msgpack.packb(payload, use_bin_type=True),
+            media_type=MSGPACK_MEDIA_TYPE,
+            headers=headers,
+        )
+    if orjson is not None:
+        return Response(
+            orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+            media_type="application/json",
+            headers=headers,
+        )
+    if model is not None:
+        payload = model(**payload).model_dump(mode="json")
+    return JSONResponse(jsonable_encoder(payload), headers=headers)
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """If-None-Match passt zum ETag (schwacher Vergleich)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(
+        tag.replace("W/", "", 1) == etag.replace("W/", "", 1) for tag in tags
+    )
+
+
+def _cached_response(
+    request: Request, payload: dict[str, Any], etag: str, model: Optional[type] = None
+):
+    """Antwort mit ETag bzw. 304, wenn der Client sie schon hat"""
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return _render(request, payload, model, headers)
+
+
+@app.get(
+    "/search",
+    response_model=SearchResponse,
+    responses={200: {"content": {MSGPACK_MEDIA_TYPE: {}}}},
+)
+async def search_memory(
+    request: Request,
+    project: str,
+    query: str,
+    limit: int = Query(5, ge=1, le=200),
+    threshold: float = Query(0.5, ge=-1, le=1),
+    role: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    include_content: bool = True,
+    snippet_length: Optional[int] = Query(None, ge=1),
+    mode: str = Query("vector", pattern="^(vector|hybrid|lexical)$"),
+    collapse_chunks: bool = False,
+):
+    """Sucht ähnliche Inhalte im Projektgedächtnis.
+
+    Filter (role, since, until) und Paging (cursor) laufen im Storage-Backend.
+    ``include_content=false`` liefert nur Metadaten, ``snippet_length`` kürzt
+    den Content auf die ersten n Zeichen.
+
+    ``mode``: ``vector`` (Embedding-Similarity), ``lexical`` (nur Volltext,
+    ohne OpenAI-Aufruf) oder ``hybrid`` (beides per Reciprocal Rank Fusion).
+    ``collapse_chunks`` ersetzt Chunk-Treffer durch ihr Dokument.
+    Mit ``Accept: application/msgpack`` kommt die Antwort als MessagePack.
+
+    Treffer werden RESPONSE_CACHE_SEARCH_TTL Sekunden pro Projekt und
+    Parametern gecacht (ohne Tokens, bis zum nächsten /save). Das ETag
+    bezieht sich auf die Treffer; bei passendem If-None-Match kommt 304.
+    """
+    offset = _decode_cursor(cursor) if cursor else 0
+    filters = {
+        "role": role,
+        "created_after": since,
+        "created_before": until,
+        "content_length": 0 if not include_content else snippet_length,
+    }
+    cache_params = (
+        mode,
+        query,
+        limit,
+        offset,
+        threshold,
+        role,
+        since,
+        until,
+        filters["content_length"],
+        collapse_chunks,
+    )
+    try:
+        logger.debug("🔍 Suche in Projekt: %s (Modus: %s)", project, mode)
+        metrics.PROJECT_REQUESTS.inc(metrics.project_label(project), f"search_{mode}")
+
+        cached = response_cache.get("search", project, cache_params)
+        if cached is not None:
+            page, etag = cached
+            tokens_used = 0
+        else:
+            generation = response_cache.generation(project)
+            if collapse_chunks:
+                # Mehrere Chunks pro Dokument: mehr holen, zusammenfassen,
+                # dann schneiden
+                results, tokens_used = await _run_search(
+                    mode,
+                    project,
+                    query,
+                    (offset + limit) * CHUNK_COLLAPSE_OVERFETCH,
+                    0,
+                    threshold,
+                    filters,
+                )
+                results = await _collapse_chunks(
+                    project, results, filters["content_length"]
+                )
+                results = results[offset : offset + limit]
+            else:
+                results, tokens_used = await _run_search(
+                    mode, project, query, limit, offset, threshold, filters
+                )
+            page = {
+                "results": results,
+                "next_cursor": _encode_cursor(offset + limit)
+                if len(results) == limit
+                else None,
+            }
+            etag = response_cache.set(
+                "search",
+                project,
+                cache_params,
+                page,
+                RESPONSE_CACHE_SEARCH_TTL,
+                generation,
+            )
+
+        # Track usage (optional - table might not exist)
+        monthly_usage = 0
+        estimated_cost = 0.0
+        try:
+            # Cache-Treffer verursachen keine Kosten und werden nicht getrackt
+            if tokens_used:
+                await usage_tracker.track_usage(
+                    project=project,
+                    usage_type="search",
+                    tokens=tokens_used,
+                )
             monthly_usage = await usage_tracker.get_monthly_usage(project)
-            estimated_cost = monthly_usage * 0.00002
+            estimated_cost = embedding_service.calculate_cost(monthly_usage)
         except Exception as usage_error:
             logger.warning(f"⚠️ Usage tracking failed: {str(usage_error)}")
             monthly_usage = tokens_used
-            estimated_cost = (tokens_used / 1000) * 0.00002
-        
-        logger.info(f"🧾 Tokenverbrauch: {monthly_usage:,} Tokens (~${estimated_cost:.4f}) für Projekt '{project}'")
-        logger.info(f"✅ {len(results)} Ergebnisse gefunden")
-        
-        return SearchResponse(
-            results=results,
-            tokens_used=tokens_used,
-            monthly_project_usage=monthly_usage,
-            estimated_cost_usd=estimated_cost,
+            estimated_cost = embedding_service.calculate_cost(tokens_used)
+
+        logger.info(
+            "🔍 %d Ergebnisse (%s), Tokenverbrauch: %d Tokens (~$%.4f) "
+            "für Projekt '%s' (+%d)",
+            len(page["results"]),
+            mode,
+            monthly_usage,
+            estimated_cost,
+            project,
+            tokens_used,
         )
-        
+
+        return _cached_response(
+            request,
+            {
+                "results": page["results"],
+                "tokens_used": tokens_used,
+                "monthly_project_usage": monthly_usage,
+                "estimated_cost_usd": estimated_cost,
+                "next_cursor": page["next_cursor"],
+            },
+            etag,
+            SearchResponse,
+        )
+
+    except ValueError as e:
+        # Leere oder zu lange Query, bevor ein Embedding angefragt wird
+        raise HTTPException(status_code=422, detail=str(e)) from e
     except Exception as e:
         logger.error(f"❌ Fehler bei der Suche: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
 
 @app.get("/health")
@@ -189,47 +941,284 @@ async def health_check():
     return {"status": "healthy", "service": "Raggadon RAG-Middleware"}
 
 
-@app.get("/project/{project}/stats")
-async def get_project_stats(project: str):
-    """Gibt Statistiken für ein Projekt zurück"""
+@app.post("/project/{project}/index/rebuild")
+async def rebuild_project_index(project: str):
+    """Trainiert den ANN-Index eines Projekts neu (lokales Backend)"""
     try:
-        # Hole Projekt-Informationen
-        memories = await supabase_client.count_project_memories(project)
-        first_activity = await supabase_client.get_first_activity(project)
-        last_activity = await supabase_client.get_last_activity(project)
-        
-        # Optional: Token-Usage (falls Tabelle existiert)
-        monthly_usage = 0
-        estimated_cost = 0.0
-        recent_activities = []
+        return await storage.rebuild_index(project)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        logger.error(f"❌ Fehler beim Index-Rebuild: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/Miss-Zähler des Embedding-Caches und des Response-Caches (pro Worker)"""
+    responses = {**response_cache.stats(), "invalidation": invalidation_bus.stats()}
+    if embedding_service.cache is None:
+        return {"enabled": False, "responses": responses}
+    return {"enabled": True, **embedding_service.cache.stats(), "responses": responses}
+
+
+def _cache_samples():
+    caches = [("response", response_cache)]
+    if embedding_service.cache is not None:
+        caches.append(("embedding", embedding_service.cache))
+    for name, cache in caches:
+        yield (name, "hit"), cache.hits
+        yield (name, "miss"), cache.misses
+
+
+def _coalescing_samples():
+    flights = {
+        "embeddings": embedding_service.flights.stats(),
+        **storage.coalescing_stats(),
+    }
+    for name, stats in flights.items():
+        yield (name, "executed"), stats["executions"]
+        yield (name, "coalesced"), stats["coalesced"]
+
+
+def _scheduler_samples():
+    stats = embedding_service.scheduler.stats()
+    for key in ("requests", "batches", "retries", "rate_limited", "failures"):
+        yield (key,), stats[key]
+
+
+def _usage_writer_samples():
+    stats = usage_writer.stats()
+    for key in ("written", "dropped", "failed"):
+        yield (key,), stats[key]
+
+
+metrics.REGISTRY.callback(
+    "raggadon_cache_requests_total",
+    "Cache-Abfragen nach Ergebnis",
+    "counter",
+    ["cache", "result"],
+    _cache_samples,
+)
+metrics.REGISTRY.callback(
+    "raggadon_coalesced_calls_total",
+    "Upstream-Aufrufe: ausgeführt bzw. zusammengefasst",
+    "counter",
+    ["call", "result"],
+    _coalescing_samples,
+)
+metrics.REGISTRY.callback(
+    "raggadon_embedding_scheduler_total",
+    "Micro-Batching: Anfragen, API-Aufrufe, Retries",
+    "counter",
+    ["event"],
+    _scheduler_samples,
+)
+metrics.REGISTRY.callback(
+    "raggadon_embedding_concurrency_limit",
+    "Aktuelles Limit gleichzeitiger Embedding-Aufrufe",
+    "gauge",
+    [],
+    lambda: [((), embedding_service.scheduler.stats()["concurrency_limit"])],
+)
+metrics.REGISTRY.callback(
+    "raggadon_usage_events_total",
+    "Usage-Events: geschrieben, verworfen, fehlgeschlagen",
+    "counter",
+    ["result"],
+    _usage_writer_samples,
+)
+metrics.REGISTRY.callback(
+    "raggadon_usage_backlog",
+    "Noch nicht geschriebene Usage-Events",
+    "gauge",
+    [],
+    lambda: [((), usage_writer.stats()["backlog"])],
+)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Metriken im Prometheus-Textformat"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/coalescing/stats")
+async def get_coalescing_stats():
+    """Zusammengefasste gleichzeitige Embedding- und Suchaufrufe (single-flight)"""
+    return {
+        "embeddings": embedding_service.flights.stats(),
+        **storage.coalescing_stats(),
+    }
+
+
+@app.get("/embedding/scheduler/stats")
+async def get_embedding_scheduler_stats():
+    """Micro-Batching der Embeddings: Batch-Größen, Retries und Parallelitätslimit"""
+    return embedding_service.scheduler.stats()
+
+
+@app.get("/usage/writer/stats")
+async def get_usage_writer_stats():
+    """Backlog sowie geschriebene und verworfene Usage-Events"""
+    return usage_writer.stats()
+
+
+async def _usage_stats_or_empty(
+    projects: Optional[list[str]] = None,
+) -> dict[str, dict[str, Any]]:
+    """Usage-Summen pro Projekt; leer, falls die Usage-Tabellen fehlen"""
+    try:
+        return await usage_tracker.get_usage_stats(projects)
+    except Exception as usage_error:
+        logger.warning(f"⚠️ Usage tracking nicht verfügbar: {str(usage_error)}")
+        return {}
+
+
+async def _memory_stats_or_fallback(
+    projects: Optional[list[str]] = None,
+) -> dict[str, dict[str, Any]]:
+    """Anzahl, erster und letzter Eintrag pro Projekt.
+
+    Schlägt die aggregierte Abfrage fehl (z.B. Migration 008 fehlt), wird
+    für die genannten Projekte einzeln gezählt; die Übersicht aller
+    Projekte zeigt dann nur die Usage-Daten.
+    """
+    try:
+        return await storage.fetch_memory_stats(projects)
+    except Exception as stats_error:
+        logger.warning(
+            f"⚠️ Aggregierte Projekt-Statistik nicht verfügbar: {str(stats_error)}"
+        )
+    stats = {}
+    for project in projects or []:
         try:
-            monthly_usage = await usage_tracker.get_monthly_usage(project)
-            estimated_cost = monthly_usage * 0.00002
-            recent_activities = await usage_tracker.get_recent_activities(project, limit=5)
-        except Exception as usage_error:
-            logger.warning(f"⚠️ Usage tracking nicht verfügbar: {str(usage_error)}")
-            # Fallback values
-            monthly_usage = 0
-            estimated_cost = 0.0
-            recent_activities = []
-        
-        return {
+            total, first_activity, last_activity = await asyncio.gather(
+                storage.count_project_memories(project),
+                storage.get_first_activity(project),
+                storage.get_last_activity(project),
+            )
+        except Exception as stats_error:
+            logger.warning(
+                f"⚠️ Statistik für Projekt '{project}' nicht verfügbar: "
+                f"{str(stats_error)}"
+            )
+            continue
+        if total:
+            stats[project] = {
+                "project": project,
+                "total_memories": total,
+                "first_activity": first_activity,
+                "last_activity": last_activity,
+            }
+    return stats
+
+
+@app.get("/projects/stats")
+async def get_all_projects_stats(request: Request):
+    """Statistiken aller Projekte aus zwei aggregierten Abfragen"""
+    try:
+        cached = response_cache.get("stats", ALL_PROJECTS, None)
+        if cached is not None:
+            return _cached_response(request, *cached)
+        generation = response_cache.generation(ALL_PROJECTS)
+        memory_stats, usage_stats = await asyncio.gather(
+            _memory_stats_or_fallback(),
+            _usage_stats_or_empty(),
+        )
+
+        projects = []
+        for project in sorted(set(memory_stats) | set(usage_stats)):
+            memory = memory_stats.get(project, {})
+            usage = usage_stats.get(project, {})
+            projects.append(
+                {
+                    "project": project,
+                    "total_memories": memory.get("total_memories", 0),
+                    "first_activity": memory.get("first_activity"),
+                    "last_activity": memory.get("last_activity"),
+                    "monthly_tokens": usage.get("monthly_tokens", 0),
+                    "total_tokens": usage.get("total_tokens", 0),
+                    "save_operations": usage.get("save_operations", 0),
+                    "search_operations": usage.get("search_operations", 0),
+                    "estimated_monthly_cost_usd": embedding_service.calculate_cost(
+                        usage.get("monthly_tokens", 0)
+                    ),
+                    "estimated_cost_usd": usage.get("estimated_cost_usd", 0.0),
+                }
+            )
+
+        monthly_tokens = sum(entry["monthly_tokens"] for entry in projects)
+        payload = {
+            "projects": projects,
+            "total_projects": len(projects),
+            "total_memories": sum(entry["total_memories"] for entry in projects),
+            "monthly_tokens": monthly_tokens,
+            "estimated_monthly_cost_usd": embedding_service.calculate_cost(
+                monthly_tokens
+            ),
+            "cost_per_1k_tokens": model_info(embedding_service.model)[
+                "price_per_1k_tokens"
+            ],
+            "model": embedding_service.model,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        etag = response_cache.set(
+            "stats", ALL_PROJECTS, None, payload, RESPONSE_CACHE_STATS_TTL, generation
+        )
+        return _cached_response(request, payload, etag)
+
+    except Exception as e:
+        logger.error(f"❌ Fehler beim Abrufen der Statistiken aller Projekte: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.get("/project/{project}/stats")
+async def get_project_stats(project: str, request: Request):
+    """Gibt Statistiken für ein Projekt zurück.
+
+    Wird RESPONSE_CACHE_STATS_TTL Sekunden gecacht (bis zum nächsten
+    /save des Projekts); mit passendem If-None-Match kommt 304.
+    """
+    try:
+        cached = response_cache.get("stats", project, None)
+        if cached is not None:
+            return _cached_response(request, *cached)
+        generation = response_cache.generation(project)
+        # Unabhängige Abfragen parallel; Fehler liefern Einzelabfragen, 0 bzw. []
+        memory_stats, monthly_usage, recent_activities = await asyncio.gather(
+            _memory_stats_or_fallback([project]),
+            usage_tracker.get_monthly_usage(project),
+            usage_tracker.get_recent_activities(project, limit=5),
+        )
+        memory = memory_stats.get(project, {})
+
+        payload = {
             "project": project,
-            "total_memories": memories,
+            "total_memories": memory.get("total_memories", 0),
             "monthly_tokens": monthly_usage,
-            "estimated_monthly_cost_usd": estimated_cost,
+            "estimated_monthly_cost_usd": embedding_service.calculate_cost(
+                monthly_usage
+            ),
             "recent_activities": recent_activities,
-            "cost_per_1k_tokens": 0.02,  # $0.02 per 1K tokens
-            "model": "text-embedding-3-small",
-            "first_activity": first_activity,
-            "last_activity": last_activity
+            "cost_per_1k_tokens": model_info(embedding_service.model)[
+                "price_per_1k_tokens"
+            ],
+            "model": embedding_service.model,
+            "first_activity": memory.get("first_activity"),
+            "last_activity": memory.get("last_activity"),
         }
-        
+        etag = response_cache.set(
+            "stats", project, None, payload, RESPONSE_CACHE_STATS_TTL, generation
+        )
+        return _cached_response(request, payload, etag)
+
     except Exception as e:
         logger.error(f"❌ Fehler beim Abrufen der Projekt-Statistiken: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    from app.server import run
+
+    run()
@@ -0,0 +1,73 @@
+-- Monatliche Usage-Rollups pro Projekt
+-- Ersetzt das Aufsummieren aller embedding_usage Zeilen bei jedem Request.
+-- Copy this code and run it in the Supabase SQL Editor
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS embedding_usage_monthly (
+    project text NOT NULL,
+    month date NOT NULL,          -- erster Tag des Monats (UTC)
+    usage_type text NOT NULL,     -- 'save' oder 'search'
+    tokens bigint NOT NULL DEFAULT 0,
+    operations bigint NOT NULL DEFAULT 0,
+    first_usage timestamp,
+    last_usage timestamp,
+    PRIMARY KEY (project, month, usage_type)
+);
+
+-- Statement-Trigger: ein Upsert pro (Projekt, Monat, Typ), auch bei Multi-Row-Inserts
+CREATE OR REPLACE FUNCTION rollup_embedding_usage()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    INSERT INTO embedding_usage_monthly AS m
+        (project, month, usage_type, tokens, operations, first_usage, last_usage)
+    SELECT
+        n.project,
+        date_trunc('month', n.created_at)::date,
+        n.usage_type,
+        sum(n.tokens),
+        count(*),
+        min(n.created_at),
+        max(n.created_at)
+    FROM new_rows n
+    GROUP BY 1, 2, 3
+    ON CONFLICT (project, month, usage_type) DO UPDATE SET
+        tokens = m.tokens + EXCLUDED.tokens,
+        operations = m.operations + EXCLUDED.operations,
+        first_usage = LEAST(m.first_usage, EXCLUDED.first_usage),
+        last_usage = GREATEST(m.last_usage, EXCLUDED.last_usage);
+    RETURN NULL;
+END;
+$$;
+
+-- Keine Inserts während des Backfills verlieren oder doppelt zählen
+LOCK TABLE embedding_usage IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trg_rollup_embedding_usage ON embedding_usage;
+CREATE TRIGGER trg_rollup_embedding_usage
+    AFTER INSERT ON embedding_usage
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION rollup_embedding_usage();
+
+-- Backfill aus den bestehenden Einzelzeilen
+TRUNCATE embedding_usage_monthly;
+INSERT INTO embedding_usage_monthly
+    (project, month, usage_type, tokens, operations, first_usage, last_usage)
+SELECT
+    project,
+    date_trunc('month', created_at)::date,
+    usage_type,
+    sum(tokens),
+    count(*),
+    min(created_at),
+    max(created_at)
+FROM embedding_usage
+GROUP BY 1, 2, 3;
+
+GRANT SELECT ON embedding_usage_monthly TO anon, authenticated;
+
+COMMIT;
@@ -0,0 +1,115 @@
+-- Überarbeitetes Suchschema für match_documents
+-- Copy this code and run it in the Supabase SQL Editor (pgvector >= 0.5.0)
+--
+-- Probleme des bisherigen Schemas:
+--   * ein globaler ivfflat-Index (lists = 100) liefert erst die globalen
+--     Nachbarn und filtert danach nach Projekt -> kleine Projekte bekommen
+--     kaum Treffer, große scannen zu viel
+--   * die Similarity wird pro Zeile zweimal berechnet (WHERE und SELECT)
+--
+-- Neues Schema:
+--   * kleine Projekte: exakter Scan über den B-Tree auf project
+--   * große Projekte: eigener partieller HNSW-Index pro Projekt
+--   * match_documents baut die Query mit dem Projekt als Literal, damit der
+--     Planner den passenden partiellen Index wählen kann
+--   * die Distanz wird einmal berechnet; ORDER BY <=> LIMIT lässt den Index
+--     die Query treiben, der Threshold filtert erst danach
+--   * ef_search ist pro Aufruf einstellbar
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- Globaler ivfflat-Index wird durch die partiellen HNSW-Indizes ersetzt
+DROP INDEX IF EXISTS idx_project_memory_embedding;
+
+CREATE INDEX IF NOT EXISTS idx_project_memory_project_created_at
+    ON project_memory(project, created_at);
+
+-- Partieller HNSW-Index für ein Projekt. Gibt den Indexnamen zurück.
+-- Für sehr große Tabellen besser manuell mit CREATE INDEX CONCURRENTLY anlegen.
+CREATE OR REPLACE FUNCTION create_project_embedding_index(
+    project_name text,
+    m int DEFAULT 16,
+    ef_construction int DEFAULT 64
+)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    index_name text := 'idx_pm_embedding_' || substr(md5(project_name), 1, 16);
+BEGIN
+    EXECUTE format(
+        'CREATE INDEX IF NOT EXISTS %I ON project_memory '
+        'USING hnsw (embedding vector_cosine_ops) WITH (m = %s, ef_construction = %s) '
+        'WHERE project = %L',
+        index_name, m, ef_construction, project_name
+    );
+    RETURN index_name;
+END;
+$$;
+
+-- Partielle Indizes für alle Projekte ab 10.000 Einträgen anlegen
+DO $$
+DECLARE
+    p text;
+BEGIN
+    FOR p IN
+        SELECT pm.project FROM project_memory pm
+        GROUP BY pm.project
+        HAVING count(*) >= 10000
+    LOOP
+        PERFORM create_project_embedding_index(p);
+    END LOOP;
+END;
+$$;
+
+-- Alte Signatur entfernen, sonst sind Aufrufe mit 4 Argumenten mehrdeutig
+DROP FUNCTION IF EXISTS match_documents(vector, float, int, text);
+
+CREATE OR REPLACE FUNCTION match_documents(
+    query_embedding vector(1536),
+    match_threshold float,
+    match_count int,
+    project_filter text,
+    ef_search int DEFAULT 40
+)
+RETURNS TABLE (
+    id uuid,
+    project text,
+    role text,
+    content text,
+    similarity float,
+    created_at timestamp
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Gilt nur für diese Transaktion (PostgREST: ein RPC-Aufruf)
+    PERFORM set_config('hnsw.ef_search', greatest(ef_search, match_count)::text, true);
+
+    RETURN QUERY EXECUTE format(
+        $q$
+        SELECT c.id, c.project, c.role, c.content, 1 - c.distance AS similarity, c.created_at
+        FROM (
+            SELECT
+                pm.id,
+                pm.project,
+                pm.role,
+                pm.content,
+                pm.created_at,
+                pm.embedding <=> $1 AS distance
+            FROM project_memory pm
+            WHERE pm.project = %L
+            ORDER BY pm.embedding <=> $1
+            LIMIT $2
+        ) c
+        WHERE c.distance < 1 - $3
+        ORDER BY c.distance
+        $q$,
+        project_filter
+    )
+    USING query_embedding, match_count, match_threshold;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION match_documents(vector, float, int, text, int) TO authenticated;
+GRANT EXECUTE ON FUNCTION match_documents(vector, float, int, text, int) TO anon;
@@ -0,0 +1,96 @@
+-- match_documents mit Filtern, Paging und gekürztem Content
+-- Copy this code and run it in the Supabase SQL Editor (nach 002)
+--
+-- Neue optionale Parameter:
+--   match_offset     Einträge überspringen (Paging per Cursor)
+--   role_filter      nur Einträge dieser Rolle
+--   created_after    created_at >= Zeitpunkt
+--   created_before   created_at <  Zeitpunkt
+--   content_length   NULL = voller Content, 0 = ohne Content, n = erste n Zeichen
+--
+-- Die Filter werden als Literale in die Query eingesetzt, damit der Planner
+-- den partiellen Projekt-Index nutzen kann. Mit pgvector >= 0.8 wird der
+-- iterative HNSW-Scan aktiviert, damit gefilterte Queries genug Treffer liefern.
+
+DROP FUNCTION IF EXISTS match_documents(vector, float, int, text, int);
+
+CREATE OR REPLACE FUNCTION match_documents(
+    query_embedding vector(1536),
+    match_threshold float,
+    match_count int,
+    project_filter text,
+    ef_search int DEFAULT 40,
+    match_offset int DEFAULT 0,
+    role_filter text DEFAULT NULL,
+    created_after timestamp DEFAULT NULL,
+    created_before timestamp DEFAULT NULL,
+    content_length int DEFAULT NULL
+)
+RETURNS TABLE (
+    id uuid,
+    project text,
+    role text,
+    content text,
+    similarity float,
+    created_at timestamp
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    filters text := format('pm.project = %L', project_filter);
+BEGIN
+    PERFORM set_config(
+        'hnsw.ef_search', greatest(ef_search, match_offset + match_count)::text, true
+    );
+    IF current_setting('hnsw.iterative_scan', true) IS NOT NULL THEN
+        PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    END IF;
+
+    IF role_filter IS NOT NULL THEN
+        filters := filters || format(' AND pm.role = %L', role_filter);
+    END IF;
+    IF created_after IS NOT NULL THEN
+        filters := filters || format(' AND pm.created_at >= %L', created_after);
+    END IF;
+    IF created_before IS NOT NULL THEN
+        filters := filters || format(' AND pm.created_at < %L', created_before);
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        $q$
+        SELECT
+            c.id,
+            c.project,
+            c.role,
+            CASE
+                WHEN $4 IS NULL THEN c.content
+                WHEN $4 = 0 THEN NULL
+                ELSE left(c.content, $4)
+            END,
+            1 - c.distance AS similarity,
+            c.created_at
+        FROM (
+            SELECT
+                pm.id,
+                pm.project,
+                pm.role,
+                pm.content,
+                pm.created_at,
+                pm.embedding <=> $1 AS distance
+            FROM project_memory pm
+            WHERE %s
+            ORDER BY pm.embedding <=> $1
+            LIMIT $2
+        ) c
+        WHERE c.distance < 1 - $3
+        ORDER BY c.distance, c.id
+        OFFSET $5
+        $q$,
+        filters
+    )
+    USING query_embedding, match_offset + match_count, match_threshold, content_length, match_offset;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION match_documents(vector, float, int, text, int, int, text, timestamp, timestamp, int) TO authenticated;
+GRANT EXECUTE ON FUNCTION match_documents(vector, float, int, text, int, int, text, timestamp, timestamp, int) TO anon;
@@ -0,0 +1,71 @@
+-- Volltext- und Trigram-Suche für die hybride Suche
+-- Copy this code and run it in the Supabase SQL Editor (nach 003)
+--
+-- * content_tsv: generierte tsvector-Spalte mit der 'simple'-Konfiguration,
+--   damit Bezeichner und Fehlercodes nicht gestemmt werden
+-- * GIN-Index auf content_tsv für websearch-Queries
+-- * GIN-Trigram-Index auf content für Teilstrings und Tippfehler (word_similarity)
+-- * match_documents_lexical: gleiche Filter und Rückgabe wie match_documents,
+--   aber ohne Embedding; sortiert nach lexical_score
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE project_memory
+    ADD COLUMN IF NOT EXISTS content_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_project_memory_content_tsv
+    ON project_memory USING gin (content_tsv);
+
+CREATE INDEX IF NOT EXISTS idx_project_memory_content_trgm
+    ON project_memory USING gin (content gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION match_documents_lexical(
+    query_text text,
+    match_count int,
+    project_filter text,
+    match_offset int DEFAULT 0,
+    role_filter text DEFAULT NULL,
+    created_after timestamp DEFAULT NULL,
+    created_before timestamp DEFAULT NULL,
+    content_length int DEFAULT NULL
+)
+RETURNS TABLE (
+    id uuid,
+    project text,
+    role text,
+    content text,
+    lexical_score float,
+    created_at timestamp
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH q AS (
+        SELECT websearch_to_tsquery('simple', query_text) AS tsq
+    )
+    SELECT
+        pm.id,
+        pm.project,
+        pm.role,
+        CASE
+            WHEN content_length IS NULL THEN pm.content
+            WHEN content_length = 0 THEN NULL
+            ELSE left(pm.content, content_length)
+        END,
+        (ts_rank_cd(pm.content_tsv, q.tsq) + word_similarity(query_text, pm.content))::float
+            AS lexical_score,
+        pm.created_at
+    FROM project_memory pm, q
+    WHERE pm.project = project_filter
+      AND (pm.content_tsv @@ q.tsq OR query_text <% pm.content)
+      AND (role_filter IS NULL OR pm.role = role_filter)
+      AND (created_after IS NULL OR pm.created_at >= created_after)
+      AND (created_before IS NULL OR pm.created_at < created_before)
+    ORDER BY lexical_score DESC, pm.id
+    LIMIT match_count
+    OFFSET match_offset;
+$$;
+
+GRANT EXECUTE ON FUNCTION match_documents_lexical(text, int, text, int, text, timestamp, timestamp, int) TO authenticated;
+GRANT EXECUTE ON FUNCTION match_documents_lexical(text, int, text, int, text, timestamp, timestamp, int) TO anon;
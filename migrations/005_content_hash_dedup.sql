@@ -0,0 +1,70 @@
+-- Content-Hash Deduplizierung für project_memory
+-- Copy this code and run it in the Supabase SQL Editor (nach 004)
+--
+-- * content_hash: generierte Spalte mit dem SHA-256 des normalisierten
+--   Contents (NFC, Whitespace-Folgen zu einem Leerzeichen, getrimmt). Muss
+--   mit app.storage.content_hash übereinstimmen.
+-- * last_seen: wird gesetzt, wenn ein Duplikat erneut gespeichert wird
+-- * dedupe_project_memory(): entfernt vorhandene Duplikate pro Projekt und
+--   behält jeweils den ältesten Eintrag (einmalig, kann wiederholt werden)
+-- * eindeutiger Index (project, content_hash) verhindert neue Duplikate
+
+CREATE OR REPLACE FUNCTION raggadon_content_hash(content text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT encode(
+        sha256(convert_to(
+            btrim(regexp_replace(normalize(content, NFC), E'[ \t\n\r\f\v]+', ' ', 'g'), ' '),
+            'UTF8'
+        )),
+        'hex'
+    )
+$$;
+
+ALTER TABLE project_memory
+    ADD COLUMN IF NOT EXISTS content_hash text
+        GENERATED ALWAYS AS (raggadon_content_hash(content)) STORED,
+    ADD COLUMN IF NOT EXISTS last_seen timestamp;
+
+-- Löscht Duplikate und gibt die Anzahl der entfernten Zeilen zurück.
+-- Der behaltene Eintrag bekommt als last_seen den jüngsten created_at.
+CREATE OR REPLACE FUNCTION dedupe_project_memory()
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    removed int;
+BEGIN
+    WITH ranked AS (
+        SELECT
+            pm.id,
+            pm.created_at,
+            row_number() OVER w AS rn,
+            max(pm.created_at) OVER (PARTITION BY pm.project, pm.content_hash) AS latest
+        FROM project_memory pm
+        WINDOW w AS (PARTITION BY pm.project, pm.content_hash ORDER BY pm.created_at, pm.id)
+    ),
+    touched AS (
+        UPDATE project_memory pm
+        SET last_seen = greatest(pm.last_seen, r.latest)
+        FROM ranked r
+        WHERE pm.id = r.id AND r.rn = 1 AND r.latest > r.created_at
+    ),
+    deleted AS (
+        DELETE FROM project_memory pm
+        USING ranked r
+        WHERE pm.id = r.id AND r.rn > 1
+        RETURNING pm.id
+    )
+    SELECT count(*) INTO removed FROM deleted;
+    RETURN removed;
+END;
+$$;
+
+SELECT dedupe_project_memory() AS removed_duplicates;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_project_memory_project_content_hash
+    ON project_memory(project, content_hash);
@@ -0,0 +1,174 @@
+-- Gechunkte Dokumente: Eltern-/Kind-Zeilen in project_memory
+-- Copy this code and run it in the Supabase SQL Editor (nach 005)
+--
+-- Lange Inhalte werden beim Speichern in überlappende Chunks geteilt:
+--   * Eltern-Zeile: vollständiger Content, embedding NULL, chunk_count = n
+--   * Kind-Zeilen:  Chunk-Content mit Embedding, parent_id, chunk_index
+--
+-- Nur Eltern- und normale Zeilen nehmen an der Deduplizierung teil:
+-- content_hash ist für Chunks NULL (NULLs verletzen den Unique-Index nicht).
+-- match_documents und match_documents_lexical liefern parent_id und
+-- chunk_index mit und überspringen Eltern-Zeilen.
+
+ALTER TABLE project_memory
+    ADD COLUMN IF NOT EXISTS parent_id uuid REFERENCES project_memory(id) ON DELETE CASCADE,
+    ADD COLUMN IF NOT EXISTS chunk_index int,
+    ADD COLUMN IF NOT EXISTS chunk_count int;
+
+CREATE INDEX IF NOT EXISTS idx_project_memory_parent_id
+    ON project_memory(parent_id) WHERE parent_id IS NOT NULL;
+
+-- content_hash neu generieren (Chunks ohne Hash); entfernt auch den Unique-Index
+ALTER TABLE project_memory DROP COLUMN IF EXISTS content_hash;
+ALTER TABLE project_memory
+    ADD COLUMN content_hash text GENERATED ALWAYS AS (
+        CASE WHEN parent_id IS NULL THEN raggadon_content_hash(content) END
+    ) STORED;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_project_memory_project_content_hash
+    ON project_memory(project, content_hash);
+
+-- Rückgabetyp ändert sich: alte Signaturen entfernen
+DROP FUNCTION IF EXISTS match_documents(vector, float, int, text, int, int, text, timestamp, timestamp, int);
+DROP FUNCTION IF EXISTS match_documents_lexical(text, int, text, int, text, timestamp, timestamp, int);
+
+CREATE OR REPLACE FUNCTION match_documents(
+    query_embedding vector(1536),
+    match_threshold float,
+    match_count int,
+    project_filter text,
+    ef_search int DEFAULT 40,
+    match_offset int DEFAULT 0,
+    role_filter text DEFAULT NULL,
+    created_after timestamp DEFAULT NULL,
+    created_before timestamp DEFAULT NULL,
+    content_length int DEFAULT NULL
+)
+RETURNS TABLE (
+    id uuid,
+    project text,
+    role text,
+    content text,
+    similarity float,
+    created_at timestamp,
+    parent_id uuid,
+    chunk_index int
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    filters text := format('pm.project = %L AND pm.embedding IS NOT NULL', project_filter);
+BEGIN
+    PERFORM set_config(
+        'hnsw.ef_search', greatest(ef_search, match_offset + match_count)::text, true
+    );
+    IF current_setting('hnsw.iterative_scan', true) IS NOT NULL THEN
+        PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    END IF;
+
+    IF role_filter IS NOT NULL THEN
+        filters := filters || format(' AND pm.role = %L', role_filter);
+    END IF;
+    IF created_after IS NOT NULL THEN
+        filters := filters || format(' AND pm.created_at >= %L', created_after);
+    END IF;
+    IF created_before IS NOT NULL THEN
+        filters := filters || format(' AND pm.created_at < %L', created_before);
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        $q$
+        SELECT
+            c.id,
+            c.project,
+            c.role,
+            CASE
+                WHEN $4 IS NULL THEN c.content
+                WHEN $4 = 0 THEN NULL
+                ELSE left(c.content, $4)
+            END,
+            1 - c.distance AS similarity,
+            c.created_at,
+            c.parent_id,
+            c.chunk_index
+        FROM (
+            SELECT
+                pm.id,
+                pm.project,
+                pm.role,
+                pm.content,
+                pm.created_at,
+                pm.parent_id,
+                pm.chunk_index,
+                pm.embedding <=> $1 AS distance
+            FROM project_memory pm
+            WHERE %s
+            ORDER BY pm.embedding <=> $1
+            LIMIT $2
+        ) c
+        WHERE c.distance < 1 - $3
+        ORDER BY c.distance, c.id
+        OFFSET $5
+        $q$,
+        filters
+    )
+    USING query_embedding, match_offset + match_count, match_threshold, content_length, match_offset;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION match_documents_lexical(
+    query_text text,
+    match_count int,
+    project_filter text,
+    match_offset int DEFAULT 0,
+    role_filter text DEFAULT NULL,
+    created_after timestamp DEFAULT NULL,
+    created_before timestamp DEFAULT NULL,
+    content_length int DEFAULT NULL
+)
+RETURNS TABLE (
+    id uuid,
+    project text,
+    role text,
+    content text,
+    lexical_score float,
+    created_at timestamp,
+    parent_id uuid,
+    chunk_index int
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH q AS (
+        SELECT websearch_to_tsquery('simple', query_text) AS tsq
+    )
+    SELECT
+        pm.id,
+        pm.project,
+        pm.role,
+        CASE
+            WHEN content_length IS NULL THEN pm.content
+            WHEN content_length = 0 THEN NULL
+            ELSE left(pm.content, content_length)
+        END,
+        (ts_rank_cd(pm.content_tsv, q.tsq) + word_similarity(query_text, pm.content))::float
+            AS lexical_score,
+        pm.created_at,
+        pm.parent_id,
+        pm.chunk_index
+    FROM project_memory pm, q
+    WHERE pm.project = project_filter
+      AND pm.chunk_count IS NULL
+      AND (pm.content_tsv @@ q.tsq OR query_text <% pm.content)
+      AND (role_filter IS NULL OR pm.role = role_filter)
+      AND (created_after IS NULL OR pm.created_at >= created_after)
+      AND (created_before IS NULL OR pm.created_at < created_before)
+    ORDER BY lexical_score DESC, pm.id
+    LIMIT match_count
+    OFFSET match_offset;
+$$;
+
+GRANT EXECUTE ON FUNCTION match_documents(vector, float, int, text, int, int, text, timestamp, timestamp, int) TO authenticated;
+GRANT EXECUTE ON FUNCTION match_documents(vector, float, int, text, int, int, text, timestamp, timestamp, int) TO anon;
+GRANT EXECUTE ON FUNCTION match_documents_lexical(text, int, text, int, text, timestamp, timestamp, int) TO authenticated;
+GRANT EXECUTE ON FUNCTION match_documents_lexical(text, int, text, int, text, timestamp, timestamp, int) TO anon;
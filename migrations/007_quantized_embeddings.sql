@@ -0,0 +1,220 @@
+-- Quantisierte Vektorsuche und gekürzte Embeddings
+-- Copy this code and run it in the Supabase SQL Editor (nach 006, pgvector >= 0.7.0)
+--
+-- Die HNSW-Indizes über die vollen float32-Vektoren dominieren die Größe der
+-- Datenbank. Diese Migration ergänzt:
+--   * create_project_quantized_index(): partieller HNSW-Index pro Projekt über
+--     halfvec (float16, halbe Größe) oder binary_quantize (1 Bit pro Dimension)
+--   * drop_project_embedding_index(): entfernt den vollen Index aus 002, wenn
+--     ein Projekt nur noch quantisiert gesucht wird
+--   * match_documents_quantized: Kandidaten über den quantisierten Index
+--     ((offset + count) * rerank_factor), danach Re-Ranking mit den vollen
+--     Vektoren; Filter und Rückgabe wie match_documents (006)
+--   * resize_project_memory_embeddings(): kürzt die embedding-Spalte auf n
+--     Dimensionen (text-embedding-3 mit EMBEDDING_DIMENSIONS); gekürzt und
+--     neu normiert entspricht das dem dimensions-Parameter der API, bestehende
+--     Einträge müssen nicht neu eingebettet werden
+--
+-- Aktiv im Server mit VECTOR_QUANTIZATION=halfvec|binary und
+-- VECTOR_RERANK_FACTOR (Standard 4).
+
+-- Dimension der embedding-Spalte (bei pgvector ist der typmod die Dimension)
+CREATE OR REPLACE FUNCTION raggadon_embedding_dimensions()
+RETURNS int
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT a.atttypmod
+    FROM pg_attribute a
+    WHERE a.attrelid = 'project_memory'::regclass AND a.attname = 'embedding'
+$$;
+
+-- Ausdruck für die quantisierte Distanz zwischen Spalte und $1
+CREATE OR REPLACE FUNCTION raggadon_quantized_distance(quantization text, dims int)
+RETURNS text
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+    IF quantization = 'binary' THEN
+        RETURN format('binary_quantize(pm.embedding)::bit(%1$s) <~> binary_quantize($1)::bit(%1$s)', dims);
+    ELSIF quantization = 'halfvec' THEN
+        RETURN format('pm.embedding::halfvec(%1$s) <=> $1::halfvec(%1$s)', dims);
+    END IF;
+    RAISE EXCEPTION 'Unbekannte Quantisierung: % (erlaubt: halfvec, binary)', quantization;
+END;
+$$;
+
+-- Partieller quantisierter HNSW-Index für ein Projekt. Gibt den Indexnamen zurück.
+-- Die Ausdrücke müssen exakt denen in raggadon_quantized_distance entsprechen.
+CREATE OR REPLACE FUNCTION create_project_quantized_index(
+    project_name text,
+    quantization text DEFAULT 'binary',
+    m int DEFAULT 16,
+    ef_construction int DEFAULT 64
+)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    dims int := raggadon_embedding_dimensions();
+    index_name text := 'idx_pm_' || quantization || '_' || substr(md5(project_name), 1, 16);
+    expression text;
+BEGIN
+    IF quantization = 'binary' THEN
+        expression := format('(binary_quantize(embedding)::bit(%s)) bit_hamming_ops', dims);
+    ELSIF quantization = 'halfvec' THEN
+        expression := format('(embedding::halfvec(%s)) halfvec_cosine_ops', dims);
+    ELSE
+        RAISE EXCEPTION 'Unbekannte Quantisierung: % (erlaubt: halfvec, binary)', quantization;
+    END IF;
+
+    EXECUTE format(
+        'CREATE INDEX IF NOT EXISTS %I ON project_memory '
+        'USING hnsw (%s) WITH (m = %s, ef_construction = %s) '
+        'WHERE project = %L',
+        index_name, expression, m, ef_construction, project_name
+    );
+    RETURN index_name;
+END;
+$$;
+
+-- Entfernt den vollen HNSW-Index eines Projekts (create_project_embedding_index)
+CREATE OR REPLACE FUNCTION drop_project_embedding_index(project_name text)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    index_name text := 'idx_pm_embedding_' || substr(md5(project_name), 1, 16);
+BEGIN
+    EXECUTE format('DROP INDEX IF EXISTS %I', index_name);
+    RETURN index_name;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION match_documents_quantized(
+    query_embedding vector,
+    match_threshold float,
+    match_count int,
+    project_filter text,
+    quantization text DEFAULT 'binary',
+    rerank_factor int DEFAULT 4,
+    ef_search int DEFAULT 40,
+    match_offset int DEFAULT 0,
+    role_filter text DEFAULT NULL,
+    created_after timestamp DEFAULT NULL,
+    created_before timestamp DEFAULT NULL,
+    content_length int DEFAULT NULL
+)
+RETURNS TABLE (
+    id uuid,
+    project text,
+    role text,
+    content text,
+    similarity float,
+    created_at timestamp,
+    parent_id uuid,
+    chunk_index int
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    filters text := format('pm.project = %L AND pm.embedding IS NOT NULL', project_filter);
+    candidates int := (match_offset + match_count) * greatest(rerank_factor, 1);
+BEGIN
+    PERFORM set_config('hnsw.ef_search', greatest(ef_search, candidates)::text, true);
+    IF current_setting('hnsw.iterative_scan', true) IS NOT NULL THEN
+        PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    END IF;
+
+    IF role_filter IS NOT NULL THEN
+        filters := filters || format(' AND pm.role = %L', role_filter);
+    END IF;
+    IF created_after IS NOT NULL THEN
+        filters := filters || format(' AND pm.created_at >= %L', created_after);
+    END IF;
+    IF created_before IS NOT NULL THEN
+        filters := filters || format(' AND pm.created_at < %L', created_before);
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        $q$
+        SELECT
+            c.id,
+            c.project,
+            c.role,
+            CASE
+                WHEN $4 IS NULL THEN c.content
+                WHEN $4 = 0 THEN NULL
+                ELSE left(c.content, $4)
+            END,
+            1 - c.distance AS similarity,
+            c.created_at,
+            c.parent_id,
+            c.chunk_index
+        FROM (
+            SELECT q.*, q.embedding <=> $1 AS distance
+            FROM (
+                SELECT
+                    pm.id,
+                    pm.project,
+                    pm.role,
+                    pm.content,
+                    pm.created_at,
+                    pm.parent_id,
+                    pm.chunk_index,
+                    pm.embedding
+                FROM project_memory pm
+                WHERE %s
+                ORDER BY %s
+                LIMIT $2
+            ) q
+        ) c
+        WHERE c.distance < 1 - $3
+        ORDER BY c.distance, c.id
+        OFFSET $5
+        LIMIT $6
+        $q$,
+        filters,
+        raggadon_quantized_distance(quantization, raggadon_embedding_dimensions())
+    )
+    USING query_embedding, candidates, match_threshold, content_length, match_offset, match_count;
+END;
+$$;
+
+-- Kürzt alle Embeddings auf dims Dimensionen und normiert sie neu.
+-- Entfernt dafür alle Vektorindizes (idx_pm_*); danach pro großem Projekt
+-- create_project_embedding_index bzw. create_project_quantized_index erneut
+-- aufrufen. Gibt die Anzahl der entfernten Indizes zurück.
+CREATE OR REPLACE FUNCTION resize_project_memory_embeddings(dims int)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    index_name text;
+    dropped int := 0;
+BEGIN
+    IF dims >= raggadon_embedding_dimensions() THEN
+        RAISE EXCEPTION 'Embeddings können nur gekürzt werden (aktuell % Dimensionen)',
+            raggadon_embedding_dimensions();
+    END IF;
+
+    FOR index_name IN
+        SELECT i.indexname FROM pg_indexes i
+        WHERE i.tablename = 'project_memory' AND i.indexname LIKE 'idx\_pm\_%'
+    LOOP
+        EXECUTE format('DROP INDEX IF EXISTS %I', index_name);
+        dropped := dropped + 1;
+    END LOOP;
+
+    EXECUTE format(
+        'ALTER TABLE project_memory ALTER COLUMN embedding TYPE vector(%1$s) '
+        'USING l2_normalize(subvector(embedding, 1, %1$s))::vector(%1$s)',
+        dims
+    );
+    RETURN dropped;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION match_documents_quantized(vector, float, int, text, text, int, int, int, text, timestamp, timestamp, int) TO authenticated;
+GRANT EXECUTE ON FUNCTION match_documents_quantized(vector, float, int, text, text, int, int, int, text, timestamp, timestamp, int) TO anon;
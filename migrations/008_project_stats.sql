@@ -0,0 +1,75 @@
+-- Aggregierte Projekt-Statistiken
+-- Copy this code and run it in the Supabase SQL Editor (nach 007)
+--
+-- /project/{project}/stats brauchte bisher drei Abfragen auf project_memory
+-- (count, erster und letzter Eintrag), die Übersicht über alle Projekte eine
+-- pro Projekt. Die beiden Funktionen liefern dieselben Werte gruppiert nach
+-- Projekt in je einer Abfrage:
+--   * project_memory_stats: Anzahl, erster und letzter Eintrag; gechunkte
+--     Dokumente (006) zählen einmal, Chunk-Zeilen (parent_id gesetzt) nicht.
+--     count/min/max lesen nur den partiellen B-Tree unten (Index-Only-Scan)
+--   * project_usage_stats: Token- und Operationssummen aus
+--     embedding_usage_monthly (001), wenige Zeilen pro Projekt und Monat
+--
+-- project_filter = NULL liefert alle Projekte, sonst nur die genannten.
+
+CREATE INDEX IF NOT EXISTS idx_project_memory_project_created_top
+    ON project_memory (project, created_at)
+    WHERE parent_id IS NULL;
+
+CREATE OR REPLACE FUNCTION project_memory_stats(project_filter text[] DEFAULT NULL)
+RETURNS TABLE (
+    project text,
+    total_memories bigint,
+    first_activity timestamp,
+    last_activity timestamp
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        pm.project,
+        count(*) AS total_memories,
+        min(pm.created_at) AS first_activity,
+        max(pm.created_at) AS last_activity
+    FROM project_memory pm
+    WHERE pm.parent_id IS NULL
+      AND (project_filter IS NULL OR pm.project = ANY(project_filter))
+    GROUP BY pm.project
+$$;
+
+CREATE OR REPLACE FUNCTION project_usage_stats(
+    current_month date,
+    project_filter text[] DEFAULT NULL
+)
+RETURNS TABLE (
+    project text,
+    total_tokens bigint,
+    monthly_tokens bigint,
+    save_operations bigint,
+    search_operations bigint,
+    total_operations bigint,
+    first_usage timestamp,
+    last_usage timestamp
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        m.project,
+        sum(m.tokens)::bigint AS total_tokens,
+        coalesce(sum(m.tokens) FILTER (WHERE m.month = current_month), 0)::bigint AS monthly_tokens,
+        coalesce(sum(m.operations) FILTER (WHERE m.usage_type = 'save'), 0)::bigint AS save_operations,
+        coalesce(sum(m.operations) FILTER (WHERE m.usage_type = 'search'), 0)::bigint AS search_operations,
+        sum(m.operations)::bigint AS total_operations,
+        min(m.first_usage) AS first_usage,
+        max(m.last_usage) AS last_usage
+    FROM embedding_usage_monthly m
+    WHERE project_filter IS NULL OR m.project = ANY(project_filter)
+    GROUP BY m.project
+$$;
+
+GRANT EXECUTE ON FUNCTION project_memory_stats(text[]) TO authenticated;
+GRANT EXECUTE ON FUNCTION project_memory_stats(text[]) TO anon;
+GRANT EXECUTE ON FUNCTION project_usage_stats(date, text[]) TO authenticated;
+GRANT EXECUTE ON FUNCTION project_usage_stats(date, text[]) TO anon;
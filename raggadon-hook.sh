@@ -0,0 +1,53 @@
+#!/bin/sh
+
+# Raggadon Hook-Client für Claude Code
+#
+# Startet pro Hook-Event keinen Python-Prozess: der Inhalt geht per curl an
+# den laufenden Server (/hook/save), der Auswahl und Extraktion übernimmt.
+#
+#   raggadon-hook.sh mode                    # RAG-Modus (wie get_rag_mode.py)
+#   echo "$INHALT" | raggadon-hook.sh save   # Inhalt von stdin, Rolle assistant
+#   raggadon-hook.sh save user "Inhalt"      # Rolle und Inhalt als Argumente
+#
+# Braucht curl >= 7.87 (--url-query). Ist der Server nicht erreichbar, endet
+# das Skript still mit Exit-Code 0, damit der Editor nicht blockiert.
+
+RAGGADON_URL="${RAGGADON_URL:-http://127.0.0.1:8000}"
+RAGGADON_TIMEOUT="${RAGGADON_TIMEOUT:-5}"
+RAG_CONFIG="$HOME/.rag_config"
+
+case "$1" in
+    mode)
+        MODE=""
+        if [ -f "$RAG_CONFIG" ]; then
+            MODE=$(tr -d '[:space:]' < "$RAG_CONFIG")
+        fi
+        # Altes "verbose" wird zu "active"
+        if [ "$MODE" = "verbose" ]; then
+            MODE="active"
+            printf '%s' "$MODE" > "$RAG_CONFIG"
+        fi
+        echo "${MODE:-active}"
+        ;;
+
+    save)
+        ROLE="${2:-assistant}"
+        PROJECT="${PROJECT_NAME:-$(basename "$PWD")}"
+        if [ $# -gt 2 ]; then
+            shift 2
+            printf '%s' "$*"
+        else
+            cat
+        fi | curl -sf --max-time "$RAGGADON_TIMEOUT" -X POST \
+            -H "Content-Type: text/plain; charset=utf-8" \
+            --url-query "project=$PROJECT" \
+            --url-query "role=$ROLE" \
+            --data-binary @- \
+            "$RAGGADON_URL/hook/save" > /dev/null || true
+        ;;
+
+    *)
+        echo "Verwendung: raggadon-hook.sh mode | save [role] [inhalt]" >&2
+        exit 2
+        ;;
+esac
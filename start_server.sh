@@ -1,6 +1,6 @@
 #!/bin/bash
 
-# Raggadon Server Starter Script
+# Raggadon Server Starter Script (Produktion, ohne Auto-Reload)
 cd "$(dirname "$0")"
 
 echo "🚀 Starte Raggadon RAG-Middleware..."
@@ -8,5 +8,10 @@ echo "🚀 Starte Raggadon RAG-Middleware..."
 # Virtuelle Umgebung aktivieren
 source venv/bin/activate
 
-# Server starten
-python main.py
\ No newline at end of file
+# Kein Auto-Reload im Dienst; Worker-Anzahl per RAGGADON_WORKERS (Standard 1,
+# /metrics zählt pro Worker)
+export RELOAD=false
+
+# Server starten; exec, damit SIGTERM von launchd/systemd den Server erreicht.
+# app.server statt main.py: der Supervisor lädt die App nicht selbst.
+exec python -m app.server
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Vor dem Import von main: Hash-Provider und lokales Backend, ohne Netz und Kosten
+os.environ.update(
+    {
+        "EMBEDDING_PROVIDER": "hash",
+        "RAGGADON_STORAGE": "local",
+        "RAGGADON_WARMUP": "off",
+        "EMBEDDING_CACHE_PATH": "",
+        "CHUNK_MAX_TOKENS": "40",
+        "CHUNK_OVERLAP_TOKENS": "5",
+    }
+)
+os.environ.pop("RAGGADON_IPC_DIR", None)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """TestClient mit laufendem lifespan und frischem Datenverzeichnis"""
+    monkeypatch.setenv("RAGGADON_DATA_DIR", str(tmp_path))
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def project(request):
+    """Eigener Projektname pro Test (der Response-Cache lebt im Modul)"""
+    return f"test-{request.node.name}"
@@ -0,0 +1,232 @@
+from datetime import datetime, timedelta, timezone
+
+import main
+
+LONG_TEXT = " ".join(
+    f"abschnitt{i} speichert kontext zum deployment" for i in range(60)
+)
+
+
+def save(client, project, content, role="user"):
+    response = client.post(
+        "/save", json={"project": project, "role": role, "content": content}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def search(client, project, query, **params):
+    response = client.get(
+        "/search", params={"project": project, "query": query, "threshold": 0, **params}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_save_returns_id_and_tokens(client, project):
+    result = save(client, project, "cache wird nach jedem save invalidiert")
+
+    assert result["success"] is True
+    assert result["id"]
+    assert result["tokens_used"] > 0
+    assert result["duplicate"] is False
+
+
+def test_save_deduplicates_same_content(client, project):
+    first = save(client, project, "doppelter eintrag")
+    second = save(client, project, "  doppelter eintrag  ")
+
+    assert second["duplicate"] is True
+    assert second["id"] == first["id"]
+    assert second["tokens_used"] == 0
+    assert client.get(f"/project/{project}/stats").json()["total_memories"] == 1
+
+
+def test_save_batch(client, project):
+    items = [{"role": "user", "content": f"batch eintrag nummer {i}"} for i in range(5)]
+    response = client.post("/save/batch", json={"project": project, "items": items})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["saved"] == 5
+    assert client.get(f"/project/{project}/stats").json()["total_memories"] == 5
+
+
+def test_chunked_save_counts_document_once(client, project):
+    result = save(client, project, LONG_TEXT)
+    save(client, project, "kurzer eintrag")
+
+    assert result["chunks"] > 1
+    stats = client.get(f"/project/{project}/stats").json()
+    assert stats["total_memories"] == 2
+    overview = {
+        entry["project"]: entry
+        for entry in client.get("/projects/stats").json()["projects"]
+    }
+    assert overview[project]["total_memories"] == 2
+
+
+def test_chunked_search_collapses_to_document(client, project):
+    document_id = save(client, project, LONG_TEXT)["id"]
+
+    results = search(
+        client, project, "abschnitt3 deployment", collapse_chunks=True, limit=5
+    )["results"]
+
+    assert [row["id"] for row in results] == [document_id]
+
+
+def test_search_modes(client, project):
+    save(client, project, "postgres migration mit pgvector index")
+    save(client, project, "frontend komponente für das dashboard")
+
+    for mode in ("vector", "lexical", "hybrid"):
+        results = search(client, project, "pgvector migration", mode=mode)["results"]
+        assert results, mode
+        assert "pgvector" in results[0]["content"], mode
+
+
+def test_search_cursor_pages_without_overlap(client, project):
+    for i in range(5):
+        save(client, project, f"suchbarer eintrag nummer {i}")
+
+    first = search(client, project, "suchbarer eintrag", limit=2)
+    second = search(
+        client, project, "suchbarer eintrag", limit=2, cursor=first["next_cursor"]
+    )
+
+    assert first["next_cursor"]
+    first_ids = {row["id"] for row in first["results"]}
+    second_ids = {row["id"] for row in second["results"]}
+    assert len(second_ids) == 2
+    assert not first_ids & second_ids
+
+
+def test_search_invalid_cursor(client, project):
+    response = client.get(
+        "/search", params={"project": project, "query": "x", "cursor": "kaputt"}
+    )
+    assert response.status_code == 400
+
+
+def test_search_filters(client, project):
+    save(client, project, "rolle user eintrag", role="user")
+    save(client, project, "rolle assistant eintrag", role="assistant")
+
+    results = search(client, project, "rolle eintrag", role="assistant")["results"]
+    assert [row["role"] for row in results] == ["assistant"]
+
+    tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    assert search(client, project, "rolle eintrag", since=tomorrow)["results"] == []
+    assert len(search(client, project, "rolle eintrag", until=tomorrow)["results"]) == 2
+
+
+def test_search_content_trimming(client, project):
+    save(client, project, "metadaten ohne inhalt")
+
+    assert (
+        search(client, project, "metadaten", include_content=False)["results"][0][
+            "content"
+        ]
+        is None
+    )
+    assert (
+        search(client, project, "metadaten", snippet_length=9)["results"][0]["content"]
+        == "metadaten"
+    )
+
+
+def test_search_etag_not_modified(client, project):
+    save(client, project, "etag eintrag")
+    params = {"project": project, "query": "etag eintrag", "threshold": 0}
+
+    first = client.get("/search", params=params)
+    etag = first.headers["ETag"]
+    cached = client.get("/search", params=params, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    save(client, project, "neuer etag eintrag")
+    changed = client.get("/search", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_stats_etag_not_modified(client, project):
+    save(client, project, "stats eintrag")
+
+    etag = client.get(f"/project/{project}/stats").headers["ETag"]
+    response = client.get(f"/project/{project}/stats", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+
+
+def test_stats_include_pending_usage(client, project):
+    main.usage_writer.flush_interval = 60
+    save(client, project, "noch nicht geschriebenes event")
+    search(client, project, "event")
+
+    stats = client.get(f"/project/{project}/stats").json()
+    overview = {
+        entry["project"]: entry
+        for entry in client.get("/projects/stats").json()["projects"]
+    }
+
+    assert [activity["type"] for activity in stats["recent_activities"]] == [
+        "search",
+        "save",
+    ]
+    assert stats["monthly_tokens"] > 0
+    assert overview[project]["save_operations"] == 1
+    assert overview[project]["search_operations"] == 1
+
+
+def test_stats_fall_back_without_aggregate_query(client, project, monkeypatch):
+    save(client, project, "eintrag ohne migration 008")
+
+    async def missing_rpc(projects=None):
+        raise RuntimeError("function project_memory_stats does not exist")
+
+    monkeypatch.setattr(main.storage, "fetch_memory_stats", missing_rpc)
+
+    stats = client.get(f"/project/{project}/stats")
+    assert stats.status_code == 200
+    assert stats.json()["total_memories"] == 1
+    assert client.get("/projects/stats").status_code == 200
+
+
+def test_metrics(client, project):
+    save(client, project, "metriken eintrag")
+    search(client, project, "metriken")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert (
+        'raggadon_http_requests_total{method="POST",route="/save",status="200"}' in body
+    )
+    assert 'raggadon_stage_duration_seconds_count{stage="embed"}' in body
+    assert "raggadon_cache_requests_total" in body
+
+
+def test_hook_save_extracts_key_info(client, project):
+    content = (
+        "Kurze Antwort\ndef create_embedding(text):\n"
+        "    return client.embed(text)\nTODO: Cache prüfen"
+    )
+    response = client.post(
+        "/hook/save", params={"project": project}, content=content.encode("utf-8")
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["saved"] == 2
+    assert client.get(f"/project/{project}/stats").json()["total_memories"] == 2
+
+
+def test_hook_save_skips_unimportant_content(client, project):
+    response = client.post(
+        "/hook/save", params={"project": project}, content=b"alles klar, danke"
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["saved"] == 0
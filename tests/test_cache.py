@@ -0,0 +1,99 @@
+import pytest
+
+from app import cache
+from app.cache import ALL_PROJECTS, ResponseCache, make_etag
+
+
+def test_hit_after_set():
+    responses = ResponseCache(10)
+
+    assert responses.get("search", "p", ("q", 5)) is None
+    etag = responses.set("search", "p", ("q", 5), {"results": [1]}, 60)
+
+    assert responses.get("search", "p", ("q", 5)) == ({"results": [1]}, etag)
+    assert responses.get("search", "p", ("q", 10)) is None
+    assert responses.stats()["hits"] == 1
+    assert responses.stats()["misses"] == 2
+
+
+def test_invalidate_drops_project_and_all_projects():
+    responses = ResponseCache(10)
+    responses.set("search", "p", "q", "alt", 60)
+    responses.set("search", "other", "q", "andere", 60)
+    responses.set("stats", ALL_PROJECTS, None, "übersicht", 60)
+
+    responses.invalidate("p")
+
+    assert responses.get("search", "p", "q") is None
+    assert responses.get("stats", ALL_PROJECTS, None) is None
+    assert responses.get("search", "other", "q")[0] == "andere"
+    assert responses.generation("p") == 1
+    assert responses.generation(ALL_PROJECTS) == 1
+    assert responses.generation("other") == 0
+
+
+def test_stale_generation_is_not_stored():
+    responses = ResponseCache(10)
+    generation = responses.generation("p")
+    # Schreiben während die Antwort berechnet wird
+    responses.invalidate("p")
+
+    etag = responses.set("search", "p", "q", "veraltet", 60, generation=generation)
+
+    assert etag == make_etag("veraltet")
+    assert responses.get("search", "p", "q") is None
+    assert responses.stats()["size"] == 0
+
+
+def test_etag_depends_on_content_only():
+    assert make_etag({"a": 1, "b": [1, 2]}) == make_etag({"b": [1, 2], "a": 1})
+    assert make_etag({"a": 1}) != make_etag({"a": 2})
+    assert make_etag("x").startswith('W/"')
+
+
+def test_etag_without_orjson(monkeypatch):
+    monkeypatch.setattr(cache, "orjson", None)
+
+    assert make_etag({"b": 2, "a": [1, 2]}) == make_etag({"a": [1, 2], "b": 2})
+    assert make_etag({"a": 1}) != make_etag({"a": 2})
+
+
+def test_entries_expire(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    responses = ResponseCache(10)
+    responses.set("search", "p", "q", "wert", 5)
+
+    now += 4
+    assert responses.get("search", "p", "q") is not None
+    now += 2
+    assert responses.get("search", "p", "q") is None
+    assert responses.stats()["size"] == 0
+
+
+@pytest.mark.parametrize("ttl", [0, -1])
+def test_no_ttl_stores_nothing(ttl):
+    responses = ResponseCache(10)
+    responses.set("search", "p", "q", "wert", ttl)
+
+    assert responses.get("search", "p", "q") is None
+
+
+def test_lru_evicts_oldest():
+    responses = ResponseCache(2)
+    responses.set("search", "p", 1, "eins", 60)
+    responses.set("search", "p", 2, "zwei", 60)
+    responses.get("search", "p", 1)
+    responses.set("search", "p", 3, "drei", 60)
+
+    assert responses.get("search", "p", 2) is None
+    assert responses.get("search", "p", 1)[0] == "eins"
+    assert responses.get("search", "p", 3)[0] == "drei"
+
+
+def test_disabled_cache():
+    responses = ResponseCache(0)
+    responses.set("search", "p", "q", "wert", 60)
+
+    assert not responses.enabled
+    assert responses.get("search", "p", "q") is None
@@ -0,0 +1,71 @@
+import pytest
+
+from app.chunking import TextChunker, estimate_segment_tokens, iter_chunks
+
+WORDS = " ".join(f"wort{i}" for i in range(60))
+
+
+def test_short_text_is_one_chunk():
+    assert list(iter_chunks("kurzer text", 20, 5)) == ["kurzer text"]
+
+
+def test_chunks_respect_max_tokens():
+    chunks = list(iter_chunks(WORDS, 20, 5))
+
+    assert len(chunks) > 1
+    assert all(estimate_segment_tokens(chunk) <= 20 for chunk in chunks)
+
+
+def test_chunks_overlap_and_cover_all_words():
+    chunks = [chunk.split() for chunk in iter_chunks(WORDS, 20, 5)]
+
+    for previous, current in zip(chunks, chunks[1:]):
+        shared = [word for word in current if word in previous]
+        # Überlappung am Anfang des nächsten Chunks, höchstens overlap_tokens
+        assert shared and current[: len(shared)] == previous[-len(shared) :]
+        assert estimate_segment_tokens(" ".join(shared)) <= 5
+
+    seen = []
+    for chunk in chunks:
+        seen.extend(word for word in chunk if word not in seen)
+    assert seen == WORDS.split()
+
+
+def test_no_overlap_without_overlap_tokens():
+    chunks = [chunk.split() for chunk in iter_chunks(WORDS, 20, 0)]
+
+    assert sum(len(chunk) for chunk in chunks) == 60
+
+
+def test_cuts_at_sentence_boundaries():
+    text = (
+        "Erster Satz hier. " * 3
+        + "Zweiter Satz folgt jetzt gleich. Noch mehr Text ohne Ende und so weiter"
+    )
+
+    chunks = list(iter_chunks(text, 15))
+
+    assert chunks[0].endswith("hier.")
+    assert chunks[1] == "Zweiter Satz folgt jetzt gleich."
+
+
+def test_long_words_are_split():
+    chunks = list(iter_chunks("a" * 200, 10))
+
+    assert "".join(chunks) == "a" * 200
+    assert all(estimate_segment_tokens(chunk) <= 10 for chunk in chunks)
+
+
+def test_invalid_max_tokens():
+    with pytest.raises(ValueError):
+        list(iter_chunks("text", 0))
+
+
+def test_text_chunker_uses_environment(monkeypatch):
+    monkeypatch.setenv("CHUNK_MAX_TOKENS", "20")
+    monkeypatch.setenv("CHUNK_OVERLAP_TOKENS", "0")
+    chunker = TextChunker()
+
+    assert not chunker.needs_chunking("kurz")
+    assert chunker.needs_chunking(WORDS)
+    assert chunker.split(WORDS) == list(iter_chunks(WORDS, 20, 0))
@@ -0,0 +1,185 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.embedding_providers import HashProvider
+from app.embedding_scheduler import EmbeddingScheduler, split_tokens
+
+
+class TransientError(Exception):
+    pass
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class RecordingProvider(HashProvider):
+    """Hash-Provider, der Aufrufe mitschreibt und vorgegebene Fehler wirft"""
+
+    def __init__(self, errors=(), delay=0.0):
+        super().__init__()
+        self.calls = []
+        self.errors = list(errors)
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+
+    async def embed(self, texts):
+        self.calls.append(list(texts))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.errors:
+                raise self.errors.pop(0)
+            return await super().embed(texts)
+        finally:
+            self.active -= 1
+
+    def is_rate_limit(self, error):
+        return isinstance(error, RateLimitError)
+
+    def is_transient(self, error):
+        return isinstance(error, TransientError)
+
+
+def make_scheduler(provider, **kwargs):
+    options = {
+        "window_ms": 20,
+        "max_inputs": 100,
+        "max_tokens": 10000,
+        "max_concurrency": 4,
+        "retry_base_delay": 0.0,
+    }
+    options.update(kwargs)
+    return EmbeddingScheduler(provider, **options)
+
+
+def test_split_tokens_keeps_total():
+    assert split_tokens(10, [1, 1, 1]) == [4, 3, 3]
+    assert sum(split_tokens(17, [5, 0, 9, 2])) == 17
+    assert split_tokens(4, [0, 0]) == [2, 2]
+    assert split_tokens(5, []) == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_call():
+    provider = RecordingProvider()
+    scheduler = make_scheduler(provider)
+    texts = [f"text nummer {i}" for i in range(5)]
+
+    results = await asyncio.gather(*(scheduler.embed(text, 3) for text in texts))
+
+    assert provider.calls == [texts]
+    for text, (embedding, _) in zip(texts, results):
+        assert np.array_equal(embedding, provider.embed_one(text))
+    _, total = await HashProvider().embed(texts)
+    assert sum(tokens for _, tokens in results) == total
+    assert scheduler.stats()["avg_batch_size"] == 5
+
+
+@pytest.mark.asyncio
+async def test_max_inputs_flushes_early():
+    provider = RecordingProvider()
+    scheduler = make_scheduler(provider, window_ms=1000, max_inputs=2)
+
+    requests = [
+        asyncio.ensure_future(scheduler.embed(f"text {i}", 1)) for i in range(5)
+    ]
+    await asyncio.sleep(0)
+    # Der Rest wartet auf das Fenster; drain verschickt ihn sofort
+    await scheduler.drain()
+    await asyncio.gather(*requests)
+
+    assert [len(call) for call in provider.calls] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_max_tokens_starts_new_batch():
+    provider = RecordingProvider()
+    scheduler = make_scheduler(provider, max_tokens=10)
+
+    await asyncio.gather(*(scheduler.embed(f"text {i}", 4) for i in range(5)))
+
+    assert [len(call) for call in provider.calls] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_without_window_each_request_is_a_call():
+    provider = RecordingProvider()
+    scheduler = make_scheduler(provider, window_ms=0)
+
+    await asyncio.gather(*(scheduler.embed(f"text {i}", 1) for i in range(3)))
+
+    assert len(provider.calls) == 3
+    assert not scheduler.enabled
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried():
+    provider = RecordingProvider(errors=[TransientError(), TransientError()])
+    scheduler = make_scheduler(provider, max_retries=3)
+
+    embedding, _ = await scheduler.embed("text", 1)
+
+    assert len(provider.calls) == 3
+    assert np.array_equal(embedding, provider.embed_one("text"))
+    assert scheduler.stats()["retries"] == 2
+    assert scheduler.stats()["failures"] == 0
+
+
+@pytest.mark.asyncio
+async def test_retries_are_limited():
+    provider = RecordingProvider(errors=[TransientError()] * 3)
+    scheduler = make_scheduler(provider, max_retries=2)
+
+    with pytest.raises(TransientError):
+        await scheduler.embed_now(["text"])
+
+    assert len(provider.calls) == 3
+    assert scheduler.stats()["failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_permanent_error_reaches_all_waiters():
+    provider = RecordingProvider(errors=[ValueError("kaputt")])
+    scheduler = make_scheduler(provider)
+
+    results = await asyncio.gather(
+        *(scheduler.embed(f"text {i}", 1) for i in range(3)), return_exceptions=True
+    )
+
+    assert len(provider.calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert scheduler.stats()["retries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_halves_and_success_grows_limit():
+    provider = RecordingProvider(errors=[RateLimitError()])
+    scheduler = make_scheduler(provider, max_concurrency=8)
+
+    await scheduler.embed_now(["text"])
+
+    # 8 -> 4 durch das Rate-Limit, +1 durch den erfolgreichen Retry
+    stats = scheduler.stats()
+    assert stats["rate_limited"] == 1
+    assert stats["concurrency_limit"] == 5
+
+    for _ in range(5):
+        await scheduler.embed_now(["text"])
+    assert scheduler.stats()["concurrency_limit"] == 8
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_is_respected():
+    provider = RecordingProvider(delay=0.01)
+    scheduler = make_scheduler(provider, max_concurrency=2)
+
+    await asyncio.gather(*(scheduler.embed_now([f"text {i}"]) for i in range(6)))
+
+    assert len(provider.calls) == 6
+    assert provider.max_active == 2
+    assert scheduler.stats()["active_requests"] == 0
@@ -0,0 +1,103 @@
+import asyncio
+import itertools
+import socket
+
+import pytest
+
+from app.ipc import MAX_MESSAGE_BYTES, InvalidationBus
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Unix-Sockets nicht verfügbar"
+)
+
+
+@pytest.fixture
+def worker_pids(monkeypatch):
+    """Jeder Bus bekommt eine eigene PID, als liefe er in einem eigenen Worker"""
+    pids = itertools.count(1000)
+    monkeypatch.setattr("app.ipc.os.getpid", lambda: next(pids))
+
+
+async def wait_for(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_publish_reaches_other_workers(tmp_path, worker_pids):
+    received = {"a": [], "b": []}
+    first = InvalidationBus(str(tmp_path), received["a"].append)
+    second = InvalidationBus(str(tmp_path), received["b"].append)
+    first.start()
+    second.start()
+    try:
+        first.publish("projekt")
+        await wait_for(lambda: received["b"])
+
+        assert received == {"a": [], "b": ["projekt"]}
+        assert first.stats()["sent"] == 1
+        assert second.stats()["received"] == 1
+    finally:
+        first.close()
+        second.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_stale_socket_is_removed(tmp_path, worker_pids):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    stale.bind(str(tmp_path / "worker-1.sock"))
+    # Worker beendet, ohne seine Datei aufzuräumen
+    stale.close()
+    bus = InvalidationBus(str(tmp_path), lambda project: None)
+    bus.start()
+    try:
+        bus.publish("projekt")
+
+        assert not (tmp_path / "worker-1.sock").exists()
+        assert bus.stats()["sent"] == 0
+    finally:
+        bus.close()
+
+
+@pytest.mark.asyncio
+async def test_oversized_message_is_dropped(tmp_path, worker_pids):
+    bus = InvalidationBus(str(tmp_path), lambda project: None)
+    bus.start()
+    try:
+        bus.publish("x" * (MAX_MESSAGE_BYTES + 1))
+
+        assert bus.stats()["dropped"] == 1
+    finally:
+        bus.close()
+
+
+@pytest.mark.asyncio
+async def test_handler_errors_are_contained(tmp_path, worker_pids):
+    def failing(project):
+        raise RuntimeError("kaputt")
+
+    sender = InvalidationBus(str(tmp_path), lambda project: None)
+    receiver = InvalidationBus(str(tmp_path), failing)
+    sender.start()
+    receiver.start()
+    try:
+        sender.publish("eins")
+        sender.publish("zwei")
+        await wait_for(lambda: receiver.received == 2)
+
+        assert receiver.received == 2
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def test_disabled_without_directory():
+    bus = InvalidationBus(None, lambda project: None)
+    bus.start()
+    bus.publish("projekt")
+
+    assert not bus.enabled
+    assert bus.stats()["sent"] == 0
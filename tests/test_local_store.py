@@ -0,0 +1,145 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.ann import IVFIndex, fit_mask
+from app.lexical import InvertedIndex
+from app.local_store import ProjectStore, normalize_rows
+
+
+def make_rows(start, count, role="user"):
+    now = datetime.now(timezone.utc).isoformat()
+    return [
+        {
+            "id": f"row-{i}",
+            "project": "p",
+            "role": role,
+            "content": f"eintrag nummer {i} über suche",
+            "content_hash": f"hash-{i}",
+            "created_at": now,
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def random_vectors(count, dim=16, seed=0):
+    return normalize_rows(
+        np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProjectStore(tmp_path / "p", ann_min_rows=20000, ann_nprobe=4)
+    store.append(make_rows(0, 10), random_vectors(10))
+    return store
+
+
+def test_fit_mask_pads_and_truncates():
+    mask = np.array([True, False, True])
+
+    assert fit_mask(None, 5) is None
+    assert fit_mask(mask, 3) is mask
+    assert fit_mask(mask, 2).tolist() == [True, False]
+    assert fit_mask(mask, 5).tolist() == [True, False, True, False, False]
+
+
+def test_search_with_mask_built_before_append(store):
+    """Regression: /save zwischen filter_mask() und search() ergab IndexError"""
+    mask = store.filter_mask(role="user")
+    store.append(make_rows(10, 5, role="user"), random_vectors(5, seed=1))
+
+    hits = store.search(random_vectors(1, seed=2)[0], 20, -1.0, mask=mask)
+
+    # Zeilen nach der Maske gelten als nicht ausgewählt
+    assert len(hits) == 10
+    assert all(i < 10 for i, _ in hits)
+
+
+def test_lexical_search_with_mask_built_before_append(store):
+    mask = store.filter_mask(role="user")
+    store.append(make_rows(10, 5), random_vectors(5, seed=1))
+
+    hits = store.lexical_search("suche", 20, mask=mask)
+
+    assert {i for i, _ in hits} == set(range(10))
+
+
+def test_ivf_search_with_short_mask():
+    vectors = random_vectors(200, seed=3)
+    index = IVFIndex.build(vectors[:150], nlist=8, nprobe=8)
+
+    hits = index.search(vectors, vectors[160], 10, -1.0, mask=np.ones(150, dtype=bool))
+
+    assert hits
+    assert all(i < 150 for i, _ in hits)
+
+
+def test_ivf_search_ignores_rows_beyond_matrix():
+    vectors = random_vectors(200, seed=4)
+    index = IVFIndex.build(vectors, nlist=8, nprobe=8)
+
+    # Ein paralleler Aufruf hat den Index schon über diese (ältere)
+    # Matrix hinaus synchronisiert
+    hits = index.search(vectors[:120], vectors[0], 10, -1.0)
+
+    assert all(i < 120 for i, _ in hits)
+
+
+def test_inverted_index_with_long_mask():
+    index = InvertedIndex()
+    index.sync(make_rows(0, 3))
+
+    hits = index.search("eintrag", 10, mask=np.array([True, False, True, True, True]))
+
+    assert {i for i, _ in hits} == {0, 2}
+
+
+def add_document(store, seed=5):
+    """Eltern-Zeile plus zwei Chunks, wie save_document sie anlegt"""
+    parent, *chunks = make_rows(len(store.rows), 3)
+    parent["chunk_count"] = 2
+    for index, chunk in enumerate(chunks):
+        chunk["parent_id"] = parent["id"]
+        chunk["chunk_index"] = index
+    store.append_document(parent, chunks, random_vectors(2, seed=seed))
+    return len(store.rows) - 3
+
+
+def test_filter_mask_is_none_without_filters(store):
+    add_document(store)
+
+    assert store.filter_mask() is None
+    assert store.filter_mask(role="user") is not None
+
+
+def test_unfiltered_search_hides_parent_rows(store):
+    parent = add_document(store)
+
+    assert store.hidden_rows(len(store.rows)).tolist() == [parent]
+    assert parent not in {i for i, _ in store.search(random_vectors(1)[0], 50, -1.0)}
+    assert parent not in {i for i, _ in store.lexical_search("eintrag", 50)}
+
+
+@pytest.mark.parametrize("quantization", ["binary", "int8"])
+def test_unfiltered_quantized_search_hides_parent_rows(tmp_path, quantization):
+    store = ProjectStore(
+        tmp_path / "q", ann_min_rows=20000, ann_nprobe=4, quantization=quantization
+    )
+    store.append(make_rows(0, 10), random_vectors(10))
+    parent = add_document(store)
+
+    assert parent not in {i for i, _ in store.search(random_vectors(1)[0], 50, -1.0)}
+
+
+def test_unfiltered_ivf_search_hides_parent_rows(tmp_path):
+    store = ProjectStore(tmp_path / "ivf", ann_min_rows=10, ann_nprobe=4)
+    store.append(make_rows(0, 30), random_vectors(30))
+    parent = add_document(store)
+    store.train_index(nlist=4, nprobe=4, force=True)
+
+    hits = store.search(random_vectors(1)[0], 50, -1.0)
+
+    assert hits
+    assert parent not in {i for i, _ in hits}
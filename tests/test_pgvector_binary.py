@@ -0,0 +1,63 @@
+import struct
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.pgvector_binary import (
+    _row,
+    decode_vector,
+    encode_vector,
+    uses_transaction_pooler,
+)
+
+
+def test_encode_decode_round_trip():
+    vector = np.random.default_rng(0).normal(size=384).astype(np.float32)
+
+    decoded = decode_vector(encode_vector(vector))
+
+    assert decoded.dtype == np.float32
+    assert np.array_equal(decoded, vector)
+
+
+def test_encoded_layout():
+    data = encode_vector([1.0, -2.5, 0.0])
+
+    # dim und unused als int16, danach float32 big-endian
+    assert data[:4] == struct.pack(">HH", 3, 0)
+    assert data[4:] == struct.pack(">3f", 1.0, -2.5, 0.0)
+    assert len(data) == 4 + 3 * 4
+
+
+def test_decode_ignores_trailing_bytes():
+    data = encode_vector([0.5, 1.5]) + b"\x00" * 8
+
+    assert decode_vector(data).tolist() == [0.5, 1.5]
+
+
+@pytest.mark.parametrize(
+    "dsn,expected",
+    [
+        ("postgresql://user:pw@pooler.supabase.com:6543/postgres", True),
+        ("postgresql://user:pw@pooler.supabase.com:5432/postgres", False),
+        ("postgresql://user:pw@db.example.com/postgres", False),
+        ("postgresql://user:pw@host:kaputt/postgres", False),
+    ],
+)
+def test_uses_transaction_pooler(dsn, expected):
+    assert uses_transaction_pooler(dsn) is expected
+
+
+def test_row_converts_uuid_and_datetime():
+    row_id = uuid.uuid4()
+    created_at = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+    row = _row({"id": row_id, "created_at": created_at, "content": "text"})
+
+    assert row == {
+        "id": str(row_id),
+        "created_at": "2024-01-02T03:04:05+00:00",
+        "content": "text",
+    }
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from app.usage_writer import UsageWriter
+
+
+class RecordingStorage:
+    """Nimmt Usage-Batches entgegen; die ersten ``failures`` Aufrufe schlagen fehl"""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    async def insert_usage(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Datenbank nicht erreichbar")
+        self.batches.append(list(batch))
+
+
+def event(project="p", tokens=10):
+    return {"project": project, "usage_type": "save", "tokens": tokens}
+
+
+def make_writer(storage, **attributes):
+    writer = UsageWriter(storage)
+    writer.flush_interval = 60
+    for name, value in attributes.items():
+        setattr(writer, name, value)
+    return writer
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_queue():
+    storage = RecordingStorage()
+    writer = make_writer(storage)
+    writer.start()
+    for _ in range(5):
+        assert writer.enqueue(event())
+
+    await writer.stop()
+
+    assert sum(len(batch) for batch in storage.batches) == 5
+    assert writer.stats()["written"] == 5
+    assert writer.pending_tokens("p") == 0
+    assert writer.pending_events("p") == []
+
+
+@pytest.mark.asyncio
+async def test_flushes_full_batches_without_waiting():
+    storage = RecordingStorage()
+    writer = make_writer(storage, batch_size=3)
+    writer.start()
+    for _ in range(7):
+        writer.enqueue(event())
+
+    # Zwei volle Batches werden lange vor dem Flush-Intervall geschrieben
+    for _ in range(100):
+        if len(storage.batches) == 2:
+            break
+        await asyncio.sleep(0.001)
+    assert [len(batch) for batch in storage.batches] == [3, 3]
+
+    await writer.stop()
+    assert [len(batch) for batch in storage.batches] == [3, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_events():
+    storage = RecordingStorage()
+    writer = make_writer(storage, max_queue=2)
+    writer.start()
+
+    results = [writer.enqueue(event()) for _ in range(4)]
+
+    assert results == [True, True, False, False]
+    assert writer.stats()["dropped"] == 2
+    assert writer.pending_tokens("p") == 20
+    await writer.stop()
+    assert writer.stats()["written"] == 2
+
+
+@pytest.mark.asyncio
+async def test_enqueue_after_stop_is_dropped():
+    writer = make_writer(RecordingStorage())
+    writer.start()
+    await writer.stop()
+
+    assert not writer.enqueue(event())
+    assert writer.stats()["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pending_events_per_project():
+    writer = make_writer(RecordingStorage())
+    writer.start()
+    writer.enqueue(event("a", 5))
+    writer.enqueue(event("b", 7))
+    writer.enqueue(event("a", 3))
+
+    assert writer.pending_tokens("a") == 8
+    assert [e["tokens"] for e in writer.pending_events("a")] == [5, 3]
+    assert sorted(writer.pending_projects()) == ["a", "b"]
+    await writer.stop()
+    assert writer.pending_projects() == []
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_retried(monkeypatch):
+    async def no_sleep(_):
+        return None
+
+    storage = RecordingStorage(failures=2)
+    writer = make_writer(storage)
+    writer.start()
+    writer.enqueue(event())
+    monkeypatch.setattr("app.usage_writer.asyncio.sleep", no_sleep)
+
+    await writer.stop()
+
+    assert len(storage.batches) == 1
+    assert writer.stats()["failed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_is_dropped_after_max_retries(monkeypatch):
+    async def no_sleep(_):
+        return None
+
+    storage = RecordingStorage(failures=3)
+    writer = make_writer(storage)
+    writer.start()
+    writer.enqueue(event())
+    monkeypatch.setattr("app.usage_writer.asyncio.sleep", no_sleep)
+
+    await writer.stop()
+
+    assert storage.batches == []
+    assert writer.stats()["failed"] == 1
+    assert writer.pending_tokens("p") == 0